@@ -0,0 +1,213 @@
+"""
+@Filename : Artifact_Store.py
+@Brief : Content-addressed store of conversion artifacts, per-folder manifests and a publish step that transfers only new blobs
+@Author : Soumitra Pandit
+"""
+
+import os
+import json
+import hashlib
+from Build_Cache import _write_atomic
+
+#Default location of the store, can be moved with the JSON2SVG_STORE_DIR environment variable
+DEFAULT_STORE_DIR = os.environ.get("JSON2SVG_STORE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "json2svg-store"))
+
+#File name of the manifest written into every plan folder
+MANIFEST_NAME = "artifacts.json"
+
+#Format version of the manifests
+MANIFEST_VERSION = 1
+
+#Bytes read per block while hashing and copying
+BLOCK_SIZE = 1 << 20
+
+
+#blobs/<first two hex digits>/<sha256>, so no directory holds more than a fraction of the blobs:
+def blob_name(digest: str):
+    return os.path.join("blobs", digest[:2], digest)
+
+
+def _stat_signature(path: str):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _publishable(manifest: dict):
+    #A manifest without the local stat signatures, as it is stored remotely
+    return {"version": MANIFEST_VERSION,
+            "artifacts": {name: {"sha256": entry["sha256"], "size": entry["size"]}
+                          for name, entry in sorted(manifest["artifacts"].items())}}
+
+
+class Artifact_Store:
+    """
+    Keeps every artifact of a conversion (inputs, SVG, derived formats, metrics) once, named by its sha256.
+
+    Layout of store_dir:
+        blobs/<ab>/<sha256>   contents of one artifact, never rewritten once present
+
+    Next to its outputs every plan folder gets a manifest, artifacts.json, mapping logical names (paths
+    relative to the folder, with / separators) to {"sha256", "size", "stat"}. Files whose size and mtime match
+    the folder's previous manifest are not re-hashed, so an unchanged output.svg costs one stat call. Blobs are
+    written atomically and never modified, so several worker processes can share a store.
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR):
+        self.store_dir = os.path.abspath(store_dir)
+
+    def blob_path(self, digest: str):
+        return os.path.join(self.store_dir, blob_name(digest))
+
+    def has(self, digest: str):
+        return os.path.exists(self.blob_path(digest))
+
+    def put_bytes(self, data: bytes):
+        """
+        Store bytes.
+
+        Returns:
+            dict: sha256 and size of the blob.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.has(digest):
+            _write_atomic(self.blob_path(digest), lambda f: f.write(data))
+        return {"sha256": digest, "size": len(data)}
+
+    def put_file(self, path: str, previous: dict = None):
+        """
+        Store the contents of a file, hashing and copying it in one read.
+
+        Args:
+            path (str): File to store.
+            previous (dict): Entry of the same file in the folder's last manifest; reused without reading the
+                             file when size, mtime and blob are all still there.
+
+        Returns:
+            dict: sha256, size and stat (size and mtime) of the file.
+        """
+        signature = _stat_signature(path)
+        if previous and previous.get("stat") == signature and self.has(previous["sha256"]):
+            return previous
+        import tempfile
+        os.makedirs(self.store_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, prefix=".tmp-")
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as target, open(path, "rb") as source:
+                for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+                    digest.update(block)
+                    target.write(block)
+            blob_path = self.blob_path(digest.hexdigest())
+            if os.path.exists(blob_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {"sha256": digest.hexdigest(), "size": signature[0], "stat": signature}
+
+    @staticmethod
+    def read_manifest(folder_path: str):
+        try:
+            with open(os.path.join(folder_path, MANIFEST_NAME), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def collect(self, folder_path: str, files: dict, data: dict = None):
+        """
+        Store the artifacts of one folder and write its manifest.
+
+        Args:
+            folder_path (str): Plan folder; the manifest is written to <folder_path>/artifacts.json.
+            files (dict): Logical name -> path of every artifact file; None paths are left out.
+            data (dict): Logical name -> bytes of artifacts that exist only in memory, e.g. metrics.
+
+        Returns:
+            dict: The manifest, {"version", "artifacts": {name: {"sha256", "size"[, "stat"]}}}.
+        """
+        previous = (self.read_manifest(folder_path) or {}).get("artifacts", {})
+        artifacts = {}
+        for name, path in sorted(files.items()):
+            if path is not None:
+                artifacts[name] = self.put_file(path, previous.get(name))
+        for name, payload in sorted((data or {}).items()):
+            artifacts[name] = self.put_bytes(payload)
+        manifest = {"version": MANIFEST_VERSION, "artifacts": artifacts}
+        _write_atomic(os.path.join(os.path.abspath(folder_path), MANIFEST_NAME),
+                      lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+        return manifest
+
+
+class Directory_Remote:
+    """
+    Remote storage kept in a local directory, with the layout a blob storage bucket would have:
+        blobs/<ab>/<sha256>      one object per artifact
+        manifests/<name>.json    published manifest of the plan folder <name>
+
+    Anything with the same four methods (has_blob, put_blob, read_manifest, write_manifest) can be published to.
+    """
+
+    def __init__(self, root_path: str):
+        self.root_path = os.path.abspath(root_path)
+
+    def __manifest_path(self, name: str):
+        return os.path.join(self.root_path, "manifests", f"{name}.json")
+
+    def has_blob(self, digest: str):
+        return os.path.exists(os.path.join(self.root_path, blob_name(digest)))
+
+    def put_blob(self, digest: str, source_path: str):
+        import shutil
+        with open(source_path, "rb") as source:
+            _write_atomic(os.path.join(self.root_path, blob_name(digest)), lambda f: shutil.copyfileobj(source, f, BLOCK_SIZE))
+
+    def read_manifest(self, name: str):
+        try:
+            with open(self.__manifest_path(name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self, name: str, manifest: dict):
+        _write_atomic(self.__manifest_path(name), lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+
+def publish(store: Artifact_Store, manifest: dict, remote, name: str):
+    """
+    Publish one folder's manifest, transferring only the blobs the remote does not have yet.
+
+    Every blob is looked up on the remote before it is sent, including the ones the previously published
+    manifest names, so an upload that was lost (or a blob deleted remotely) is sent again on the next publish;
+    a blob shared with another folder is not sent twice either. The previous manifest only decides whether
+    the manifest itself is rewritten. The manifest is written last, so a remote manifest only ever names
+    blobs that are already there.
+
+    Args:
+        store (Artifact_Store): Store the blobs are read from.
+        manifest (dict): Manifest returned by Artifact_Store.collect.
+        remote: Directory_Remote, or any object with its methods.
+        name (str): Name the manifest is published under, e.g. the folder path relative to the batch root.
+
+    Returns:
+        dict: name, uploaded / skipped (blob counts), uploaded_bytes / skipped_bytes and manifest_changed.
+    """
+    published = _publishable(manifest)
+    previous = remote.read_manifest(name) or {}
+    report = {"name": name, "uploaded": 0, "uploaded_bytes": 0, "skipped": 0, "skipped_bytes": 0,
+              "manifest_changed": published != previous}
+    sizes = {entry["sha256"]: entry["size"] for entry in published["artifacts"].values()}
+    for digest, size in sorted(sizes.items()):
+        if remote.has_blob(digest):
+            report["skipped"] += 1
+            report["skipped_bytes"] += size
+        else:
+            remote.put_blob(digest, store.blob_path(digest))
+            report["uploaded"] += 1
+            report["uploaded_bytes"] += size
+    if report["manifest_changed"]:
+        remote.write_manifest(name, published)
+    return report
@@ -0,0 +1,289 @@
+"""
+@Filename : Build_Cache.py
+@Brief : Content-hash build cache that skips re-rendering unchanged floorplan/sortplan pairs
+@Author : Soumitra Pandit
+"""
+
+import os
+import json
+import time
+import hashlib
+
+#Default location of the cache, can be moved with the JSON2SVG_CACHE_DIR environment variable
+DEFAULT_CACHE_DIR = os.environ.get("JSON2SVG_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "json2svg"))
+
+#Default upper bound of the stored outputs, in bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+#Renderer modules whose source makes up the code version: every module that reads the plan or writes output bytes
+RENDERER_MODULES = ("SVG_Floorplan", "Floorplan", "SVG_Stream", "Geometry", "JSON_Loader", "JSON_Stream", "Sortplan_Join",
+                    "Connection_Graph", "Spatial_Index", "SVG_Fragments", "SVG_Shards")
+
+_code_versions = {}
+
+
+def file_digest(path: str):
+    """
+    sha256 of a file's contents, or None when path is None.
+    """
+    if path is None:
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version(modules=RENDERER_MODULES):
+    """
+    sha256 over the source files of the given modules, computed once per process.
+
+    Args:
+        modules (tuple): Module names, looked up next to this file.
+
+    Returns:
+        str: Hex digest identifying the renderer code.
+    """
+    modules = tuple(modules)
+    if modules not in _code_versions:
+        here = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for module in modules:
+            digest.update(module.encode())
+            digest.update(file_digest(os.path.join(here, f"{module}.py")).encode())
+        _code_versions[modules] = digest.hexdigest()
+    return _code_versions[modules]
+
+
+def _stat_signature(path: str):
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _write_atomic(path: str, write):
+    import tempfile
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Build_Cache:
+    """
+    Remembers, per output file, which inputs, settings and code produced it, and keeps copies of rendered
+    outputs keyed by those hashes.
+
+    Layout of cache_dir:
+        manifests/<hash of output path>.json   what was built for one output, when and why
+        objects/<key>.svg                      rendered output (or zone fragment) for a key, evicted least recently used first
+        objects/<key>.cells.json               cells drawn by the zone fragment <key>, evicted the same way
+        snapshots/<hash of output path>.json   zone fragment keys of the last incremental render of one output
+
+    Every file is written atomically and there is no shared index, so several worker processes can use the
+    same cache at once.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, version: str = None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.version = version if version is not None else code_version()
+        self.manifest_dir = os.path.join(self.cache_dir, "manifests")
+        self.object_dir = os.path.join(self.cache_dir, "objects")
+        self.snapshot_dir = os.path.join(self.cache_dir, "snapshots")
+
+    #Manifest of one output:
+    def manifest_path(self, output_path: str):
+        name = hashlib.sha256(os.path.abspath(output_path).encode()).hexdigest()
+        return os.path.join(self.manifest_dir, f"{name}.json")
+
+    def object_path(self, key: str, suffix: str = ".svg"):
+        return os.path.join(self.object_dir, f"{key}{suffix}")
+
+    #Snapshot of the last incremental render of one output:
+    def snapshot_path(self, output_path: str):
+        name = hashlib.sha256(os.path.abspath(output_path).encode()).hexdigest()
+        return os.path.join(self.snapshot_dir, f"{name}.json")
+
+    def read_object(self, key: str, suffix: str = ".svg"):
+        """
+        Bytes stored under key (marked as recently used), or None.
+        """
+        path = self.object_path(key, suffix)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        os.utime(path)
+        return data
+
+    def write_object(self, key: str, data: bytes, suffix: str = ".svg"):
+        """
+        Store bytes under key. Call evict() once a batch of objects is written.
+        """
+        _write_atomic(self.object_path(key, suffix), lambda f: f.write(data))
+
+    def read_snapshot(self, output_path: str):
+        try:
+            with open(self.snapshot_path(output_path), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_snapshot(self, output_path: str, snapshot: dict):
+        _write_atomic(self.snapshot_path(output_path), lambda f: f.write(json.dumps(snapshot).encode()))
+
+    def read_manifest(self, output_path: str):
+        try:
+            with open(self.manifest_path(output_path), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def check(self, output_path: str, floorplan_file: str, sortplan_file: str = None, settings: dict = None):
+        """
+        Decide whether output_path has to be rebuilt.
+
+        Input files whose size and mtime match the manifest are not re-hashed, so an up to date output is
+        recognised from a few stat calls.
+
+        Returns:
+            dict: up_to_date (bool), reason (str), key (str) and the hashes that make up the key.
+        """
+        manifest = self.read_manifest(output_path)
+        settings_hash = hashlib.sha256(json.dumps(settings or {}, sort_keys=True).encode()).hexdigest()
+        inputs = {}
+        for name, path in (("floorplan", floorplan_file), ("sortplan", sortplan_file)):
+            signature = _stat_signature(path)
+            previous = (manifest or {}).get("inputs", {}).get(name)
+            if previous and previous["path"] == path and previous["stat"] == signature:
+                inputs[name] = previous
+            else:
+                inputs[name] = {"path": path, "stat": signature, "sha256": file_digest(path)}
+
+        key = hashlib.sha256(json.dumps(
+            [inputs["floorplan"]["sha256"], inputs["sortplan"]["sha256"], settings_hash, self.version]
+        ).encode()).hexdigest()
+        decision = {"up_to_date": False, "reason": "", "key": key, "inputs": inputs,
+                    "settings": settings_hash, "version": self.version}
+
+        if manifest is None:
+            decision["reason"] = "no previous build"
+        elif not os.path.exists(output_path):
+            decision["reason"] = "output missing"
+        elif manifest.get("output_stat") != _stat_signature(output_path):
+            decision["reason"] = "output modified"
+        elif manifest["inputs"]["floorplan"]["sha256"] != inputs["floorplan"]["sha256"]:
+            decision["reason"] = "floorplan changed"
+        elif manifest["inputs"]["sortplan"]["sha256"] != inputs["sortplan"]["sha256"]:
+            decision["reason"] = "sortplan changed"
+        elif manifest.get("settings") != settings_hash:
+            decision["reason"] = "settings changed"
+        elif manifest.get("version") != self.version:
+            decision["reason"] = "code changed"
+        else:
+            decision["up_to_date"] = True
+            decision["reason"] = "up to date"
+        return decision
+
+    def restore(self, decision: dict, output_path: str):
+        """
+        Copy a previously rendered output for decision["key"] to output_path.
+
+        Returns:
+            bool: True when the cache had the output.
+        """
+        import shutil
+        object_path = self.object_path(decision["key"])
+
+        def copy(f):
+            with open(object_path, "rb") as source:
+                shutil.copyfileobj(source, f)
+
+        try:
+            _write_atomic(os.path.abspath(output_path), copy)
+        except FileNotFoundError:
+            return False
+        try:
+            os.utime(object_path) #Mark as recently used for the LRU eviction
+        except FileNotFoundError: #Evicted by another process in the meantime
+            pass
+        return True
+
+    def record(self, decision: dict, output_path: str, reason: str = None, seconds: float = None):
+        """
+        Store a freshly built output under its key and write its manifest.
+        """
+        import shutil
+        object_path = self.object_path(decision["key"])
+        if not os.path.exists(object_path):
+            with open(output_path, "rb") as source:
+                _write_atomic(object_path, lambda f: shutil.copyfileobj(source, f))
+        else:
+            os.utime(object_path)
+
+        manifest = {
+            "output": os.path.abspath(output_path),
+            "output_stat": _stat_signature(output_path),
+            "key": decision["key"],
+            "inputs": decision["inputs"],
+            "settings": decision["settings"],
+            "version": decision["version"],
+            "reason": reason or decision["reason"],
+            "built_at": time.time(),
+            "seconds": seconds,
+        }
+        _write_atomic(self.manifest_path(output_path), lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+        self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used outputs until the object store fits in max_bytes.
+
+        Returns:
+            int: Number of objects removed.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.object_dir) if not entry.name.startswith(".tmp-")]
+        except FileNotFoundError:
+            return 0
+        stats = sorted(((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in entries))
+        total = sum(size for _, size, _ in stats)
+        removed = 0
+        for _, size, path in stats:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def invalidate(self, output_path: str = None):
+        """
+        Forget the build of one output together with its stored copy, or the whole cache when output_path is None.
+        The next check() then asks for a fresh render.
+        """
+        import shutil
+        if output_path is None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            return
+        manifest = self.read_manifest(output_path)
+        for path in (self.manifest_path(output_path), self.snapshot_path(output_path),
+                     manifest and self.object_path(manifest["key"])):
+            try:
+                if path:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
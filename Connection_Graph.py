@@ -0,0 +1,123 @@
+"""
+@Filename : Connection_Graph.py
+@Brief : Compact CSR adjacency over the connects_to links of a Floorplan, with control points per edge
+@Author : Soumitra Pandit
+"""
+
+
+class Connection_Graph:
+    """
+    Integer-indexed graph of the cells of a Floorplan, built in one pass over the connections.
+
+    Cells are the rows of the Floorplan cell store; connects_to ids are interned to those rows once.
+    The edges of row r are targets[offsets[r]:offsets[r + 1]], in the order they appear in the document.
+    Control points of edge e are points[point_offsets[e]:point_offsets[e + 1]], absolute (x, y) in Meters.
+    All arrays are numpy arrays when the floorplan is vectorized, else plain lists.
+    """
+
+    def __init__(self, floorplan):
+        self.floorplan = floorplan
+        cell_index = floorplan.cell_index
+        cell_ids = floorplan.cell_ids
+        zone_ids = floorplan.zone_ids
+        cell_zones = floorplan.cell_zones
+        zone_prefixes = [f"/{zone_id}/" for zone_id in zone_ids]
+        zone_offsets = [floorplan.zones[zone_id].zone_pose for zone_id in zone_ids]
+
+        offsets = [0]
+        targets = []
+        point_offsets = [0]
+        points = []
+        self.missing = [] #(source id, target id) of connections to cells that do not exist
+        for row, connections in enumerate(floorplan.cell_connections):
+            zone_row = cell_zones[row]
+            prefix = zone_prefixes[zone_row]
+            for connection in connections:
+                target_id = connection.get("connects_to")
+                if target_id is None:
+                    continue
+                if not target_id.startswith("/"): #Relative to the zone of the source cell
+                    target_id = prefix + target_id
+                target = cell_index.get(target_id)
+                if target is None:
+                    self.missing.append((cell_ids[row], target_id))
+                    continue
+                targets.append(target)
+                control_points = connection.get("control_points")
+                if control_points:
+                    zone_x, zone_y = zone_offsets[zone_row][0], zone_offsets[zone_row][1]
+                    points.extend((float(point[0]) + zone_x, float(point[1]) + zone_y) for point in control_points)
+                point_offsets.append(len(points))
+            offsets.append(len(targets))
+
+        self.predecessor_offsets = None #Reverse adjacency, built on first use
+        self.sources = None
+        if floorplan.vectorized:
+            import numpy as np
+            self.offsets = np.array(offsets, dtype=np.int64)
+            self.targets = np.array(targets, dtype=np.int32)
+            self.point_offsets = np.array(point_offsets, dtype=np.int64)
+            self.points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        else:
+            self.offsets = offsets
+            self.targets = targets
+            self.point_offsets = point_offsets
+            self.points = points
+
+    def __len__(self):
+        return len(self.targets)
+
+    def successors(self, row: int):
+        """
+        Rows of the cells row connects to.
+        """
+        targets = self.targets[self.offsets[row]:self.offsets[row + 1]]
+        return targets.tolist() if self.floorplan.vectorized else targets
+
+    def predecessors(self, row: int):
+        """
+        Rows of the cells that connect to row.
+        """
+        if self.predecessor_offsets is None:
+            self.__build_predecessors()
+        sources = self.sources[self.predecessor_offsets[row]:self.predecessor_offsets[row + 1]]
+        return sources.tolist() if self.floorplan.vectorized else sources
+
+    def edge_sources(self):
+        """
+        Source row of every edge, aligned with targets.
+        """
+        offsets = self.offsets
+        if self.floorplan.vectorized:
+            import numpy as np
+            return np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+        return [row for row in range(len(offsets) - 1) for _ in range(offsets[row + 1] - offsets[row])]
+
+    def edge_points(self, edge: int):
+        """
+        Control points of one edge as a list of (x, y).
+        """
+        return [tuple(point) for point in self.points[self.point_offsets[edge]:self.point_offsets[edge + 1]]]
+
+    def __build_predecessors(self):
+        num_cells = len(self.offsets) - 1
+        if self.floorplan.vectorized:
+            import numpy as np
+            order = np.argsort(self.targets, kind="stable")
+            self.sources = self.edge_sources()[order]
+            self.predecessor_offsets = np.concatenate(
+                [[0], np.cumsum(np.bincount(self.targets, minlength=num_cells))]).astype(np.int64)
+            return
+        #Counting sort of the edges by target: one pass to count, one to place
+        counts = [0] * (num_cells + 1)
+        for target in self.targets:
+            counts[target + 1] += 1
+        for row in range(num_cells):
+            counts[row + 1] += counts[row]
+        sources = [0] * len(self.targets)
+        fill = list(counts[:-1])
+        for source, target in zip(self.edge_sources(), self.targets):
+            sources[fill[target]] = source
+            fill[target] += 1
+        self.predecessor_offsets = counts
+        self.sources = sources
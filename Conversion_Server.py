@@ -0,0 +1,236 @@
+"""
+@Filename : Conversion_Server.py
+@Brief : Long-running conversion service (local HTTP and stdin/stdout JSON lines) that renders without touching disk
+@Author : Soumitra Pandit
+"""
+
+import io
+import sys
+import json
+import time
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from SVG_Floorplan import SVG_Floorplan, RENDER_DEFAULTS
+from JSON_Loader import parse
+
+#Largest request body the HTTP endpoint accepts, in bytes
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+def render_svg(floorplan, sortplan=None, options: dict = None):
+    """
+    Render a floorplan/sortplan pair to SVG bytes entirely in memory.
+
+    Args:
+        floorplan (dict | bytes | str): Parsed floorplan document or raw JSON.
+        sortplan (dict | bytes | str): Parsed sortplan document or raw JSON, optional.
+        options (dict): Render options (mode, keep_ids, precision); unknown keys are rejected.
+                        The documents are validated first, a bad plan raises Plan_Validation_Error with every problem;
+                        "validate": false skips that.
+
+    Returns:
+        bytes: The UTF-8 encoded SVG document.
+    """
+    options = dict(options or {})
+    validate = options.pop("validate", True)
+    unknown = set(options) - set(RENDER_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown render options: {sorted(unknown)}")
+    buffer = io.StringIO()
+    SVG_Floorplan.from_data(None, floorplan, sortplan, backend="stream", validate=bool(validate), **options).write(buffer)
+    return buffer.getvalue().encode("utf-8")
+
+
+class Render_Stats:
+    """
+    Thread-safe latency and throughput counters of a running server.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.bytes_out = 0
+        self.total_seconds = 0.0
+        self.latencies = deque(maxlen=window) #Most recent request latencies, for percentiles
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def end(self, seconds: float, size: int = 0, failed: bool = False):
+        with self.lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.errors += failed
+            self.bytes_out += size
+            self.total_seconds += seconds
+            self.latencies.append(seconds)
+
+    def reject(self):
+        with self.lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            uptime = time.time() - self.started
+
+            def percentile(fraction):
+                if not latencies:
+                    return None
+                return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1e3
+
+            return {
+                "uptime_s": uptime,
+                "requests": self.requests,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "in_flight": self.in_flight,
+                "bytes_out": self.bytes_out,
+                "throughput_rps": self.requests / uptime if uptime > 0 else 0.0,
+                "mean_ms": self.total_seconds / self.requests * 1e3 if self.requests else None,
+                "p50_ms": percentile(0.50),
+                "p95_ms": percentile(0.95),
+                "max_ms": latencies[-1] * 1e3 if latencies else None,
+            }
+
+
+class Conversion_Server:
+    """
+    Renders requests of the form {"floorplan": ..., "sortplan": ..., "options": {...}}.
+    Every request builds its own SVG_Floorplan, so nothing is shared between requests except the counters.
+    At most max_concurrency renders run at once; requests that cannot start within queue_timeout are rejected.
+    """
+
+    def __init__(self, max_concurrency: int = 4, queue_timeout: float = 5.0):
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.stats = Render_Stats()
+
+    def handle(self, request: dict):
+        """
+        Render one request.
+
+        Returns:
+            bytes: The SVG document.
+
+        Raises:
+            TimeoutError: When no render slot frees up within queue_timeout.
+        """
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            self.stats.reject()
+            raise TimeoutError(f"All {self.max_concurrency} render slots busy")
+        self.stats.begin()
+        start = time.perf_counter()
+        svg = b""
+        try:
+            if "floorplan" not in request:
+                raise ValueError("Request has no floorplan")
+            svg = render_svg(request["floorplan"], request.get("sortplan"), request.get("options"))
+            return svg
+        except Exception:
+            svg = None
+            raise
+        finally:
+            self.stats.end(time.perf_counter() - start, len(svg or b""), failed=svg is None)
+            self.slots.release()
+
+    def serve_http(self, host: str = "127.0.0.1", port: int = 8765):
+        """
+        Serve POST /render (JSON request body, SVG response), GET /metrics and GET /health until interrupted.
+        """
+        server = ThreadingHTTPServer((host, port), _make_handler(self))
+        server.daemon_threads = True
+        print(f"Conversion server listening on http://{host}:{server.server_address[1]}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """
+        Read one JSON request per line from stdin and write one JSON response per line to stdout:
+        {"id": ..., "ok": true, "svg": "...", "ms": ...} or {"id": ..., "ok": false, "error": "..."}.
+        Anything the renderer prints goes to stderr so it cannot corrupt the response stream.
+        """
+        stdin = stdin or sys.stdin
+        stdout = stdout or sys.stdout
+        real_stdout, sys.stdout = sys.stdout, sys.stderr
+        try:
+            for line in stdin:
+                if not line.strip():
+                    continue
+                start = time.perf_counter()
+                response = {"id": None}
+                try:
+                    request = parse(line)
+                    response["id"] = request.get("id")
+                    if request.get("metrics"):
+                        response.update(ok=True, metrics=self.stats.snapshot())
+                    else:
+                        response.update(ok=True, svg=self.handle(request).decode("utf-8"))
+                except Exception as e:
+                    response.update(ok=False, error=f"{type(e).__name__}: {e}")
+                    if hasattr(e, "problems"):
+                        response["problems"] = e.problems
+                response["ms"] = (time.perf_counter() - start) * 1e3
+                stdout.write(json.dumps(response) + "\n")
+                stdout.flush()
+        finally:
+            sys.stdout = real_stdout
+
+
+def _make_handler(app: Conversion_Server):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _reply_json(self, status: int, payload: dict):
+            self._reply(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._reply_json(200, app.stats.snapshot())
+            elif self.path == "/health":
+                self._reply_json(200, {"ok": True})
+            else:
+                self._reply_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/render":
+                self._reply_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self._reply_json(413, {"error": f"Body larger than {MAX_BODY_BYTES} bytes"})
+                return
+            try:
+                request = parse(self.rfile.read(length))
+                svg = app.handle(request)
+            except TimeoutError as e:
+                self._reply_json(503, {"error": str(e)})
+                return
+            except Exception as e:
+                error = {"error": f"{type(e).__name__}: {e}"}
+                if hasattr(e, "problems"): #Plan_Validation_Error: every problem, not only the ones in the message
+                    error["problems"] = e.problems
+                self._reply_json(400, error)
+                return
+            self._reply(200, svg, "image/svg+xml")
+
+        def log_message(self, format, *args): #Keep request logging off the hot path
+            pass
+
+    return Handler
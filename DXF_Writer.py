@@ -0,0 +1,202 @@
+"""
+@Filename : DXF_Writer.py
+@Brief : Writes the geometry of an SVG_Floorplan as a DXF drawing (LINE/LWPOLYLINE entities on one layer per element kind)
+@Author : Soumitra Pandit
+"""
+
+import numpy as np
+
+#AutoCAD 2000 format, the first one with LWPOLYLINE
+DXF_VERSION = "AC1015"
+
+#$INSUNITS code of the drawing unit (SVG_Floorplan.UNIT)
+INSUNITS = {"mm": 4, "cm": 5, "m": 6}
+
+#ACI colour of every layer, close to the SVG layer strokes
+LAYER_COLORS = {"nodes": 4, "bins": 2, "arrows": 1, "edges": 8}
+
+#Straight segments a curved link with one or two control points is flattened into
+CURVE_SEGMENTS = 8
+
+#Fixed handles of the table, block and object records; entities are numbered from FIRST_ENTITY_HANDLE
+HANDLES = {
+    "BLOCK_RECORD": 0x1, "LAYER": 0x2, "STYLE": 0x3, "LTYPE": 0x5, "VIEW": 0x6, "UCS": 0x7,
+    "VPORT": 0x8, "APPID": 0x9, "DIMSTYLE": 0xA, "dictionary": 0xC, "groups": 0xD,
+    "layer_0": 0x10, "style": 0x11, "appid": 0x12, "ltype_byblock": 0x14, "ltype_bylayer": 0x15,
+    "ltype_continuous": 0x16, "paper_space": 0x1B, "model_space": 0x1F,
+    "model_block": 0x30, "model_endblk": 0x31, "paper_block": 0x32, "paper_endblk": 0x33, "layers": 0x40,
+}
+FIRST_ENTITY_HANDLE = 0x100
+
+
+#Group code/value pairs as DXF text:
+def tags(*pairs):
+    return "".join(f"{code:>3}\n{value}\n" for code, value in pairs)
+
+
+def flatten_curve(start, control, end, segments: int = CURVE_SEGMENTS):
+    """
+    Points along a link drawn as a quadratic (one control point) or cubic (two) Bezier curve, or through
+    all control points when there are more, the same way SVG_Floorplan draws the edges layer.
+
+    Returns:
+        np.ndarray: (K, 2) points from start to end.
+    """
+    nodes = np.vstack([start, control, end])
+    if len(control) > 2:
+        return nodes
+    t = np.linspace(0.0, 1.0, segments + 1)[:, None]
+    if len(control) == 1:
+        return (1 - t) ** 2 * nodes[0] + 2 * (1 - t) * t * nodes[1] + t ** 2 * nodes[2]
+    return ((1 - t) ** 3 * nodes[0] + 3 * (1 - t) ** 2 * t * nodes[1] + 3 * (1 - t) * t ** 2 * nodes[2]
+            + t ** 3 * nodes[3])
+
+
+class DXF_Writer:
+    """
+    Exports the drawing of an SVG_Floorplan without going through the SVG: nodes and bins become closed
+    LWPOLYLINEs and arrows LINEs, each kind on its own layer, taken from the same batched corners the paths
+    mode draws (SVG_Floorplan.compute_geometry). With edges set, links are added on an "edges" layer.
+
+    Coordinates are written in drawing units (SVG_Floorplan.UNIT, declared in $INSUNITS) with y pointing up,
+    which is what the SVG shows after its vertical flip.
+    """
+
+    def __init__(self, converter):
+        self.converter = converter
+        self.precision = converter.precision
+        self.number = f"%.{self.precision}f"
+        self.entities_written = 0
+
+    def __layers(self):
+        return ["nodes", "bins", "arrows"] + (["edges"] if self.converter.edges else [])
+
+    def __shapes(self):
+        #(layer, kind, (N, K, 2) points) blocks in drawing order; kind is "closed", "open" or "line"
+        geometry = self.converter.compute_geometry()
+        blocks = [("nodes", "closed", geometry["nodes"]), ("bins", "closed", geometry["bins"]),
+                  ("arrows", "line", geometry["arrows"])]
+        if self.converter.edges:
+            edges = self.converter.compute_edge_geometry()
+            if edges is not None:
+                starts, ends = edges["starts"], edges["ends"]
+                point_offsets, points = edges["point_offsets"], edges["points"]
+                straight = point_offsets[1:] == point_offsets[:-1]
+                blocks.append(("edges", "line", np.stack([starts[straight], ends[straight]], axis=1)))
+                for index in np.flatnonzero(~straight).tolist():
+                    control = points[point_offsets[index]:point_offsets[index + 1]]
+                    curve = flatten_curve(starts[index], control, ends[index])
+                    blocks.append(("edges", "open", curve[None]))
+        return [block for block in blocks if len(block[2])]
+
+    def __extents(self, blocks):
+        if not blocks:
+            return (0.0, 0.0), (0.0, 0.0)
+        low = np.min([points.reshape(-1, 2).min(axis=0) for _, _, points in blocks], axis=0)
+        high = np.max([points.reshape(-1, 2).max(axis=0) for _, _, points in blocks], axis=0)
+        return tuple(low.tolist()), tuple(high.tolist())
+
+    def __header(self, handseed: int, extents):
+        (min_x, min_y), (max_x, max_y) = extents
+        return (tags((0, "SECTION"), (2, "HEADER"),
+                     (9, "$ACADVER"), (1, DXF_VERSION),
+                     (9, "$HANDSEED"), (5, f"{handseed:X}"),
+                     (9, "$INSUNITS"), (70, INSUNITS.get(self.converter.unit, 0)),
+                     (9, "$EXTMIN"), (10, min_x), (20, min_y), (30, 0.0),
+                     (9, "$EXTMAX"), (10, max_x), (20, max_y), (30, 0.0),
+                     (0, "ENDSEC"))
+                + tags((0, "SECTION"), (2, "CLASSES"), (0, "ENDSEC")))
+
+    @staticmethod
+    def __table(name: str, records: list):
+        handle = f"{HANDLES[name]:X}"
+        text = tags((0, "TABLE"), (2, name), (5, handle), (330, 0), (100, "AcDbSymbolTable"), (70, len(records)))
+        if name == "DIMSTYLE":
+            text += tags((100, "AcDbDimStyleTable"), (71, 0))
+        for record_handle, subclass, fields in records:
+            text += tags((0, name), (5, f"{record_handle:X}"), (330, handle), (100, "AcDbSymbolTableRecord"),
+                         (100, subclass), *fields)
+        return text + tags((0, "ENDTAB"))
+
+    def __tables(self):
+        ltype = "AcDbLinetypeTableRecord"
+        linetypes = [(HANDLES["ltype_byblock"], ltype, [(2, "ByBlock"), (70, 0), (3, ""), (72, 65), (73, 0), (40, 0.0)]),
+                     (HANDLES["ltype_bylayer"], ltype, [(2, "ByLayer"), (70, 0), (3, ""), (72, 65), (73, 0), (40, 0.0)]),
+                     (HANDLES["ltype_continuous"], ltype,
+                      [(2, "Continuous"), (70, 0), (3, "Solid line"), (72, 65), (73, 0), (40, 0.0)])]
+        layer = "AcDbLayerTableRecord"
+        layers = [(HANDLES["layer_0"], layer, [(2, "0"), (70, 0), (62, 7), (6, "Continuous")])]
+        layers += [(HANDLES["layers"] + index, layer, [(2, name), (70, 0), (62, LAYER_COLORS[name]), (6, "Continuous")])
+                   for index, name in enumerate(self.__layers())]
+        styles = [(HANDLES["style"], "AcDbTextStyleTableRecord",
+                   [(2, "Standard"), (70, 0), (40, 0.0), (41, 1.0), (50, 0.0), (71, 0), (42, 2.5), (3, "txt"), (4, "")])]
+        appids = [(HANDLES["appid"], "AcDbRegAppTableRecord", [(2, "ACAD"), (70, 0)])]
+        block = "AcDbBlockTableRecord"
+        blocks = [(HANDLES["model_space"], block, [(2, "*Model_Space")]),
+                  (HANDLES["paper_space"], block, [(2, "*Paper_Space")])]
+        return (tags((0, "SECTION"), (2, "TABLES"))
+                + self.__table("VPORT", []) + self.__table("LTYPE", linetypes) + self.__table("LAYER", layers)
+                + self.__table("STYLE", styles) + self.__table("VIEW", []) + self.__table("UCS", [])
+                + self.__table("APPID", appids) + self.__table("DIMSTYLE", []) + self.__table("BLOCK_RECORD", blocks)
+                + tags((0, "ENDSEC")))
+
+    @staticmethod
+    def __blocks():
+        text = tags((0, "SECTION"), (2, "BLOCKS"))
+        for space, name in (("model", "*Model_Space"), ("paper", "*Paper_Space")):
+            owner = f"{HANDLES[space + '_space']:X}"
+            text += tags((0, "BLOCK"), (5, f"{HANDLES[space + '_block']:X}"), (330, owner), (100, "AcDbEntity"), (8, "0"),
+                         (100, "AcDbBlockBegin"), (2, name), (70, 0), (10, 0.0), (20, 0.0), (30, 0.0), (3, name), (1, ""))
+            text += tags((0, "ENDBLK"), (5, f"{HANDLES[space + '_endblk']:X}"), (330, owner), (100, "AcDbEntity"),
+                         (8, "0"), (100, "AcDbBlockEnd"))
+        return text + tags((0, "ENDSEC"))
+
+    @staticmethod
+    def __objects():
+        root = f"{HANDLES['dictionary']:X}"
+        groups = f"{HANDLES['groups']:X}"
+        return tags((0, "SECTION"), (2, "OBJECTS"),
+                    (0, "DICTIONARY"), (5, root), (330, 0), (100, "AcDbDictionary"), (281, 1), (3, "ACAD_GROUP"), (350, groups),
+                    (0, "DICTIONARY"), (5, groups), (330, root), (100, "AcDbDictionary"), (281, 1),
+                    (0, "ENDSEC"))
+
+    def __entity_template(self, layer: str, kind: str, num_points: int):
+        #One entity with its handle and coordinates left as % fields
+        owner = f"{HANDLES['model_space']:X}"
+        number = self.number
+        head = tags((0, "LINE" if kind == "line" else "LWPOLYLINE")) + "  5\n%X\n" + tags((330, owner), (100, "AcDbEntity"), (8, layer))
+        if kind == "line":
+            return head + tags((100, "AcDbLine")) + f" 10\n{number}\n 20\n{number}\n 30\n0.0\n 11\n{number}\n 21\n{number}\n 31\n0.0\n"
+        return (head + tags((100, "AcDbPolyline"), (90, num_points), (70, 1 if kind == "closed" else 0))
+                + f" 10\n{number}\n 20\n{number}\n" * num_points)
+
+    def write(self, fileobj):
+        """
+        Write the DXF drawing to a file-like object opened in text mode.
+        """
+        blocks = self.__shapes()
+        num_entities = sum(len(points) for _, _, points in blocks)
+        fileobj.write(self.__header(FIRST_ENTITY_HANDLE + num_entities, self.__extents(blocks)))
+        fileobj.write(self.__tables())
+        fileobj.write(self.__blocks())
+        fileobj.write(tags((0, "SECTION"), (2, "ENTITIES")))
+        handle = FIRST_ENTITY_HANDLE
+        for layer, kind, points in blocks:
+            num, num_points, _ = points.shape
+            template = self.__entity_template(layer, kind, num_points)
+            #round first so that -0.00 is written as 0.00
+            flat = (np.round(points, self.precision) + 0.0).reshape(num, num_points * 2).tolist()
+            fileobj.write("".join(template % (handle + index, *row) for index, row in enumerate(flat)))
+            handle += num
+        fileobj.write(tags((0, "ENDSEC")))
+        fileobj.write(self.__objects())
+        fileobj.write(tags((0, "EOF")))
+        self.entities_written = num_entities
+        return self
+
+    def save(self, dxf_file: str):
+        """
+        Write the DXF drawing to dxf_file.
+        """
+        with open(dxf_file, "w", encoding="utf-8") as fileobj:
+            return self.write(fileobj)
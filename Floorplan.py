@@ -1,30 +1,87 @@
-import json
-import math
-import numpy as np
-from typing import List, Dict
-
-def rotate(xy, xy0, theta):  # rotate x,y around xo,yo by theta (rad)
-    x, y = xy
-    x0, y0 = xy0
-    xr = math.cos(theta) * (x - x0) - math.sin(theta) * (y - y0) + x0
-    yr = math.sin(theta) * (x - x0) + math.cos(theta) * (y - y0) + y0
-    return np.array([xr, yr])
+import sys
+from collections.abc import Mapping
+from typing import List
+from JSON_Loader import load_file
+
+#numpy is only imported once a plan has at least this many cells (or when something else already loaded it).
+#Smaller plans keep their poses in plain Python lists, which is faster than paying for the numpy import.
+NUMPY_MIN_CELLS = 20000
+
+#Connection fields a streamed floorplan keeps per cell; everything else is dropped while reading
+STREAM_CONNECTION_FIELDS = ("connects_to", "control_points")
+
+#Whether a store of num_cells cells should be backed by numpy arrays:
+def use_numpy(num_cells: int):
+    return num_cells >= NUMPY_MIN_CELLS or "numpy" in sys.modules
 
 class Floorplan:
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str = None, data: dict = None, vectorized: bool = None, streaming: bool = False,
+                 check = None):
         self.zones = {}
-        self.cells = {}
-        self.directions = {}
-        self.parse_zones_nodes(data_path)
-        #self.parse_directions()
+        self.vectorized = vectorized #True: numpy arrays, False: Python lists, None: decide from the cell count
+
+        #Columnar cell store: row i of every array below describes the same cell.
+        #The arrays are numpy arrays when self.vectorized, else plain lists with the same indexing.
+        self.poses = [] #Absolute (x, y, theta) of every cell, shape (N, 3)
+        self.cell_ids = [] #Absolute id of every cell
+        self.cell_type_codes = [] #Index into self.type_names
+        self.cell_zones = [] #Index into self.zone_ids
+        self.cell_connections = [] #Raw connection dicts of every cell
+        self.type_names = []
+        self.zone_ids = []
+        self.cell_index = {} #Absolute id -> row
+        self.cells = Cells(self)
+        self.data = None
+        self.spatial_index = None #Built on first use, see getSpatialIndex()
+        self.connection_graph = None #Built on first use, see getConnectionGraph()
+
+        if streaming: #Read zones[*].nodes[*] incrementally and never hold the whole document
+            from JSON_Stream import iter_zone_events
+            events = iter_zone_events(data_path)
+            if check is not None: #e.g. Plan_Validator.iter_floorplan, which checks the events as they pass
+                events = check(events)
+            self.add_cells(events, connection_fields=STREAM_CONNECTION_FIELDS)
+            return
+        if data is None:
+            data = load_file(data_path)
+        self.parse_zones_nodes(data)
+
+    #Build a Floorplan from an already parsed floorplan document (no file access):
+    @classmethod
+    def from_dict(cls, data: dict, vectorized: bool = None):
+        return cls(data=data, vectorized=vectorized)
+
+    #Build a Floorplan by streaming a file (path or file object) instead of parsing it whole,
+    #optionally passing the zone/node events through check first:
+    @classmethod
+    def from_stream(cls, source, vectorized: bool = None, check = None):
+        return cls(data_path=source, vectorized=vectorized, streaming=True, check=check)
 
-    def parse_zones_nodes(self, data_path: str):
-        with open(data_path, "r") as json_file:
-            self.data = json.load(json_file)
+    def parse_zones_nodes(self, data: dict):
+        self.data = data
 
         if "zones" not in self.data:
             raise Exception("No zones in design")
         
+        self.add_cells(self.__iter_zone_events(self.data["zones"]))
+
+    #Walk parsed zones the way JSON_Stream.iter_zone_events walks a file:
+    @staticmethod
+    def __iter_zone_events(zones):
+        for zone in zones:
+            yield "zone", zone
+            for cell in zone["nodes"]:
+                yield "node", cell
+
+    def add_cells(self, events, connection_fields=None):
+        """
+        Fill the columnar cell store from ("zone", zone dict) / ("node", node dict) events, where every
+        node belongs to the zone before it. Only id, type, pose and connections of a node are kept.
+
+        Args:
+            events (iterable): Zone and node events in document order.
+            connection_fields (tuple): Keep only these keys of each connection, None keeps the dicts as they are.
+        """
         #Here we go through each and every zone
         #For each zone, we create a Zone Object
         #For each zone in the JSON file, we extract all of the cells
@@ -32,66 +89,143 @@ class Floorplan:
         #The zones and the cells appear to be disconnected but their respective ids actually link them. 
         #For example, the absolute id of a cell links the cell to the zone it belongs to.
         #Pretty Cool.
-        for zone in self.data["zones"]:
-            zone_obj = Zone(zone["id"], zone["type"], zone["pose"])
-            self.zones[zone_obj.getId()] = zone_obj #Stores the Current Zone object in a Dict with its Id as the Key
-            for cell in zone["nodes"]: #For every node / cell in a given zone:
-                absolute_id = f'/{zone["id"]}/{cell["id"]}' #Create the absolute id by combining zone id and cell id
-                #I am guessing that the pose of a cell is relative to the last one.
-                #So what we're doinge here is just successively adding all the poses (read vectors) to reach our final
-                #Absolute Pose
-                absolute_pose = [
-                    cell["pose"][i] + zone_pose
-                    for i, zone_pose in enumerate(zone["pose"])
-                ]
-                cell_obj = Cell(
-                    zone_obj,
-                    absolute_id,
-                    cell["type"],
-                    absolute_pose,
-                    cell["connections"],
-                ) #Create the cell object from 
-                self.cells[cell_obj.getId()] = cell_obj
-
-    def parse_directions(self):
-        if "directions" not in self.data:
-            raise Exception("No directions in design")
-
-        for id, direction in self.data["directions"].items():
-            if "sub_directions" not in direction:
+        #Cells are collected into flat lists first and turned into arrays once at the end.
+        cell_index = self.cell_index
+        cell_ids = self.cell_ids
+        cell_connections = self.cell_connections
+        type_lookup = {}
+        relative_poses = []
+        type_codes = []
+        zone_rows = []
+        zone_poses = []
+        for kind, item in events:
+            if kind == "zone":
+                zone = item
+                zone_obj = Zone(zone["id"], zone["type"], zone["pose"])
+                self.zones[zone_obj.getId()] = zone_obj #Stores the Current Zone object in a Dict with its Id as the Key
+                zone_row = len(self.zone_ids)
+                self.zone_ids.append(zone_obj.getId())
+                zone_poses.append(zone["pose"])
                 continue
-            sub_directions = []
-            for direction_id, data in direction["sub_directions"].items():
-                sub_direction = Direction(
-                    id,
-                    direction_id,
-                    data["side"],
-                    data["container"]["type"],
-                    self.cells,
-                )
-                sub_directions.append(sub_direction)
-            self.directions[id] = sub_directions
-    
+            cell = item #For every node / cell in a given zone:
+            absolute_id = f'/{zone["id"]}/{cell["id"]}' #Create the absolute id by combining zone id and cell id
+            type_code = type_lookup.get(cell["type"])
+            if type_code is None:
+                type_code = type_lookup[cell["type"]] = len(type_lookup)
+            connections = cell["connections"]
+            if connection_fields is not None:
+                connections = [{key: connection[key] for key in connection_fields if key in connection}
+                               for connection in connections]
+            row = cell_index.get(absolute_id)
+            if row is None: #A repeated id replaces the earlier cell in place, like a dict update
+                row = cell_index[absolute_id] = len(cell_ids)
+                cell_ids.append(absolute_id)
+                relative_poses.append(cell["pose"])
+                type_codes.append(type_code)
+                zone_rows.append(zone_row)
+                cell_connections.append(connections)
+            else:
+                relative_poses[row] = cell["pose"]
+                type_codes[row] = type_code
+                zone_rows[row] = zone_row
+                cell_connections[row] = connections
+
+        self.type_names = list(type_lookup)
+        if self.vectorized is None:
+            self.vectorized = use_numpy(len(cell_ids))
+
+        #I am guessing that the pose of a cell is relative to the last one.
+        #So what we're doinge here is just successively adding all the poses (read vectors) to reach our final
+        #Absolute Pose - for all cells at once, each offset by the pose of its zone
+        if self.vectorized:
+            import numpy as np
+            self.cell_type_codes = np.array(type_codes, dtype=np.int16)
+            self.cell_zones = np.array(zone_rows, dtype=np.int32)
+            self.poses = np.zeros((0, 3), dtype=np.float64)
+            if cell_ids:
+                zone_pose_table = np.array(zone_poses, dtype=np.float64).reshape(-1, 3)
+                self.poses = np.array(relative_poses, dtype=np.float64).reshape(-1, 3) + zone_pose_table[self.cell_zones]
+        else:
+            self.cell_type_codes = type_codes
+            self.cell_zones = zone_rows
+            zone_pose_table = [[float(value) for value in zone_pose] for zone_pose in zone_poses]
+            self.poses = [
+                [float(x) + zone_pose[0], float(y) + zone_pose[1], float(theta) + zone_pose[2]]
+                for (x, y, theta), zone_pose in zip(relative_poses, (zone_pose_table[row] for row in zone_rows))
+            ]
+
+    #Scale x and y and subtract a rotation from theta for every cell in one pass (returns a new array):
+    def transform_poses(self, scale: float = 1.0, rotation: float = 0.0):
+        if self.vectorized:
+            import numpy as np
+            return self.poses * np.array([scale, scale, 1.0]) - np.array([0.0, 0.0, rotation])
+        return [[x * scale, y * scale, theta - rotation] for x, y, theta in self.poses]
 
     #All of these are Helper Functions that allow us to extract information from the floorplan more efficiently.
     def getCellFromId(self, id: str):
         return self.cells[id]
 
+    def getCellIndex(self, id: str):
+        return self.cell_index[id]
+
+    def getPoses(self):
+        return self.poses
+
+    def getCellTypes(self):
+        type_names = self.type_names
+        return [type_names[code] for code in self.cell_type_codes]
+
+    #Grid index over the cell poses, built once on first use:
+    def getSpatialIndex(self):
+        if self.spatial_index is None:
+            from Spatial_Index import Spatial_Index
+            self.spatial_index = Spatial_Index(self.poses)
+        return self.spatial_index
+
+    #CSR adjacency over the connects_to links, built once on first use:
+    def getConnectionGraph(self):
+        if self.connection_graph is None:
+            from Connection_Graph import Connection_Graph
+            self.connection_graph = Connection_Graph(self)
+        return self.connection_graph
+
+    #Absolute ids of the cells a cell connects to:
+    def getSuccessors(self, id: str):
+        cell_ids = self.cell_ids
+        return [cell_ids[row] for row in self.getConnectionGraph().successors(self.cell_index[id])]
+
+    #Absolute ids of the cells that connect to a cell:
+    def getPredecessors(self, id: str):
+        cell_ids = self.cell_ids
+        return [cell_ids[row] for row in self.getConnectionGraph().predecessors(self.cell_index[id])]
+
+    #(min_x, min_y, max_x, max_y) of all cell poses, None when there are no cells:
+    def getBounds(self):
+        if self.spatial_index is not None:
+            return self.spatial_index.bounds
+        return pose_bounds(self.poses)
+
+    #Cells whose pose lies inside the box, in cell order:
+    def getCellsInBox(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        return [Cell(self, row) for row in self.getSpatialIndex().query(min_x, min_y, max_x, max_y)]
+
+    #Cell closest to (x, y), or None:
+    def getNearestCell(self, x: float, y: float, max_distance: float = None):
+        row, _ = self.getSpatialIndex().nearest(x, y, max_distance)
+        return None if row is None else Cell(self, row)
+
     def getZoneFromId(self, id: str):
         return self.zones[id]
 
     def getCells(self):
         return self.cells
 
-    def getDirectionsList(self):
-        return self.directions.values()
-
 
 class Zone:
     def __init__(self, id: str, zone_type: str, zone_pose: List[float]):
         self.id = id
         self.zone_type = zone_type
-        self.zone_pose = np.array(zone_pose, dtype=np.float64)
+        self.zone_pose = [float(value) for value in zone_pose]
 
     def getId(self):
         return self.id
@@ -100,72 +234,88 @@ class Zone:
         return self.zone_type
 
     def getPose(self):
-        return self.pose
+        return self.zone_pose
+
+
+#Find the (x_min, y_min, x_max, y_max) of an (N, 3) pose array (or list of rows) in one pass:
+def pose_bounds(poses):
+    if len(poses) == 0:
+        return None
+    if isinstance(poses, list):
+        xs = [pose[0] for pose in poses]
+        ys = [pose[1] for pose in poses]
+        return (min(xs), min(ys), max(xs), max(ys))
+    x_min, y_min = poses[:, :2].min(axis=0)
+    x_max, y_max = poses[:, :2].max(axis=0)
+    return (x_min, y_min, x_max, y_max)
+
+
+class Cells(Mapping):
+    """
+    Read-only id -> Cell mapping over the columnar store of a Floorplan.
+    Cell views are created on access, so no per-cell objects are kept alive.
+    """
+
+    def __init__(self, floorplan: "Floorplan"):
+        self.floorplan = floorplan
+
+    def __getitem__(self, id: str):
+        return Cell(self.floorplan, self.floorplan.cell_index[id])
+
+    def __iter__(self):
+        return iter(self.floorplan.cell_ids)
+
+    def __len__(self):
+        return len(self.floorplan.cell_ids)
+
+    def values(self):
+        floorplan = self.floorplan
+        return (Cell(floorplan, row) for row in range(len(floorplan.cell_ids)))
 
 
 class Cell:
-    def __init__(
-        self, zone: str, id: str, cell_type: str, pose: List[float], connections: dict
-    ):
-        self.zone = zone
-        self.id = id
-        self.cell_type = cell_type
-        self.pose = np.array(pose, dtype=np.float64)
-        self.connections = connections
+    """
+    Light view of one row of the Floorplan cell store. pose is a view into Floorplan.poses.
+    """
 
-    def getId(self):
-        return self.id
+    __slots__ = ("floorplan", "index")
 
-    def getZoneId(self):
-        return self.zone.getId()
+    def __init__(self, floorplan: "Floorplan", index: int):
+        self.floorplan = floorplan
+        self.index = index
 
-    def getType(self):
-        return self.cell_type
+    @property
+    def zone(self):
+        floorplan = self.floorplan
+        return floorplan.zones[floorplan.zone_ids[floorplan.cell_zones[self.index]]]
 
-    def getPose(self):
-        return self.pose
+    @property
+    def id(self):
+        return self.floorplan.cell_ids[self.index]
 
-    def getConnections(self):
-        return self.connections
+    @property
+    def cell_type(self):
+        return self.floorplan.type_names[self.floorplan.cell_type_codes[self.index]]
 
+    @property
+    def pose(self):
+        return self.floorplan.poses[self.index]
 
-class Direction:
-    def __init__(
-        self,
-        id: str,
-        direction_id: str,
-        side: str,
-        direction_type: str,
-        cell_lookup: Dict[str, Cell],
-    ):
-        self.id = id
-        self.direction_id = direction_id
-        self.side = int(side)
-        self.direction_type = direction_type
-        self.cell_lookup = cell_lookup
-
-    def calculatePose(self, cell_height: float, direction_height: float, buffer: float = 0.05):
-        cell_pose = self.cell_lookup[self.id].getPose()
-        cell_xy = cell_pose[0:2]
-        theta = cell_pose[2]
-
-        xy_aligned = cell_xy - self.side * 0.5 * np.array(
-            [0, cell_height + direction_height + buffer]
-        )
-        xy = rotate(xy_aligned, cell_xy, theta)
-        self.pose = np.array([xy[0], xy[1], theta])
+    @property
+    def connections(self):
+        return self.floorplan.cell_connections[self.index]
 
     def getId(self):
         return self.id
 
-    def getDirectionId(self):
-        return self.direction_id
-
-    def getSide(self):
-        return self.side
+    def getZoneId(self):
+        return self.zone.getId()
 
     def getType(self):
-        return self.direction_type
+        return self.cell_type
 
     def getPose(self):
-        return self.pose
\ No newline at end of file
+        return self.pose
+
+    def getConnections(self):
+        return self.connections
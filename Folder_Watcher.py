@@ -0,0 +1,192 @@
+"""
+@Filename : Folder_Watcher.py
+@Brief : Watches a tree of plan folders and converts a folder again shortly after its floorplan or sortplan is saved
+@Author : Soumitra Pandit
+"""
+
+import os
+import sys
+import time
+import asyncio
+import multiprocessing
+from main import convert_job, discover_plan_folders
+
+#Seconds between two scans of the tree
+POLL_INTERVAL = 0.2
+
+#Seconds a folder's inputs must stay unchanged before it is converted, so a burst of saves gives one render
+DEBOUNCE = 0.3
+
+
+#Size and mtime of a file, None when it is gone:
+def _stat_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+#Runs in the render process: convert one folder and send the result back. A cancelled render is stopped
+#with SIGTERM, turned into SystemExit here so the partial output file is removed on the way out
+def _run_job(job, connection):
+    import signal
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    try:
+        connection.send(convert_job(*job))
+    finally:
+        connection.close()
+
+
+class Folder_Watcher:
+    """
+    Polls a tree of plan folders and converts every folder whose inputs changed, on an asyncio loop.
+
+    The inputs of a folder are the floorplan/sortplan pair discover_plan_folders (and so find_file_by_pattern)
+    picks; a folder counts as changed when that pair, or the size or mtime of either file, differs from the last
+    scan. A folder is converted once it has been quiet for debounce seconds. Each conversion runs convert_job in
+    its own process, at most max_concurrency at once. When a folder changes again while it is being converted,
+    that process is stopped and the folder waits for the next quiet period instead; the output it was writing
+    is left as it was before (see SVG_Floorplan.open_output).
+    """
+
+    def __init__(self, root_path: str, job_args: tuple = (), max_concurrency: int = 2, debounce: float = DEBOUNCE,
+                 poll_interval: float = POLL_INTERVAL, initial: bool = True, on_result=None):
+        """
+        Args:
+            root_path (str): Root of the tree to watch.
+            job_args (tuple): Arguments of convert_job after sortplan_file (cache_dir, cache_bytes, metrics, ...).
+            max_concurrency (int): Conversions running at once.
+            debounce (float): Quiet seconds before a changed folder is converted.
+            poll_interval (float): Seconds between scans.
+            initial (bool): Also convert every folder found by the first scan (the build cache skips the
+                            up to date ones).
+            on_result (callable): Called with every finished result dict (see convert_job) and with a result of
+                                  status "cancelled" for a stopped conversion; prints a line by default.
+        """
+        self.root_path = os.path.abspath(root_path)
+        self.job_args = tuple(job_args)
+        self.max_concurrency = max_concurrency
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.initial = initial
+        self.on_result = on_result or self.print_result
+        self.inputs = {} #Folder -> (floorplan_file, sortplan_file, signatures) of the last scan
+        self.pending = {} #Folder -> loop time of its last change, until it is converted
+        self.running = {} #Folder -> asyncio task of its conversion
+        self.slots = None #asyncio.Semaphore, created on the loop
+        self.conversions = 0
+        self.cancellations = 0
+
+    def scan(self):
+        """
+        Inputs of every plan folder in the tree.
+
+        Returns:
+            dict: folder -> (floorplan_file, sortplan_file, (floorplan signature, sortplan signature)).
+        """
+        return {folder: (floorplan_file, sortplan_file, (_stat_signature(floorplan_file), _stat_signature(sortplan_file)))
+                for folder, floorplan_file, sortplan_file in discover_plan_folders(self.root_path)}
+
+    def __update(self, now: float, first: bool = False):
+        #Rescan and mark changed folders; a change stops that folder's running conversion
+        inputs = self.scan()
+        for folder, entry in inputs.items():
+            if first:
+                if self.initial:
+                    self.pending[folder] = now
+                continue
+            if self.inputs.get(folder) == entry:
+                continue
+            self.pending[folder] = now
+            task = self.running.get(folder)
+            if task is not None:
+                task.cancel()
+        for folder in set(self.inputs) - set(inputs): #Folder or floorplan deleted
+            self.pending.pop(folder, None)
+        self.inputs = inputs
+
+    def __start_ready(self, now: float):
+        for folder, changed in list(self.pending.items()):
+            if now - changed < self.debounce or folder in self.running:
+                continue
+            del self.pending[folder]
+            floorplan_file, sortplan_file, _ = self.inputs[folder]
+            job = (folder, floorplan_file, sortplan_file) + self.job_args
+            self.running[folder] = asyncio.get_running_loop().create_task(self.__convert(folder, job))
+
+    async def __convert(self, folder: str, job: tuple):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.slots:
+                reader, writer = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_run_job, args=(job, writer), daemon=True)
+                start = time.perf_counter()
+                process.start()
+                writer.close()
+                try:
+                    #poll returns on the result or when the process ends without one
+                    await loop.run_in_executor(None, reader.poll, None)
+                    try:
+                        result = reader.recv()
+                    except EOFError:
+                        result = {"folder": folder, "status": "failed", "reason": "", "size": 0,
+                                  "seconds": time.perf_counter() - start,
+                                  "error": f"Render process exited with code {process.exitcode}"}
+                    self.conversions += 1
+                    self.on_result(result)
+                finally:
+                    if process.is_alive(): #Cancelled: the inputs changed while rendering
+                        process.terminate()
+                    await loop.run_in_executor(None, process.join)
+                    reader.close()
+        except asyncio.CancelledError:
+            self.cancellations += 1
+            reason = "inputs changed while rendering" if folder in self.pending else "watcher stopped"
+            self.on_result({"folder": folder, "status": "cancelled", "reason": reason,
+                            "seconds": 0.0, "size": 0, "error": ""})
+        finally:
+            self.running.pop(folder, None)
+
+    async def watch(self, duration: float = None):
+        """
+        Scan, debounce and convert until cancelled, or for duration seconds.
+        """
+        loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        stop = loop.time() + duration if duration is not None else None
+        self.__update(loop.time(), first=True)
+        try:
+            while stop is None or loop.time() < stop:
+                self.__start_ready(loop.time())
+                await asyncio.sleep(self.poll_interval)
+                self.__update(loop.time())
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
+        finally:
+            for task in list(self.running.values()):
+                task.cancel()
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+    def run(self, duration: float = None):
+        """
+        Watch on a new event loop until interrupted (Ctrl+C), or for duration seconds.
+        """
+        print(f"Watching {self.root_path} ({len(self.scan())} plan folder(s)), press Ctrl+C to stop")
+        try:
+            asyncio.run(self.watch(duration))
+        except KeyboardInterrupt:
+            pass
+        print(f"{self.conversions} conversion(s), {self.cancellations} cancelled")
+
+    def print_result(self, result: dict):
+        """
+        Print one line per finished or cancelled conversion.
+        """
+        name = os.path.relpath(result["folder"], self.root_path)
+        detail = result["error"] or result["reason"]
+        if result["status"] == "cancelled":
+            print(f"{time.strftime('%H:%M:%S')} {name}: cancelled ({detail})")
+        else:
+            print(f"{time.strftime('%H:%M:%S')} {name}: {result['status']} ({detail}), {result['seconds']:.3f}s, "
+                  f"{result['size'] / 1024:.1f} KB")
+        sys.stdout.flush()
@@ -0,0 +1,119 @@
+"""
+@Filename : Geometry.py
+@Brief : Batched NumPy geometry for floorplan elements (rotated rectangles, arrow segments, path data)
+@Author : Soumitra Pandit
+"""
+
+import numpy as np
+from SVG_Stream import COMPACT_NUMBER
+
+
+def rotate_points(points, centers, theta):
+    """
+    Rotate points around per-element centers, the same way SVG's rotate(angle, cx, cy) does.
+
+    Args:
+        points (np.ndarray): (N, K, 2) points, K points per element.
+        centers (np.ndarray): (N, 2) rotation center of every element.
+        theta (np.ndarray): (N,) rotation of every element in radians.
+
+    Returns:
+        np.ndarray: (N, K, 2) rotated points.
+    """
+    cos = np.cos(theta)[:, None]
+    sin = np.sin(theta)[:, None]
+    dx = points[:, :, 0] - centers[:, None, 0]
+    dy = points[:, :, 1] - centers[:, None, 1]
+    rotated = np.empty_like(points, dtype=np.float64)
+    rotated[:, :, 0] = cos * dx - sin * dy + centers[:, None, 0]
+    rotated[:, :, 1] = sin * dx + cos * dy + centers[:, None, 1]
+    return rotated
+
+
+def rect_corners(top_left, width, height, centers, theta):
+    """
+    Corner points of rectangles given as SVG rect attributes plus a rotate(theta, center) transform.
+
+    Args:
+        top_left (np.ndarray): (N, 2) unrotated x, y of every rect.
+        width (float | np.ndarray): Rect width, scalar or (N,).
+        height (float | np.ndarray): Rect height, scalar or (N,).
+        centers (np.ndarray): (N, 2) rotation centers.
+        theta (np.ndarray): (N,) rotations in radians.
+
+    Returns:
+        np.ndarray: (N, 4, 2) corners in drawing order (top left, top right, bottom right, bottom left).
+    """
+    num = len(top_left)
+    width = np.broadcast_to(np.asarray(width, dtype=np.float64), (num,))
+    height = np.broadcast_to(np.asarray(height, dtype=np.float64), (num,))
+    corners = np.empty((num, 4, 2), dtype=np.float64)
+    corners[:, :, 0] = top_left[:, None, 0]
+    corners[:, :, 1] = top_left[:, None, 1]
+    corners[:, 1:3, 0] += width[:, None]
+    corners[:, 2:4, 1] += height[:, None]
+    return rotate_points(corners, centers, theta)
+
+
+def segment_ends(starts, length, theta):
+    """
+    End points of segments of a fixed length starting at each point and pointing along theta.
+
+    Args:
+        starts (np.ndarray): (N, 2) start points.
+        length (float): Segment length.
+        theta (np.ndarray): (N,) directions in radians.
+
+    Returns:
+        np.ndarray: (N, 2, 2) start and end point of every segment.
+    """
+    segments = np.empty((len(starts), 2, 2), dtype=np.float64)
+    segments[:, 0] = starts
+    segments[:, 1, 0] = starts[:, 0] + np.cos(theta) * length
+    segments[:, 1, 1] = starts[:, 1] + np.sin(theta) * length
+    return segments
+
+
+def path_data(shapes, closed: bool = True, precision: int = 2, compact: bool = False):
+    """
+    SVG path data for each shape.
+
+    Args:
+        shapes (np.ndarray): (N, K, 2) points of N shapes.
+        closed (bool): Close every shape with Z.
+        precision (int): Decimal places written per coordinate.
+        compact (bool): Drop trailing zeros and the spaces between commands.
+
+    Returns:
+        list: One "M x,y L x,y ..." string per shape ("Mx,yLx,y..." when compact).
+    """
+    num, points, _ = shapes.shape
+    if num == 0:
+        return []
+    number = COMPACT_NUMBER if compact else f"%.{precision}f"
+    space = "" if compact else " "
+    template = f"M{number},{number}" + f"{space}L{number},{number}" * (points - 1) + (f"{space}Z" if closed else "")
+    #round first so that -0.00 is written as 0.00
+    flat = (np.round(shapes, precision) + 0.0).reshape(num, points * 2).tolist()
+    return [template % tuple(row) for row in flat]
+
+
+def placement_transforms(centers, theta, precision: int = 2, compact: bool = False):
+    """
+    translate/rotate transforms that place a shape defined around the origin at each center.
+
+    Args:
+        centers (np.ndarray): (N, 2) placement points.
+        theta (np.ndarray): (N,) rotations in radians.
+        precision (int): Decimal places written per number.
+        compact (bool): Drop trailing zeros.
+
+    Returns:
+        list: One "translate(x,y) rotate(deg)" string per placement.
+    """
+    if len(centers) == 0:
+        return []
+    number = COMPACT_NUMBER if compact else f"%.{precision}f"
+    template = f"translate({number},{number}) rotate({number})"
+    values = np.round(np.column_stack([centers, np.degrees(theta)]), precision) + 0.0
+    return [template % tuple(row) for row in values.tolist()]
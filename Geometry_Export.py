@@ -0,0 +1,258 @@
+"""
+@Filename : Geometry_Export.py
+@Brief : Writes the computed geometry of an SVG_Floorplan as packed binary arrays with interned id/type tables, and maps it back without parsing
+@Author : Soumitra Pandit
+"""
+
+import mmap
+import struct
+import numpy as np
+
+#First bytes of every file; the \r\n catches a copy that went through text mode line ending conversion
+MAGIC = b"FPGEOM\r\n"
+
+#Format version, raised whenever a section changes meaning
+VERSION = 1
+
+#Magic, version and number of sections
+HEADER = struct.Struct("<8sII")
+
+#Per section: name, numpy dtype string, byte offset, rows, columns (0 for a flat array)
+SECTION = struct.Struct("<16s8sQQQ")
+
+#Every section starts at a multiple of this, so float64 arrays can be mapped in place
+ALIGNMENT = 16
+
+#Dimensions written to the dims section, in drawing units, in this order
+DIMENSION_NAMES = ("scale", "node_width", "node_height", "node_offset", "bin_width", "bin_height", "bin_offset",
+                   "stroke_width")
+
+#File name suffix of an exported geometry
+GEOMETRY_SUFFIX = ".geom"
+
+
+#Strings interned in order of first use, as a (K + 1) offsets array over one UTF-8 blob:
+def string_table(strings):
+    data = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(data) + 1, dtype="<u4")
+    np.cumsum([len(item) for item in data], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(data), dtype=np.uint8)
+
+
+def _intern(values, table: dict):
+    #Index of every value in table, adding the ones not seen yet
+    return np.fromiter((table.setdefault(value, len(table)) for value in values), dtype="<u4", count=len(values))
+
+
+class Geometry_Export:
+    """
+    Exports the drawing of an SVG_Floorplan as one binary file that can be memory-mapped and read in place.
+
+    The arrays are the ones the renderer draws from: node_coords and bin_coords (scaled and rotated by the
+    output_gate_1 zone, see __extract_node_coords and __extract_bin_info), the arrow ends of
+    compute_geometry and, with edges set, the links of compute_edge_geometry (empty sections otherwise).
+    Cell and bin ids share one interned string table, node and bin types another.
+
+    Layout (little-endian): header, section table, then every section aligned to 16 bytes.
+        node_poses  f8 (N, 3)  x, y, theta (radians) of every node, in drawing order
+        node_ids    u4 (N,)    index into the id table
+        node_types  u4 (N,)    index into the type table
+        arrows      f8 (N, 4)  x1, y1, x2, y2 of the arrow of every node
+        bin_poses   f8 (M, 3)  pose of the node every bin belongs to
+        bin_ids     u4 (M,)    index into the id table (key/sub_id for the bins of double sided cells)
+        bin_types   u4 (M,)    index into the type table
+        bin_sides   i1 (M,)    -1 left, 1 right
+        bin_nodes   u4 (M,)    position of the bin's node in the node arrays
+        edge_ends   f8 (E, 4)  x1, y1, x2, y2 of every drawn link
+        edge_offsets u4 (E + 1,) control points of link i are edge_points[offsets[i]:offsets[i + 1]]
+        edge_points f8 (P, 2)  control points of all links
+        id_offsets, id_data, type_offsets, type_data   string tables, see string_table
+        dims        f8 (8,)    DIMENSION_NAMES
+    """
+
+    def __init__(self, converter):
+        self.converter = converter
+        self.bytes_written = 0
+
+    def sections(self):
+        """
+        Every section as (name, array), in file order.
+        """
+        converter = self.converter
+        ids = {}
+        types = {}
+        node_poses = np.asarray(converter.node_coords, dtype="<f8").reshape(-1, 3)
+        arrows = np.asarray(converter.compute_geometry()["arrows"], dtype="<f8").reshape(-1, 4)
+        node_ids = _intern(converter.node_ids, ids)
+        node_types = _intern(converter.node_types, types)
+        bin_rows = converter.bin_rows
+        if converter.crop_positions is not None: #Rows of the floorplan -> positions among the cropped nodes
+            bin_rows = [converter.crop_positions[row] for row in bin_rows]
+        bin_nodes = np.asarray(bin_rows, dtype="<u4").reshape(-1)
+        sections = [
+            ("node_poses", node_poses),
+            ("node_ids", node_ids),
+            ("node_types", node_types),
+            ("arrows", arrows),
+            ("bin_poses", np.asarray(converter.bin_coords, dtype="<f8").reshape(-1, 3)),
+            ("bin_ids", _intern(converter.bin_ids, ids)),
+            ("bin_types", _intern(converter.bin_types, types)),
+            ("bin_sides", np.asarray(converter.bin_sides, dtype="i1").reshape(-1)),
+            ("bin_nodes", bin_nodes),
+        ]
+        edges = converter.compute_edge_geometry() if converter.edges else None
+        if edges is None:
+            edges = {"starts": np.empty((0, 2)), "ends": np.empty((0, 2)), "point_offsets": np.zeros(1),
+                     "points": np.empty((0, 2))}
+        sections += [
+            ("edge_ends", np.hstack([edges["starts"], edges["ends"]]).astype("<f8")),
+            ("edge_offsets", np.asarray(edges["point_offsets"], dtype="<u4")),
+            ("edge_points", np.asarray(edges["points"], dtype="<f8").reshape(-1, 2)),
+        ]
+        for name, table in (("id", ids), ("type", types)):
+            offsets, data = string_table(table)
+            sections += [(f"{name}_offsets", offsets), (f"{name}_data", data)]
+        sections.append(("dims", np.array([getattr(converter, name) for name in DIMENSION_NAMES], dtype="<f8")))
+        return sections
+
+    def write(self, fileobj):
+        """
+        Write the file to a binary file-like object.
+        """
+        sections = self.sections()
+        position = HEADER.size + SECTION.size * len(sections)
+        table = []
+        for name, array in sections:
+            position = -(-position // ALIGNMENT) * ALIGNMENT
+            columns = array.shape[1] if array.ndim == 2 else 0
+            table.append(SECTION.pack(name.encode(), array.dtype.str.encode(), position, array.shape[0], columns))
+            position += array.nbytes
+        fileobj.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+        fileobj.write(b"".join(table))
+        written = HEADER.size + SECTION.size * len(sections)
+        for name, array in sections:
+            padding = -written % ALIGNMENT
+            fileobj.write(b"\0" * padding)
+            fileobj.write(np.ascontiguousarray(array).data)
+            written += padding + array.nbytes
+        self.bytes_written = written
+        return self
+
+    def save(self, geometry_file: str):
+        """
+        Write the file to geometry_file.
+        """
+        with open(geometry_file, "wb") as fileobj:
+            return self.write(fileobj)
+
+    def verify(self, geometry_file: str):
+        """
+        Read geometry_file back through Geometry_Reader and compare every section with the converter.
+        Not part of save(): a check for tests and debugging, which reads the whole file a second time.
+
+        Raises:
+            ValueError: Naming every section that does not round-trip.
+        """
+        with Geometry_Reader(geometry_file) as reader:
+            expected = self.sections()
+            mismatched = [name for name, array in expected
+                          if name not in reader.names or not np.array_equal(reader.array(name), array)]
+            if reader.node_ids() != list(self.converter.node_ids):
+                mismatched.append("node ids")
+            if reader.bin_ids() != list(self.converter.bin_ids):
+                mismatched.append("bin ids")
+        if mismatched:
+            raise ValueError(f"Geometry in {geometry_file} does not round-trip: {', '.join(mismatched)}")
+        return self
+
+
+class Geometry_Reader:
+    """
+    Memory-maps a file written by Geometry_Export. array(name) is a read-only numpy view straight onto the
+    mapping, so nothing is parsed or copied until it is used; ids and types are decoded on request.
+
+    Use as a context manager, or call close(), once the arrays taken from it are no longer needed.
+    """
+
+    def __init__(self, geometry_file: str):
+        """
+        Args:
+            geometry_file (str): File written by Geometry_Export.save.
+
+        Raises:
+            ValueError: When the file is not a geometry export of this version.
+        """
+        with open(geometry_file, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count = HEADER.unpack_from(self.buffer, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{geometry_file} is not a geometry export")
+            if version != VERSION:
+                raise ValueError(f"{geometry_file} has format version {version}, this reader reads {VERSION}")
+            self.sections = {}
+            for index in range(count):
+                name, dtype, offset, rows, columns = SECTION.unpack_from(self.buffer, HEADER.size + SECTION.size * index)
+                self.sections[name.rstrip(b"\0").decode()] = (dtype.rstrip(b"\0").decode(), offset, rows, columns)
+        except (ValueError, struct.error):
+            self.buffer.close()
+            raise
+        self.names = tuple(self.sections)
+        self.__strings = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.__strings = {}
+        self.buffer.close()
+
+    def array(self, name: str):
+        """
+        Read-only view of one section, (rows, columns) or (rows,), without copying.
+        """
+        dtype, offset, rows, columns = self.sections[name]
+        array = np.frombuffer(self.buffer, dtype=dtype, count=rows * max(columns, 1), offset=offset)
+        return array.reshape(rows, columns) if columns else array
+
+    def strings(self, table: str):
+        """
+        Every string of the "id" or "type" table, decoded once.
+        """
+        if table not in self.__strings:
+            offsets = self.array(f"{table}_offsets").tolist()
+            data = bytes(self.array(f"{table}_data"))
+            self.__strings[table] = [data[start:stop].decode("utf-8") for start, stop in zip(offsets, offsets[1:])]
+        return self.__strings[table]
+
+    def string(self, table: str, index: int):
+        """
+        One string of the "id" or "type" table, decoded without touching the others.
+        """
+        offsets = self.array(f"{table}_offsets")
+        return bytes(self.array(f"{table}_data")[offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+    def node_ids(self):
+        ids = self.strings("id")
+        return [ids[index] for index in self.array("node_ids").tolist()]
+
+    def node_types(self):
+        types = self.strings("type")
+        return [types[index] for index in self.array("node_types").tolist()]
+
+    def bin_ids(self):
+        ids = self.strings("id")
+        return [ids[index] for index in self.array("bin_ids").tolist()]
+
+    def bin_types(self):
+        types = self.strings("type")
+        return [types[index] for index in self.array("bin_types").tolist()]
+
+    def dimensions(self):
+        """
+        DIMENSION_NAMES -> value.
+        """
+        return dict(zip(DIMENSION_NAMES, self.array("dims").tolist()))
@@ -0,0 +1,87 @@
+"""
+@Filename : JSON_Loader.py
+@Brief : Shared JSON loading for floorplans and sortplans, so every document is parsed exactly once
+@Author : Soumitra Pandit
+"""
+
+import sys
+import json
+
+#orjson is optional: it is picked up automatically when installed and parses bytes directly.
+#Importing it costs more than parsing a typical plan with json, so it is only imported for documents
+#of at least this many bytes, or used right away when something else already imported it.
+ORJSON_MIN_BYTES = 1 << 20
+
+_orjson_loads = None
+_orjson_checked = False
+
+
+def _fast_loads():
+    global _orjson_loads, _orjson_checked
+    if not _orjson_checked:
+        _orjson_checked = True
+        try:
+            import orjson
+            _orjson_loads = orjson.loads
+        except ImportError:
+            _orjson_loads = None
+    return _orjson_loads
+
+
+def json_backend(size: int = ORJSON_MIN_BYTES):
+    """
+    Name of the parser used for a document of the given size: "orjson" or "json".
+    """
+    if size >= ORJSON_MIN_BYTES or "orjson" in sys.modules:
+        if _fast_loads() is not None:
+            return "orjson"
+    return "json"
+
+
+def parse(raw):
+    """
+    Parse a raw JSON document.
+
+    Args:
+        raw (bytes | bytearray | memoryview | str): The document text.
+
+    Returns:
+        The parsed document.
+    """
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    if json_backend(len(raw)) == "orjson":
+        return _orjson_loads(raw)
+    return json.loads(raw)
+
+
+def load_file(path: str):
+    """
+    Read and parse a JSON file. The file is read as bytes and closed before parsing.
+
+    Args:
+        path (str): Path to the JSON file.
+
+    Returns:
+        The parsed document.
+    """
+    with open(path, "rb") as json_file:
+        raw = json_file.read()
+    return parse(raw)
+
+
+def load_document(source):
+    """
+    Accept an already parsed document or raw JSON and return the parsed document.
+
+    Args:
+        source (dict | list | bytes | bytearray | memoryview | str): A parsed document or raw JSON text.
+
+    Returns:
+        The parsed document. Parsed input is returned as is, without copying.
+    """
+    if isinstance(source, (dict, list)):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview, str)):
+        return parse(source)
+    raise TypeError(f"Cannot load a JSON document from {type(source).__name__}")
@@ -0,0 +1,218 @@
+"""
+@Filename : JSON_Stream.py
+@Brief : Incremental JSON reader that walks large floorplan/sortplan files one small value at a time
+@Author : Soumitra Pandit
+"""
+
+import os
+import io
+import json
+from contextlib import nullcontext
+
+#Characters read from the file per refill
+CHUNK_CHARS = 1 << 20
+
+#Inputs of at least this many bytes are streamed by default instead of being parsed whole
+STREAM_MIN_BYTES = 256 * 1024 * 1024
+
+#Zone fields that have to be known before the zone's nodes can be passed on
+ZONE_HEADER_FIELDS = ("id", "type", "pose")
+
+#Most characters a number cut off by a chunk boundary leaves after the part raw_decode accepts ("1e-" -> 1, "e-")
+MAX_NUMBER_TAIL = 2
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789+-.eE"
+_decoder = json.JSONDecoder()
+
+
+#Whether a file is large enough to be streamed rather than parsed whole:
+def use_streaming(path: str):
+    return path is not None and os.path.getsize(path) >= STREAM_MIN_BYTES
+
+
+class JSON_Stream:
+    """
+    Reads a JSON document from a text file object in chunks. Containers are walked with iter_object()
+    and iter_array(); everything else is decoded with value(), which only needs that one value in memory.
+    Consumed input is dropped on every refill, so memory stays bounded by the largest single value read.
+    """
+
+    def __init__(self, fileobj, chunk_chars: int = CHUNK_CHARS):
+        self.fileobj = fileobj
+        self.chunk_chars = chunk_chars
+        self.buffer = ""
+        self.pos = 0
+        self.consumed = 0 #Characters dropped from the front of the buffer, for error offsets
+        self.eof = False
+
+    def __fill(self):
+        chunk = self.fileobj.read(self.chunk_chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def __error(self, expected: str):
+        found = self.buffer[self.pos:self.pos + 20] or "end of input"
+        return ValueError(f"Expected {expected} at offset {self.consumed + self.pos}, found {found!r}")
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character without consuming it ("" at the end of input).
+        """
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer) or not self.__fill():
+                return buffer[pos] if pos < len(buffer) else ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise self.__error(f"'{char}'")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode the next complete value (object, array, string, number or literal).
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self.__fill(): #Only a value cut off by the chunk boundary is worth a retry
+                    raise self.__error("a JSON value")
+                continue
+            #A value ending near the end of the buffer (a number in particular) may go on in the next chunk
+            if (end >= len(self.buffer) - MAX_NUMBER_TAIL and not self.eof and self.__may_continue(value, end)
+                    and self.__fill()):
+                continue
+            self.pos = end
+            return value
+
+    def __may_continue(self, value, end: int):
+        #Whether the value decoded up to end could be the start of a longer one once the next chunk is read:
+        #anything ending at the end of the buffer, or a number followed only by a cut off "." or "e"/"e-"
+        buffer = self.buffer
+        if end == len(buffer):
+            return True
+        return (type(value) in (int, float) and len(buffer) - end <= MAX_NUMBER_TAIL
+                and not buffer[end:].strip(_NUMBER_CHARS))
+
+    def __separator(self, close: str):
+        char = self.peek()
+        self.pos += 1
+        if char == close:
+            return False
+        if char != ",":
+            self.pos -= 1
+            raise self.__error(f"',' or '{close}'")
+        return True
+
+    def iter_object(self):
+        """
+        Yield the keys of the next object. The caller consumes each key's value (value(), iter_object() or
+        iter_array()) before asking for the next key.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self.__error("an object key")
+            key = self.value()
+            self.expect(":")
+            yield key
+            if not self.__separator("}"):
+                return
+
+    def iter_array(self):
+        """
+        Yield once per item of the next array; the caller consumes the item before the next iteration.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if not self.__separator("]"):
+                return
+
+
+def _open(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "r", encoding="utf-8")
+    if isinstance(source, io.TextIOBase):
+        return nullcontext(source)
+    return nullcontext(io.TextIOWrapper(source, encoding="utf-8")) #Binary file object
+
+
+def iter_zone_events(source):
+    """
+    Walk zones[*].nodes[*] of a floorplan without loading the document.
+
+    Args:
+        source (str | file): Path or file object of the floorplan JSON.
+
+    Returns:
+        generator: ("zone", zone fields without "nodes") followed by ("node", node dict) for each of its
+                   nodes. Nodes are passed on as they are read; only when a zone lists its nodes before its
+                   id, type or pose are that zone's nodes held back until the zone is complete.
+    """
+    with _open(source) as fileobj:
+        stream = JSON_Stream(fileobj)
+        found = False
+        for key in stream.iter_object():
+            if key != "zones":
+                stream.value()
+                continue
+            found = True
+            for _ in stream.iter_array():
+                zone = {}
+                held_back = None
+                announced = False
+                for zone_key in stream.iter_object():
+                    if zone_key != "nodes":
+                        zone[zone_key] = stream.value()
+                        continue
+                    announced = all(field in zone for field in ZONE_HEADER_FIELDS)
+                    if announced:
+                        yield "zone", zone
+                    else:
+                        held_back = []
+                    for _ in stream.iter_array():
+                        node = stream.value()
+                        if announced:
+                            yield "node", node
+                        else:
+                            held_back.append(node)
+                if not announced:
+                    if held_back is None:
+                        raise KeyError("nodes")
+                    yield "zone", zone
+                    for node in held_back:
+                        yield "node", node
+        if not found:
+            raise Exception("No zones in design")
+
+
+def iter_object_items(source):
+    """
+    Yield (key, value) for every member of a top-level object (e.g. a sortplan), one value at a time.
+
+    Args:
+        source (str | file): Path or file object of the JSON document.
+    """
+    with _open(source) as fileobj:
+        stream = JSON_Stream(fileobj)
+        for key in stream.iter_object():
+            yield key, stream.value()
@@ -0,0 +1,103 @@
+"""
+@Filename : Metrics.py
+@Brief : Observer API for conversion phases, counters and events, plus a recorder that writes them to JSON
+@Author : Soumitra Pandit
+"""
+
+import sys
+import json
+
+
+class Observer:
+    """
+    Receives instrumentation from SVG_Floorplan and main. Subclasses override the hooks they need;
+    the defaults do nothing. Observers are only called when attached, so a conversion without
+    observers pays for one empty loop per phase.
+    """
+
+    def phase(self, name: str, seconds: float, peak_bytes: int = None):
+        """
+        A phase finished (load, extract, bins, draw, flip, save).
+
+        Args:
+            name (str): Phase name.
+            seconds (float): Wall time of the phase.
+            peak_bytes (int): Peak traced memory of the phase, None unless tracemalloc is tracing.
+        """
+
+    def count(self, name: str, value: int):
+        """
+        A counter went up by value (cells, bins, elements, bytes_written, cache_hits, ...).
+        """
+
+    def event(self, name: str, value):
+        """
+        Something worth knowing happened, e.g. the zone pose that was applied.
+        """
+
+
+class Metrics_Recorder(Observer):
+    """
+    Collects everything it observes: per-phase time, calls and memory peak, summed counters and events.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.events = []
+        self.peak_rss_bytes = None #Largest peak of merged worker processes
+
+    def phase(self, name: str, seconds: float, peak_bytes: int = None):
+        span = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_bytes": None})
+        span["seconds"] += seconds
+        span["calls"] += 1
+        if peak_bytes is not None:
+            span["peak_bytes"] = max(span["peak_bytes"] or 0, peak_bytes)
+
+    def count(self, name: str, value: int):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def event(self, name: str, value):
+        self.events.append({"name": name, "value": value})
+
+    def merge(self, metrics: dict):
+        """
+        Add the metrics of another recorder, given as to_dict() output (e.g. from a worker process).
+        """
+        for name, span in metrics.get("phases", {}).items():
+            total = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_bytes": None})
+            total["seconds"] += span["seconds"]
+            total["calls"] += span["calls"]
+            if span["peak_bytes"] is not None:
+                total["peak_bytes"] = max(total["peak_bytes"] or 0, span["peak_bytes"])
+        for name, value in metrics.get("counters", {}).items():
+            self.count(name, value)
+        self.events.extend(metrics.get("events", []))
+        if metrics.get("peak_rss_bytes") is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, metrics["peak_rss_bytes"])
+
+    def to_dict(self):
+        peak = peak_rss_bytes()
+        if self.peak_rss_bytes is not None:
+            peak = max(peak or 0, self.peak_rss_bytes)
+        return {"phases": self.phases, "counters": self.counters, "events": self.events, "peak_rss_bytes": peak}
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process in bytes, or None where the resource module is missing.
+    """
+    try:
+        import resource
+    except ImportError: #Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 #ru_maxrss is in KB on Linux
+
+
+def write_metrics(path: str, metrics: dict):
+    """
+    Write a metrics document as indented JSON.
+    """
+    with open(path, "w") as f:
+        json.dump(metrics, f, indent=2)
@@ -0,0 +1,171 @@
+"""
+@Filename : Plan_Generator.py
+@Brief : Generates valid synthetic floorplan/sortplan JSON pairs of any size for benchmarking
+@Author : Soumitra Pandit
+"""
+
+import os
+import json
+import argparse
+
+#Cells per output gate zone; larger plans get more zones
+CELLS_PER_ZONE = 5000
+
+#Share of all cells that go into the input gate zone
+INPUT_SHARE = 0.02
+
+#Nodes per lane, distance between nodes and between lanes (in Meters)
+LANE_LENGTH = 50
+NODE_SPACING = 1.0
+LANE_SPACING = 2.5
+
+ZONE_CONSTRAINTS = {
+    "max_velocity": 1,
+    "max_lateral_acceleration": 0.8,
+    "max_corner_size": 1,
+    "max_longitudinal_acceleration": 0.8,
+    "max_longitudinal_deceleration": 0.6,
+}
+
+
+def plan_zones(num_cells: int):
+    """
+    Split num_cells over output gate zones and one input gate zone.
+
+    Returns:
+        list: (zone_id, num_nodes, x_offset) per zone. output_gate_1 always exists.
+    """
+    num_input = min(num_cells - 1, max(1, int(num_cells * INPUT_SHARE))) if num_cells > 1 else 0
+    num_output = num_cells - num_input
+    num_zones = max(1, -(-num_output // CELLS_PER_ZONE))
+    zone_width = (LANE_LENGTH + 5) * NODE_SPACING
+    zones = []
+    for idx in range(num_zones):
+        count = num_output // num_zones + (idx < num_output % num_zones)
+        zones.append((f"output_gate_{idx + 1}", count, idx * zone_width))
+    if num_input:
+        zones.append(("input_gate_1", num_input, num_zones * zone_width))
+    return zones
+
+
+def iter_zone_nodes(zone_id: str, num_nodes: int):
+    """
+    Yield (node, sortplan entry) for every node of a zone. Nodes run in serpentine lanes; each node
+    connects to the next one, and the turn at every lane end carries control points.
+
+    Returns:
+        generator: (node dict, sortplan entry dict or None)
+    """
+    is_input = zone_id.startswith("input")
+    for idx in range(num_nodes):
+        lane, position = divmod(idx, LANE_LENGTH)
+        forward = lane % 2 == 0
+        x = (position if forward else LANE_LENGTH - 1 - position) * NODE_SPACING
+        y = lane * LANE_SPACING
+        theta = 0.0 if forward else 3.14
+        node_id = f"node_{idx:06d}"
+
+        if idx == 0:
+            node_type = "init"
+        elif position in (0, LANE_LENGTH - 1):
+            node_type = "entry_and_exit"
+        else:
+            node_type = "target"
+
+        connections = []
+        if idx + 1 < num_nodes:
+            turn = position == LANE_LENGTH - 1
+            connections.append({
+                "connects_to": f"node_{idx + 1:06d}",
+                "reachable_from": [f"node_{idx - 1:06d}"] if idx else [node_id],
+                "type": "normal",
+                "blocking_neighbours": [f"node_{idx + LANE_LENGTH:06d}"] if turn and idx + LANE_LENGTH < num_nodes else [],
+                "control_points": [[x + (0.8 if forward else -0.8), y + LANE_SPACING / 2]] if turn else [],
+            })
+
+        node = {
+            "id": node_id,
+            "type": node_type,
+            "clear_distance": 0.3,
+            "pose": [x, y, theta],
+            "connections": connections,
+        }
+
+        if is_input:
+            entry = {"type": "input"}
+        elif node_type == "target":
+            container = {"type": "dropoff-box", "blocking_nodes": []}
+            sub_directions = {f"{idx:06d}": {"side": -1 if lane % 2 else 1, "container": container}}
+            if idx % 5 == 0: #Every fifth node has a bin on both sides
+                sub_directions[f"{idx:06d}b"] = {"side": 1 if lane % 2 else -1, "container": dict(container)}
+            entry = {"type": "output", "sub_directions": sub_directions}
+        else:
+            entry = None
+        yield node, entry
+
+
+def generate_plan(num_cells: int):
+    """
+    Build a synthetic floorplan/sortplan pair in memory.
+
+    Args:
+        num_cells (int): Total number of nodes over all zones.
+
+    Returns:
+        tuple: (floorplan dict, sortplan dict)
+    """
+    zones = []
+    sortplan = {}
+    for zone_id, num_nodes, x_offset in plan_zones(num_cells):
+        nodes = []
+        for node, entry in iter_zone_nodes(zone_id, num_nodes):
+            nodes.append(node)
+            if entry is not None:
+                sortplan[f"/{zone_id}/{node['id']}"] = entry
+        zones.append({"id": zone_id, "constraints": dict(ZONE_CONSTRAINTS), "pose": [x_offset, 0, 0],
+                      "type": "fixed", "nodes": nodes})
+    return {"zones": zones, "info": {"generator": "Plan_Generator", "cells": num_cells}}, sortplan
+
+
+def write_plan(folder_path: str, num_cells: int, name: str = None):
+    """
+    Write a synthetic floorplan/sortplan pair node by node, so even 1M cell plans never sit in memory whole.
+
+    Args:
+        folder_path (str): Folder to write into (created if missing).
+        num_cells (int): Total number of nodes.
+        name (str): Suffix of the file names, defaults to the cell count.
+
+    Returns:
+        tuple: (floorplan_file, sortplan_file)
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    name = name or str(num_cells)
+    floorplan_file = os.path.join(folder_path, f"floorplan_{name}.json")
+    sortplan_file = os.path.join(folder_path, f"sortplan_{name}.json")
+    with open(floorplan_file, "w") as floorplan, open(sortplan_file, "w") as sortplan:
+        floorplan.write('{"zones": [')
+        sortplan.write("{")
+        first_entry = True
+        for zone_idx, (zone_id, num_nodes, x_offset) in enumerate(plan_zones(num_cells)):
+            header = json.dumps({"id": zone_id, "constraints": ZONE_CONSTRAINTS, "pose": [x_offset, 0, 0],
+                                 "type": "fixed"})
+            floorplan.write(("," if zone_idx else "") + header[:-1] + ', "nodes": [')
+            for node_idx, (node, entry) in enumerate(iter_zone_nodes(zone_id, num_nodes)):
+                floorplan.write(("," if node_idx else "") + json.dumps(node))
+                if entry is not None:
+                    sortplan.write(("" if first_entry else ",") + json.dumps(f"/{zone_id}/{node['id']}") + ":" + json.dumps(entry))
+                    first_entry = False
+            floorplan.write("]}")
+        floorplan.write('], "info": ' + json.dumps({"generator": "Plan_Generator", "cells": num_cells}) + "}")
+        sortplan.write("}")
+    return floorplan_file, sortplan_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic floorplan/sortplan pair.")
+    parser.add_argument("folder_path", help="Folder to write floorplan_<cells>.json and sortplan_<cells>.json into")
+    parser.add_argument("--cells", type=int, default=1000, help="Number of nodes (100 to 1000000 and beyond)")
+    args = parser.parse_args()
+    for path in write_plan(args.folder_path, args.cells):
+        print(f"Wrote {path} ({os.path.getsize(path) / 1024:.1f} KB)")
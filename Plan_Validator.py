@@ -0,0 +1,405 @@
+"""
+@Filename : Plan_Validator.py
+@Brief : Checks a parsed floorplan/sortplan pair for structure, types and broken references in one pass, reporting every problem
+@Author : Soumitra Pandit
+"""
+
+from array import array
+from bisect import bisect_right
+
+#Zone the renderer takes its rotation from
+REFERENCE_ZONE = "output_gate_1"
+
+#Sides a bin can sit on (-1 left, 1 right)
+BIN_SIDES = (-1, 1)
+
+#JSON numbers as parsed (bool is not one of them)
+NUMBER_TYPES = (int, float)
+
+#Problems named in the message of a Plan_Validation_Error, the rest are only counted
+MESSAGE_LIMIT = 10
+
+
+def _is_str(value):
+    return type(value) is str
+
+
+def _is_list(value):
+    return type(value) is list
+
+
+def _is_dict(value):
+    return type(value) is dict
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+#x, y and theta:
+def _is_pose(value):
+    return type(value) is list and len(value) == 3 and all(type(item) in (int, float) for item in value)
+
+
+#x and y of a control point:
+def _is_point(value):
+    return type(value) is list and len(value) == 2 and all(type(item) in (int, float) for item in value)
+
+
+def _compile(fields):
+    #(key, test, expected) per required field, built once so a check is a dict lookup and one call per field
+    expected_names = {_is_str: "a string", _is_list: "a list", _is_dict: "an object", _is_number: "a number",
+                      _is_pose: "a pose [x, y, theta] of numbers"}
+    return tuple((key, test, expected_names[test]) for key, test in fields)
+
+
+#Required fields of every zone, node and sortplan entry
+ZONE_FIELDS = _compile((("id", _is_str), ("type", _is_str), ("pose", _is_pose), ("nodes", _is_list)))
+NODE_FIELDS = _compile((("id", _is_str), ("type", _is_str), ("pose", _is_pose), ("connections", _is_list)))
+ENTRY_FIELDS = _compile((("type", _is_str),))
+
+#Fields of a streamed zone, which arrives without its nodes (see JSON_Stream.iter_zone_events)
+STREAMED_ZONE_FIELDS = tuple(field for field in ZONE_FIELDS if field[0] != "nodes")
+
+
+class Plan_Validation_Error(ValueError):
+    """
+    Raised with every problem found in a plan. problems holds all of them as "path: message" strings.
+    """
+
+    def __init__(self, problems: list):
+        self.problems = list(problems)
+        shown = "; ".join(self.problems[:MESSAGE_LIMIT])
+        more = f"; and {len(self.problems) - MESSAGE_LIMIT} more" if len(self.problems) > MESSAGE_LIMIT else ""
+        super().__init__(f"{len(self.problems)} problem(s) in the plan: {shown}{more}")
+
+
+class Plan_Validator:
+    """
+    Validates a parsed floorplan (and sortplan) before anything is rendered, so a bad plan fails at once with
+    all of its problems instead of one exception at a time from deep inside the renderer.
+
+    One pass over the zones and nodes checks every required field, collects the absolute cell ids into an
+    index and queues the connection targets; the targets and then the sortplan keys are resolved against that
+    index afterwards, so forward references cost one dict lookup each. Checked:
+        - zones: id, type, pose [x, y, theta], nodes; the output_gate_1 zone the renderer is oriented by
+        - nodes: id, type, pose, connections
+        - connections: connects_to names an existing cell (relative to the zone, or absolute), control_points
+          are [x, y] pairs
+        - sortplan: every key is a cell, every entry has a type, output entries have sub_directions with a
+          side of -1 or 1 and an optional container object
+
+    Streamed documents are checked the same way while they are read: iter_floorplan and iter_sortplan pass
+    the events of JSON_Stream on, minus the ones the renderer could not use, and check() afterwards raises
+    with everything found. Only the connection targets are kept until the floorplan pass ends.
+    """
+
+    def __init__(self, floorplan_data, sortplan_data=None):
+        """
+        Args:
+            floorplan_data (dict): Parsed floorplan document.
+            sortplan_data (dict): Parsed sortplan document, optional.
+        """
+        self.floorplan_data = floorplan_data
+        self.sortplan_data = sortplan_data
+        self.problems = []
+        self.cell_ids = set() #Absolute id of every cell, filled by validate() or iter_floorplan()
+        self.streamed = False #Whether iter_floorplan / iter_sortplan found the problems, so check() keeps them
+
+    def __fields(self, item, fields, path: str):
+        #Report the missing and mistyped fields of one object; True when all are fine
+        problems = self.problems
+        valid = True
+        for key, test, expected in fields:
+            value = item.get(key)
+            if value is None:
+                problems.append(f"{path}: missing '{key}'")
+                valid = False
+            elif not test(value):
+                problems.append(f"{path}.{key}: expected {expected}, got {value!r:.60}")
+                valid = False
+        return valid
+
+    def __check_floorplan(self):
+        problems = self.problems
+        data = self.floorplan_data
+        if not _is_dict(data):
+            problems.append(f"floorplan: expected an object, got {type(data).__name__}")
+            return
+        zones = data.get("zones")
+        if not _is_list(zones):
+            problems.append("floorplan: missing 'zones'" if zones is None else "floorplan.zones: expected a list")
+            return
+
+        cell_ids = self.cell_ids
+        targets = [] #Absolute id of every connects_to target, resolved once all cells are known
+        zone_ids = set()
+        fields = self.__fields
+        numbers = NUMBER_TYPES
+        for zone_number, zone in enumerate(zones):
+            zone_path = f"zones[{zone_number}]"
+            if type(zone) is not dict:
+                problems.append(f"{zone_path}: expected an object")
+                continue
+            fields(zone, ZONE_FIELDS, zone_path)
+            zone_id = zone.get("id")
+            nodes = zone.get("nodes")
+            if type(zone_id) is not str or type(nodes) is not list:
+                continue
+            zone_ids.add(zone_id)
+            prefix = f"/{zone_id}/"
+            for node_number, node in enumerate(nodes):
+                if type(node) is not dict:
+                    problems.append(f"{zone_path}.nodes[{node_number}]: expected an object")
+                    continue
+                node_id = node.get("id")
+                pose = node.get("pose")
+                connections = node.get("connections")
+                #Tests of a well formed node written out, the field table only runs to name what is wrong
+                if not (type(node_id) is str and type(node.get("type")) is str and type(connections) is list
+                        and type(pose) is list and len(pose) == 3 and type(pose[0]) in numbers
+                        and type(pose[1]) in numbers and type(pose[2]) in numbers):
+                    fields(node, NODE_FIELDS, f"{zone_path}.nodes[{node_number}]")
+                    if type(node_id) is str:
+                        cell_ids.add(prefix + node_id)
+                    if type(connections) is not list:
+                        continue
+                else:
+                    cell_ids.add(prefix + node_id)
+                for connection in connections:
+                    if type(connection) is not dict:
+                        self.__connection_problem(zone_number, node_number, connection, "expected an object")
+                        continue
+                    target_id = connection.get("connects_to")
+                    if type(target_id) is str:
+                        targets.append(target_id if target_id.startswith("/") else prefix + target_id)
+                    elif target_id is not None:
+                        self.__connection_problem(zone_number, node_number, connection,
+                                                  f".connects_to: expected a string, got {target_id!r:.60}")
+                    control_points = connection.get("control_points")
+                    if control_points and not (type(control_points) is list and all(map(_is_point, control_points))):
+                        self.__connection_problem(zone_number, node_number, connection,
+                                                  ".control_points: expected a list of [x, y] points")
+
+        if REFERENCE_ZONE not in zone_ids:
+            problems.append(f"floorplan.zones: no '{REFERENCE_ZONE}' zone, the drawing is oriented by it")
+        missing = set(targets) - cell_ids
+        if missing: #Rare, so only now walk the connections again to say where the broken ones are
+            self.__report_targets(zones, missing)
+
+    def __connection_problem(self, zone_number: int, node_number: int, connection, message: str):
+        #The connection loop does not count connections, so find the number of the bad one here
+        connections = self.floorplan_data["zones"][zone_number]["nodes"][node_number]["connections"]
+        connection_number = next(number for number, item in enumerate(connections) if item is connection)
+        separator = "" if message.startswith(".") else ": "
+        self.problems.append(f"zones[{zone_number}].nodes[{node_number}].connections[{connection_number}]{separator}{message}")
+
+    def __report_targets(self, zones, missing: set):
+        for zone_number, zone in enumerate(zones):
+            if type(zone) is not dict or type(zone.get("nodes")) is not list or type(zone.get("id")) is not str:
+                continue
+            prefix = f"/{zone['id']}/"
+            for node_number, node in enumerate(zone["nodes"]):
+                connections = node.get("connections") if type(node) is dict else None
+                for connection_number, connection in enumerate(connections if type(connections) is list else ()):
+                    target_id = connection.get("connects_to") if type(connection) is dict else None
+                    if type(target_id) is not str:
+                        continue
+                    target_id = target_id if target_id.startswith("/") else prefix + target_id
+                    if target_id in missing:
+                        self.problems.append(f"zones[{zone_number}].nodes[{node_number}].connections[{connection_number}]"
+                                             f".connects_to: no cell {target_id}")
+
+    def __check_sortplan(self):
+        data = self.sortplan_data
+        if type(data) is not dict:
+            self.problems.append(f"sortplan: expected an object, got {type(data).__name__}")
+            return
+        check_entry = self.__check_entry
+        for key, entry in data.items():
+            check_entry(key, entry)
+
+    def __check_entry(self, key: str, entry):
+        #Report the problems of one sortplan entry; True when it can be joined to its cell
+        problems = self.problems
+        valid = key in self.cell_ids
+        if not valid:
+            problems.append(f"sortplan[{key!r}]: no cell {key} in the floorplan")
+        if type(entry) is not dict:
+            problems.append(f"sortplan[{key!r}]: expected an object")
+            return False
+        entry_type = entry.get("type")
+        if type(entry_type) is not str:
+            self.__fields(entry, ENTRY_FIELDS, f"sortplan[{key!r}]")
+            return False
+        if entry_type != "output":
+            return valid
+        sub_directions = entry.get("sub_directions")
+        if type(sub_directions) is not dict:
+            problems.append(f"sortplan[{key!r}].sub_directions: expected an object of sub-directions")
+            return False
+        for sub_id, sub_direction in sub_directions.items():
+            if type(sub_direction) is not dict:
+                problems.append(f"sortplan[{key!r}].sub_directions[{sub_id!r}]: expected an object")
+                valid = False
+                continue
+            side = sub_direction.get("side")
+            if type(side) not in NUMBER_TYPES or side not in BIN_SIDES:
+                problems.append(f"sortplan[{key!r}].sub_directions[{sub_id!r}].side: expected -1 or 1, got {side!r:.60}")
+                valid = False
+            container = sub_direction.get("container")
+            if container is not None and type(container) is not dict:
+                problems.append(f"sortplan[{key!r}].sub_directions[{sub_id!r}].container: expected an object")
+        return valid
+
+    def iter_floorplan(self, events):
+        """
+        Check a streamed floorplan while it is read.
+
+        Args:
+            events (iterable): ("zone", zone without nodes) / ("node", node) events, as JSON_Stream.iter_zone_events
+                               yields them.
+
+        Returns:
+            generator: The events the renderer can use. A zone with a bad id, type or pose is dropped with its
+                       nodes, a node with a bad field on its own. Connection targets, the output_gate_1 zone and
+                       (with iter_sortplan) the sortplan keys are resolved after the pass, see finish_floorplan.
+        """
+        self.problems = []
+        self.cell_ids = set()
+        self.streamed = True
+        problems = self.problems
+        cell_ids = self.cell_ids
+        self.__targets = [] #Absolute id of every connects_to target
+        self.__target_nodes = array("L") #Node ordinal of every target, to name the broken ones afterwards
+        self.__target_connections = array("L") #Connection number of every target within its node
+        self.__zone_starts = [] #Ordinal of the first node of every zone
+        self.__zone_ids = set()
+        zone_number = -1
+        node_ordinal = 0
+        usable = False
+        prefix = None
+        for kind, item in events:
+            if kind == "zone":
+                zone_number += 1
+                node_number = 0
+                self.__zone_starts.append(node_ordinal)
+                usable = type(item) is dict and self.__fields(item, STREAMED_ZONE_FIELDS, f"zones[{zone_number}]")
+                zone_id = item.get("id") if type(item) is dict else None
+                prefix = f"/{zone_id}/" if type(zone_id) is str else None
+                if prefix is not None:
+                    self.__zone_ids.add(zone_id)
+                if usable:
+                    yield kind, item
+                continue
+            valid = self.__check_streamed_node(item, prefix, zone_number, node_number, node_ordinal)
+            node_number += 1
+            node_ordinal += 1
+            if valid and usable:
+                yield kind, item
+        if zone_number < 0:
+            problems.append("floorplan: missing 'zones'")
+        self.finish_floorplan()
+
+    def __check_streamed_node(self, node, prefix: str, zone_number: int, node_number: int, node_ordinal: int):
+        #Report the problems of one streamed node and queue its targets; True when the renderer can use it
+        if type(node) is not dict:
+            self.problems.append(f"zones[{zone_number}].nodes[{node_number}]: expected an object")
+            return False
+        numbers = NUMBER_TYPES
+        node_id = node.get("id")
+        pose = node.get("pose")
+        connections = node.get("connections")
+        valid = (type(node_id) is str and type(node.get("type")) is str and type(connections) is list
+                 and type(pose) is list and len(pose) == 3 and type(pose[0]) in numbers
+                 and type(pose[1]) in numbers and type(pose[2]) in numbers)
+        if not valid: #Written out like in __check_floorplan, the field table only runs to name what is wrong
+            self.__fields(node, NODE_FIELDS, f"zones[{zone_number}].nodes[{node_number}]")
+        if type(node_id) is str and prefix is not None:
+            self.cell_ids.add(prefix + node_id)
+        if type(connections) is not list:
+            return False
+        for connection_number, connection in enumerate(connections):
+            if type(connection) is not dict:
+                self.__streamed_problem(zone_number, node_number, connection_number, ": expected an object")
+                valid = False
+                continue
+            target_id = connection.get("connects_to")
+            if type(target_id) is str:
+                if prefix is not None or target_id.startswith("/"):
+                    self.__targets.append(target_id if target_id.startswith("/") else prefix + target_id)
+                    self.__target_nodes.append(node_ordinal)
+                    self.__target_connections.append(connection_number)
+            elif target_id is not None:
+                self.__streamed_problem(zone_number, node_number, connection_number,
+                                        f".connects_to: expected a string, got {target_id!r:.60}")
+                valid = False
+            control_points = connection.get("control_points")
+            if control_points and not (type(control_points) is list and all(map(_is_point, control_points))):
+                self.__streamed_problem(zone_number, node_number, connection_number,
+                                        ".control_points: expected a list of [x, y] points")
+                valid = False
+        return valid
+
+    def __streamed_problem(self, zone_number: int, node_number: int, connection_number: int, message: str):
+        self.problems.append(f"zones[{zone_number}].nodes[{node_number}].connections[{connection_number}]{message}")
+
+    def finish_floorplan(self):
+        """
+        Resolve the connection targets queued by iter_floorplan once every cell is known (called at its end).
+        """
+        if REFERENCE_ZONE not in self.__zone_ids:
+            self.problems.append(f"floorplan.zones: no '{REFERENCE_ZONE}' zone, the drawing is oriented by it")
+        cell_ids = self.cell_ids
+        zone_starts = self.__zone_starts
+        for target_id, node_ordinal, connection_number in zip(self.__targets, self.__target_nodes, self.__target_connections):
+            if target_id not in cell_ids:
+                zone_number = bisect_right(zone_starts, node_ordinal) - 1
+                node_number = node_ordinal - zone_starts[zone_number]
+                self.problems.append(f"zones[{zone_number}].nodes[{node_number}].connections[{connection_number}]"
+                                     f".connects_to: no cell {target_id}")
+        self.__targets = []
+        self.__target_nodes = array("L")
+        self.__target_connections = array("L")
+
+    def iter_sortplan(self, entries):
+        """
+        Check a streamed sortplan while it is read, after iter_floorplan (or validate) has collected the cells.
+
+        Args:
+            entries (iterable): (key, entry) pairs, e.g. JSON_Stream.iter_object_items.
+
+        Returns:
+            generator: The entries that can be joined to a cell; problems of the others are collected.
+        """
+        self.streamed = True
+        check_entry = self.__check_entry
+        for key, entry in entries:
+            if check_entry(key, entry):
+                yield key, entry
+
+    def validate(self):
+        """
+        Check the documents and collect every problem.
+
+        Returns:
+            list: "path: message" per problem, empty for a valid plan.
+        """
+        self.problems = []
+        self.cell_ids = set()
+        self.streamed = False
+        self.__check_floorplan()
+        if self.sortplan_data is not None:
+            self.__check_sortplan()
+        return self.problems
+
+    def check(self):
+        """
+        Validate and raise a Plan_Validation_Error naming all problems, if there are any. After iter_floorplan /
+        iter_sortplan, raise with what was found instead of validating again.
+        """
+        if not self.streamed:
+            self.validate()
+        if self.problems:
+            raise Plan_Validation_Error(self.problems)
+        return self
@@ -4,58 +4,401 @@
 @Author : Soumitra Pandit
 """
 
-import svgwrite
-import numpy as np
-from Floorplan import Floorplan
-import json
+#svgwrite, numpy and Geometry are imported where they are first needed, so a one-shot conversion of a
+#small plan with the stream backend never pays for importing them.
+from Floorplan import Floorplan, pose_bounds
+from SVG_Stream import SVG_Stream, COMPACT_NUMBER, compact_number
+from JSON_Loader import load_document, load_file
+import os
+import re
+import sys
+import math
+import time
+from contextlib import contextmanager
+
+#Output backends: "svgwrite" builds the svgwrite DOM, "stream" writes elements straight to the file
+BACKENDS = ("svgwrite", "stream")
+
+#Output modes: "elements" writes one rect/line with a rotate transform per element,
+#"paths" precomputes all corners at once and writes one <path> per layer,
+#"symbols" defines each shape once in <defs> and places it with <use>
+MODES = ("elements", "paths", "symbols")
+
+#Per node type styling used by the symbols mode; other types fall back to "target"
+NODE_TYPE_STYLES = {
+    "init": {"fill": "none", "fill-opacity": "0.1", "stroke": "rgb(0,0,255)"},
+    "target": {"fill": "none", "fill-opacity": "0.1", "stroke": "rgb(0,100,100)"},
+    "entry_and_exit": {"fill": "rgb(255,0,0)", "fill-opacity": "0.1", "stroke": "rgb(255,0,0)"},
+}
+
+#Stroke and fill of each layer when it is drawn as a path
+LAYER_STYLES = {
+    "nodes": {"fill": "none", "fill-opacity": "0.1", "stroke": "rgb(0,100,100)"},
+    "bins": {"fill": "none", "fill-opacity": "0.1", "stroke": "rgb(100,100,0)"},
+    "arrows": {"fill": "none", "stroke": "red"},
+    "edges": {"fill": "none", "stroke": "rgb(150,150,150)"},
+}
+
+#Prefix of per-element ids in each layer
+LAYER_PREFIXES = {"nodes": "node", "bins": "bin", "arrows": "arrow"}
+
+
+#Turn an absolute cell id like /output_gate_1/node_001 into a valid XML id:
+def element_id(prefix: str, absolute_id: str):
+    return f"{prefix}-" + absolute_id.strip("/").replace("/", ".")
+
+
+#Text file to write an SVG to; .svgz files are gzip compressed as the text is written, with mtime 0 and no
+#file name in the header, so equal drawings give equal files. The text goes to a partial file next to path
+#that replaces it only once complete, so a render that fails or is stopped never leaves a truncated output:
+@contextmanager
+def open_output(path: str):
+    directory, name = os.path.split(os.path.abspath(path))
+    partial_path = os.path.join(directory, f".{name}.{os.getpid()}{PARTIAL_SUFFIX}")
+    try:
+        if not path.endswith(SVGZ_SUFFIX):
+            with open(partial_path, "w", encoding="utf-8") as fileobj:
+                yield fileobj
+        else:
+            import io
+            import gzip
+            with open(partial_path, "wb") as raw:
+                compressed = gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0)
+                with io.TextIOWrapper(compressed, encoding="utf-8") as fileobj:
+                    yield fileobj
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+
+#Symbol id for a shape name such as a node type:
+def symbol_id(prefix: str, name: str):
+    return f"{prefix}-" + re.sub(r"[^A-Za-z0-9_.-]", "_", str(name))
+
+#Drawing unit, and drawing units per meter
+UNIT = "cm"
+SCALE = 100
+
+#Robot and bin Dimensions (in Meters)
+DIMENSIONS = {
+    "node_width": 0.8,
+    "node_height": 0.6,
+    "bin_width": 1,
+    "bin_height": 1.2,
+    "node_offset": 0.05,
+    "bin_offset": 0.05,
+    "stroke_width": 0.02,
+}
+
+#Defaults of the options that change the rendered output
+RENDER_DEFAULTS = {"mode": "elements", "keep_ids": False, "precision": 2, "crop": None, "edges": False, "minify": False}
+
+#Output files with this suffix are gzip compressed while they are written
+SVGZ_SUFFIX = ".svgz"
+
+#zlib level of .svgz output
+GZIP_LEVEL = 6
+
+#Suffix of the partial file an output is written to before it replaces the output, see open_output
+PARTIAL_SUFFIX = ".partial"
 
 class SVG_Floorplan:
-    def __init__(self, svg_file: str, floorplan_file: str, sortplan_file = None ):
+    def __init__(self, svg_file: str, floorplan_file: str, sortplan_file = None, backend: str = "svgwrite",
+                 floorplan_data = None, sortplan_data = None, mode: str = "elements", keep_ids: bool = False,
+                 precision: int = 2, observers = (), streaming: bool = None, crop = None, edges: bool = False,
+                 minify: bool = False, validate: bool = False, workers: int = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+        self.backend = backend
+        self.mode = mode
+        self.keep_ids = keep_ids #Give every element an id derived from its cell id
+        self.precision = precision #Decimal places of path coordinates (of all numbers when minified)
+        self.minify = minify #No indentation or line breaks, numbers rounded to precision without trailing zeros
+        #(min_x, min_y, max_x, max_y) in Meters of the floorplan: only cells with their pose inside are drawn
+        self.crop = tuple(float(value) for value in crop) if crop is not None else None
+        self.crop_positions = None #Floorplan row -> position in node_coords, when cropped
+        self.edges = edges #Draw the connects_to links as one path on top of everything else
+        self.workers = workers #Render the zones on this many processes (see SVG_Shards, stream backend only), None or 1 renders serially
+        self.geometry = None #Batched corner/segment arrays, see compute_geometry()
+        self.definitions = [] #(tag, attribs, children) shapes written to <defs>, filled by the symbols mode
+
+        #Per-phase wall times in seconds, filled in as the pipeline runs
+        self.timings = {}
+        #Per-phase peak of traced memory above what was allocated when the phase started, in bytes.
+        #Only filled in while tracemalloc is tracing.
+        self.memory = {}
+        self.rendered = False
+        #Metrics.Observer instances that get every phase, counter and event
+        self.observers = list(observers)
+        self.elements_drawn = 0
+        self.bytes_uncompressed = None #Size of the SVG text of the last save(), before any compression
+
         #Set floorplan vars
         self.floorplan_file = floorplan_file
-        self.floorplan_data = json.load(open(self.floorplan_file,'r'))
-        self.floorplan = Floorplan(self.floorplan_file)
-
-        #Initiate Drawing Object
-        self.svg = svgwrite.Drawing(svg_file,size=("100%","100%"))
-        self.unit = "cm"
-        self.scale = 100
+        self.sortplan_file = sortplan_file
+        #Each document is parsed exactly once; parsed data or raw bytes can be passed in directly.
+        #Files are streamed instead (only the fields the renderer needs are kept) when streaming is set,
+        #or when it is None and the file is at least JSON_Stream.STREAM_MIN_BYTES large.
+        self.streaming = streaming
+        self.sortplan_streamed = False
+        with self.__phase("load"):
+            #The batched output modes work on numpy arrays, so let the floorplan build them directly
+            vectorized = True if mode != "elements" else None
+            floorplan_streamed = floorplan_data is None and self.__stream_file(self.floorplan_file)
+            self.floorplan_data = None
+            if floorplan_data is not None:
+                self.floorplan_data = load_document(floorplan_data)
+            elif not floorplan_streamed:
+                self.floorplan_data = load_file(self.floorplan_file)
+
+            self.sortplan_data = None
+            if sortplan_data is not None:
+                self.sortplan_data = load_document(sortplan_data)
+            elif sortplan_file is not None:
+                #A streamed sortplan is read entry by entry in __extract_bin_info
+                self.sortplan_streamed = self.__stream_file(self.sortplan_file)
+                if not self.sortplan_streamed:
+                    self.sortplan_data = load_file(self.sortplan_file)
+
+            #Fail with every problem of the plan before any of it is used. A streamed document is checked while
+            #it is read (Plan_Validator.iter_floorplan / iter_sortplan), so it fails once the bins are joined
+            self.validator = None
+            if validate:
+                from Plan_Validator import Plan_Validator
+                if not floorplan_streamed and not self.sortplan_streamed:
+                    Plan_Validator(self.floorplan_data, self.sortplan_data).check()
+                else:
+                    self.validator = Plan_Validator(self.floorplan_data)
+                    if not floorplan_streamed and self.validator.validate():
+                        #The floorplan cannot be built, so read the streamed sortplan now and fail with both
+                        from JSON_Stream import iter_object_items
+                        for _ in self.validator.iter_sortplan(iter_object_items(self.sortplan_file)):
+                            pass
+                        self.validator.check()
+
+            if floorplan_streamed:
+                check = self.validator.iter_floorplan if self.validator is not None else None
+                self.floorplan = Floorplan.from_stream(self.floorplan_file, vectorized=vectorized, check=check)
+            else:
+                self.floorplan = Floorplan.from_dict(self.floorplan_data, vectorized=vectorized)
+            if self.validator is not None and self.sortplan_data is None and not self.sortplan_streamed:
+                self.validator.check()
+        self.__count("cells", len(self.floorplan.cell_ids))
+        self.__count("zones", len(self.floorplan.zone_ids))
+
+        #Initiate Drawing Object (the stream backend never builds one)
+        self.svg_file = svg_file
+        self.svg = None
+        if backend == "svgwrite":
+            import svgwrite
+            self.svg = svgwrite.Drawing(svg_file,size=("100%","100%"))
+        self.unit = UNIT
+        self.scale = SCALE
 
         #Zone Rotation
         self.zone_rotation = 0
 
         #Set Robot and bin Dimensions (in Meters):
-        self.node_width = 0.8 * self.scale
-        self.node_height = 0.6 * self.scale
-        self.bin_width = 1 * self.scale
-        self.bin_height = 1.2 * self.scale
-        self.node_offset = 0.05 * self.scale
-        self.bin_offset = 0.05 * self.scale
-        self.stroke_width = 0.02 * self.scale
+        self.node_width = DIMENSIONS["node_width"] * self.scale
+        self.node_height = DIMENSIONS["node_height"] * self.scale
+        self.bin_width = DIMENSIONS["bin_width"] * self.scale
+        self.bin_height = DIMENSIONS["bin_height"] * self.scale
+        self.node_offset = DIMENSIONS["node_offset"] * self.scale
+        self.bin_offset = DIMENSIONS["bin_offset"] * self.scale
+        self.stroke_width = DIMENSIONS["stroke_width"] * self.scale
         
         
-        self.node_coords = [] #Stores the centers of Nodes
-        self.svg_nodes = [] #Stores svg.rect objects
+        self.node_coords = [] #Stores the centers of Nodes, one (x, y, rad) row per cell
+
+        self.bin_coords = [] #Stores the centers of the Bins
+        self.bin_ids = [] #Stores the cell id each Bin belongs to
+        self.bin_types = [] #Stores the type of bin
+        self.bin_sides = [] #Stores the sides on which the bin lies.
+        self.bin_rows = [] #Floorplan row of the cell every bin belongs to
+        self.bin_top_lefts = [] #Unrotated top left x, y of every bin, see __place_bins
+        self.bin_sizes = [] #Drawn width and height of every bin
+        self.sortplan_join = None #Sortplan_Join of the sortplan, see __extract_bin_info
 
         #Extraction Methods:
-        self.__extract_zone_transform()
-        self.__extract_node_coords()
-        
-        if sortplan_file is not None:
-            self.sortplan_file = sortplan_file
-            self.sortplan_data = json.load(open(self.sortplan_file,'r'))
-            self.bin_coords = [] #Stores the centers of the Bins
-            self.bin_types = [] #Stores the type of bin
-            self.bin_sides = [] #Stores the sides on which the bin lies.
-            self.__extract_bin_info()
+        with self.__phase("extract"):
+            self.__extract_zone_transform()
+            self.__extract_node_coords()
+            if self.crop is not None:
+                self.__crop_nodes()
+
+            #initializing Methods:
+            self.__find_limits()
+            self.__scale_svg()
+
+        if self.sortplan_data is not None or self.sortplan_streamed:
+            with self.__phase("bins"):
+                self.__extract_bin_info()
+            self.__count("bins", len(self.bin_coords))
+
+        #Drawing and saving happen in render() / save(), so the document is
+        #built in memory once and written to disk a single time.
+
+
+
+
+    #Whether an input file is read incrementally rather than parsed whole:
+    def __stream_file(self, path: str):
+        if self.streaming is None:
+            from JSON_Stream import use_streaming
+            return use_streaming(path)
+        return self.streaming
+
+
+
+
+    #Build from in-memory documents (parsed dicts or raw JSON bytes) instead of file paths:
+    @classmethod
+    def from_data(cls, svg_file: str, floorplan_data, sortplan_data = None, **options):
+        return cls(svg_file, None, None, floorplan_data=floorplan_data, sortplan_data=sortplan_data, **options)
+
+
+
+
+    #Everything besides the input documents that decides what the output looks like:
+    @staticmethod
+    def render_settings(**options):
+        settings = dict(RENDER_DEFAULTS)
+        settings.update((key, value) for key, value in options.items() if key in RENDER_DEFAULTS)
+        #The backends only give the same bytes unminified, so the backend is part of the settings
+        settings.update(backend=options.get("backend", "svgwrite"), unit=UNIT, scale=SCALE, dimensions=dict(DIMENSIONS))
+        #An output rendered without validation must not be reused by a run that validates
+        settings["validate"] = bool(options.get("validate", False))
+        return settings
+
+
+
+
+    #Time a phase of the pipeline (and take its memory peak when a profiler has started tracemalloc):
+    @contextmanager
+    def __phase(self, name: str):
+        tracemalloc = sys.modules.get("tracemalloc")
+        tracing = tracemalloc is not None and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+            if tracing:
+                self.memory[name] = max(self.memory.get(name, 0), tracemalloc.get_traced_memory()[1] - baseline)
+            for observer in self.observers:
+                observer.phase(name, seconds, self.memory.get(name))
+
+
 
-        #initializing Methods:
-        self.__find_limits()
-        self.__scale_svg()
 
-        #Drawing Methods:
-        self.__draw_all_elements()
-        self.flip_svg_vertically()
+    #Pass a counter increment on to the observers:
+    def __count(self, name: str, value: int):
+        for observer in self.observers:
+            observer.count(name, value)
+
+
+
+
+    #Build the whole drawing in memory (the stream backend draws while writing instead):
+    def render(self):
+        if self.rendered or self.backend == "stream":
+            return self
+        with self.__phase("draw"):
+            self.__draw_all_elements()
+        self.__count("elements", self.elements_drawn)
+        with self.__phase("flip"):
+            self.flip_svg_vertically()
+        self.rendered = True
+        return self
+
+
+
+
+    #Write the drawing to any file-like object opened in text mode:
+    def write(self, fileobj):
+        #Shards are serialized like the stream backend, so the svgwrite backend always renders serially
+        if self.workers and self.workers > 1 and self.mode != "symbols" and self.backend == "stream":
+            from SVG_Shards import SVG_Shards
+            with self.__phase("save"):
+                self.elements_drawn = SVG_Shards(self, self.workers).write(fileobj).elements_written
+            self.__count("elements", self.elements_drawn)
+        elif self.backend == "stream":
+            with self.__phase("save"):
+                stream = SVG_Stream(fileobj, minify=self.minify)
+                elements = self.iter_elements()
+                #Pull the first element before the header, so definitions are known when <defs> is written
+                first = next(elements, None)
+                stream.open(self.svg_width, self.svg_height, self.viewbox, defs=self.definitions)
+                if first is not None:
+                    stream.element(*first)
+                for tag, attribs in elements:
+                    stream.element(tag, attribs)
+                stream.close()
+            self.elements_drawn = stream.elements_written
+            self.__count("elements", self.elements_drawn)
+        else:
+            self.render()
+            with self.__phase("save"):
+                self.svg.write(fileobj, pretty=not self.minify)
+        return self
+
+
+
+
+    #Write the drawing to svg_file (renders first if needed), gzip compressed while writing for .svgz files:
+    def save(self):
+        with open_output(self.svg_file) as fileobj:
+            self.write(fileobj)
+            self.bytes_uncompressed = fileobj.tell()
+        if self.observers:
+            self.__count("bytes_written", os.path.getsize(self.svg_file))
+            if self.svg_file.endswith(SVGZ_SUFFIX):
+                self.__count("bytes_uncompressed", self.bytes_uncompressed)
+        return self
+
+
+
+
+
+    #A copy that draws only the given node and bin rows, written with the stream backend (used for tiles):
+    def select(self, node_rows, bin_rows):
+        import copy
+        view = copy.copy(self)
+        if isinstance(self.node_coords, list):
+            view.node_coords = [self.node_coords[row] for row in node_rows]
+        else:
+            view.node_coords = self.node_coords[list(node_rows)]
+        view.node_types = [self.node_types[row] for row in node_rows]
+        view.node_ids = [self.node_ids[row] for row in node_rows]
+        #Floorplan row -> row of the view, so the edges drawn by a view are the ones with both ends in it
+        floorplan_rows = list(self.crop_positions) if self.crop_positions is not None else None
+        view.crop_positions = {floorplan_rows[row] if floorplan_rows is not None else row: position
+                               for position, row in enumerate(node_rows)}
+        view.bin_coords = [self.bin_coords[row] for row in bin_rows]
+        view.bin_ids = [self.bin_ids[row] for row in bin_rows]
+        view.bin_types = [self.bin_types[row] for row in bin_rows]
+        view.bin_sides = [self.bin_sides[row] for row in bin_rows]
+        view.bin_rows = [self.bin_rows[row] for row in bin_rows]
+        view.bin_top_lefts = [self.bin_top_lefts[row] for row in bin_rows]
+        view.bin_sizes = [self.bin_sizes[row] for row in bin_rows]
+        view.backend = "stream"
+        view.workers = None
+        view.svg = None
+        view.geometry = None
+        view.definitions = []
+        view.timings = {}
+        view.memory = {}
+        view.observers = []
+        return view
+
 
 
 
@@ -89,18 +432,21 @@ class SVG_Floorplan:
         else:
             min_y = self.y_max + clearance_height
 
-        self.frame_width = int(np.floor(abs(self.x_max) + abs(self.x_min) + 2 * clearance_width)) 
-        self.frame_height = int(np.floor(abs(self.y_max) + abs(self.y_min) + 2 * clearance_height)) 
+        self.frame_width = int(math.floor(abs(self.x_max) + abs(self.x_min) + 2 * clearance_width)) 
+        self.frame_height = int(math.floor(abs(self.y_max) + abs(self.y_min) + 2 * clearance_height)) 
 
-        self.svg.viewbox(min_x, 
-                         min_y, 
-                         self.frame_width, 
-                         self.frame_height)
+        self.viewbox = (min_x, min_y, self.frame_width, self.frame_height)
+        self.svg_width = str(self.frame_width)+self.unit
+        self.svg_height = str(self.frame_height)+self.unit
+        if self.svg is None:
+            return
+
+        self.svg.viewbox(*self.viewbox)
         
         #We're using json.dumps for string format with "" instead of ''
         #single_quoted = repr(f"{frame_width}{self.unit}").replace("'",'"')
-        self.svg["width"] = str(self.frame_width)+self.unit
-        self.svg["height"] = str(self.frame_height)+self.unit
+        self.svg["width"] = self.svg_width
+        self.svg["height"] = self.svg_height
         
 
 
@@ -119,9 +465,6 @@ class SVG_Floorplan:
         # Clear existing elements from dwg and add the group
         self.svg.elements = []  # Clear all elements from dwg
         self.svg.add(group)  # Add the group with the transformation
-        
-        # Save the flipped SVG
-        self.svg.save(pretty=True)
 
 
 
@@ -129,20 +472,17 @@ class SVG_Floorplan:
     def __extract_zone_transform(self):
         floorplan = self.floorplan
         zone_pose = floorplan.zones["output_gate_1"].zone_pose
-        print(f"zone pose is {zone_pose}")
+        for observer in self.observers:
+            observer.event("zone_pose", zone_pose)
         self.zone_rotation = zone_pose[2]
 
     #Extract Node Coordinates (x,y,rad):
     def __extract_node_coords(self):
-        floorplan = self.floorplan
-        for cell in floorplan.cells.values():
-            self.node_coords.append(cell.pose)
-
-        #Scale Coordinates and adjust for zone rotation:
-        for coord in self.node_coords:
-            coord[0] = coord[0] * self.scale
-            coord[1] = coord[1] * self.scale
-            coord[2] = coord[2] - self.zone_rotation
+        #Scale Coordinates and adjust for zone rotation, for all cells at once.
+        #The floorplan's own poses are left untouched.
+        self.node_coords = self.floorplan.transform_poses(self.scale, self.zone_rotation)
+        self.node_types = self.floorplan.getCellTypes()
+        self.node_ids = self.floorplan.cell_ids
 
 
 
@@ -154,16 +494,52 @@ class SVG_Floorplan:
     #We need the Type of Bin
     #We need the Side
     def __extract_bin_info(self):
-        floorplan = self.floorplan
-        sortplan_data = self.sortplan_data
-        for key in sortplan_data.keys():
-            self.bin_coords.append(floorplan.getCellFromId(key).pose)
-            self.bin_types.append(sortplan_data[key]["type"])
-            if sortplan_data[key]["type"] == "output":
-                temp_key = list(sortplan_data[key]['sub_directions'].keys())
-                self.bin_sides.append(sortplan_data[key]['sub_directions'][temp_key[0]]["side"])
-            else:
-                self.bin_sides.append(-1)
+        from Sortplan_Join import Sortplan_Join
+        if self.sortplan_streamed: #One entry at a time, nothing but type and side is kept
+            from JSON_Stream import iter_object_items
+            entries = iter_object_items(self.sortplan_file)
+        else:
+            entries = self.sortplan_data.items()
+        if self.validator is not None: #Streamed input: the entries are checked as they are joined
+            entries = self.validator.iter_sortplan(entries)
+        #Resolve all keys at once and fail with every missing key, not just the first
+        join = self.sortplan_join = Sortplan_Join(self.floorplan, entries)
+        if self.validator is not None:
+            self.validator.check()
+        error = join.missing_error()
+        if error is not None:
+            raise error
+
+        keep = range(len(join))
+        positions = join.rows
+        if self.crop_positions is not None: #Drop bins of cells outside the crop box
+            crop_positions = self.crop_positions
+            keep = [index for index, row in enumerate(join.rows) if row in crop_positions]
+            positions = [crop_positions[join.rows[index]] for index in keep]
+        if isinstance(self.node_coords, list):
+            self.bin_coords = [self.node_coords[position] for position in positions]
+        else:
+            self.bin_coords = self.node_coords[positions]
+        self.bin_ids = [join.bin_ids[index] for index in keep]
+        self.bin_types = [join.types[index] for index in keep]
+        self.bin_sides = [join.sides[index] for index in keep]
+        self.bin_rows = [join.rows[index] for index in keep]
+        self.bin_top_lefts, self.bin_sizes = self.__place_bins(self.bin_coords, self.bin_types, self.bin_sides)
+
+
+
+
+
+    #Keep only the cells inside the crop box, found through the floorplan's spatial index:
+    def __crop_nodes(self):
+        rows = self.floorplan.getSpatialIndex().query(*self.crop)
+        self.crop_positions = {row: position for position, row in enumerate(rows)}
+        if isinstance(self.node_coords, list):
+            self.node_coords = [self.node_coords[row] for row in rows]
+        else:
+            self.node_coords = self.node_coords[rows]
+        self.node_types = [self.node_types[row] for row in rows]
+        self.node_ids = [self.node_ids[row] for row in rows]
 
 
 
@@ -171,20 +547,32 @@ class SVG_Floorplan:
 
     #Find the min_x, min_y, max_x, max_y for scaling
     def __find_limits(self):
-        self.x_min = +1000000
-        self.y_min = +1000000
-        self.x_max = -1000000
-        self.y_max = -1000000
+        if self.crop is None: #Bounds of the whole plan are known to the floorplan
+            bounds = self.floorplan.getBounds()
+            bounds = bounds and tuple(value * self.scale for value in bounds)
+        else:
+            bounds = pose_bounds(self.node_coords)
+        self.x_min, self.y_min, self.x_max, self.y_max = bounds or (0, 0, 0, 0)
+
+
+
+
+    #Rotation transform in the same format svgwrite's rotate() writes:
+    def __rotation(self, theta, center):
+        if self.minify:
+            precision = self.precision
+            return (f"rotate({compact_number(theta, precision)},{compact_number(center[0], precision)},"
+                    f"{compact_number(center[1], precision)})")
+        return f"rotate({theta},{center[0]},{center[1]})"
+
 
-        for x,y,rad in self.node_coords:
-            if x<self.x_min:
-                self.x_min = x 
-            if x>self.x_max:
-                self.x_max = x 
-            if y<self.y_min:
-               self. y_min = y 
-            if y>self.y_max:
-                self.y_max = y 
+
+
+    #Attributes with every float written in its compact form:
+    def __compact(self, attribs: dict):
+        precision = self.precision
+        return {key: compact_number(value, precision) if isinstance(value, float) else value
+                for key, value in attribs.items()}
 
 
 
@@ -199,18 +587,17 @@ class SVG_Floorplan:
         #Drawing
         width = self.node_width 
         height = self.node_height
-        svg = self.svg
         start = (coords[0],coords[1])
         end = (coords[0]+(width/2), coords[1])
-        theta = np.degrees(coords[2])
-        line = svg.line(start=(start[0],start[1]), 
-                        end = (end[0],end[1]),
-                        stroke='red', 
-                        stroke_width=self.stroke_width)
+        theta = math.degrees(coords[2])
         #line.set_markers((None, None, arrow_marker.get_funciri()))
-        line.rotate(theta,center = (start))
-        svg.add(line)
-        svg.save(pretty=True)
+        return ("line", {"x1": start[0],
+                         "y1": start[1],
+                         "x2": end[0],
+                         "y2": end[1],
+                         "stroke": "red",
+                         "stroke-width": self.stroke_width,
+                         "transform": self.__rotation(theta, start)})
 
 
 
@@ -219,8 +606,7 @@ class SVG_Floorplan:
     def __draw_node(self,coords,node_type):
         x_pos = coords[0] 
         y_pos = coords[1] 
-        theta = np.degrees(coords[2])
-        svg = self.svg
+        theta = math.degrees(coords[2])
 
         #Node Dimensions
         node_offset = self.node_offset
@@ -249,61 +635,64 @@ class SVG_Floorplan:
         fill_opacity = "0.1"
 
         #Find the top Left Corner
-        top_left = np.array([x_pos-width/2,y_pos-height/2])
+        top_left = (x_pos-width/2,y_pos-height/2)
         
         #Draw Rect
-        rect = svg.rect(insert = (top_left[0], 
-                                  top_left[1]),
-                        size = (width,height-node_offset),
-                        fill = fill_color,
-                        fill_opacity = fill_opacity,
-                        stroke = stroke_color,
-                        stroke_width = stroke_width)
-        rect.rotate(theta,center= (x_pos,y_pos))
-        #self.svg_nodes.append(rect)
-        svg.add(rect)
-        svg.save(pretty = True)
+        return ("rect", {"x": top_left[0],
+                         "y": top_left[1],
+                         "width": width,
+                         "height": height-node_offset,
+                         "fill": fill_color,
+                         "fill-opacity": fill_opacity,
+                         "stroke": stroke_color,
+                         "stroke-width": stroke_width,
+                         "transform": self.__rotation(theta, (x_pos,y_pos))})
 
 
 
 
 
-    #Draw an Isolated Bin
-    def __draw_bin(self,bin_coord, bin_type, bin_side):
-        #Scaling:
-        #bin_coord[0] = bin_coord[0] * self.scale
-        #bin_coord[1] = bin_coord[1] * self.scale
+    #Place every bin next to its node in one pass: the unrotated top left x, y of each bin (rotated about the
+    #node centre by theta when drawn) and its drawn width and height. Left bins (-1) sit above the node
+    #centre, right bins (+1) below it. Lists stay lists, so small stream renders never import numpy; arrays
+    #are placed in one vectorised step with the same float operations, so both give the same numbers:
+    def __place_bins(self, bin_coords, bin_types, bin_sides):
+        node_half = self.node_height/2
+        outlines = {"input": (1 * self.scale, 1 * self.scale)}
+        outline = (self.bin_width, self.bin_height)
+        if any(bin_side not in (-1, 1) for bin_side in bin_sides):
+            raise TypeError("Invalid Side")
+        bin_outlines = [outlines.get(bin_type, outline) for bin_type in bin_types]
+        bin_sizes = [(bin_width - self.bin_offset, bin_height) for bin_width, bin_height in bin_outlines]
 
-        if self.floorplan_file==None:
-            return
-        svg = self.svg
+        if isinstance(bin_coords, list):
+            bin_top_lefts = []
+            for bin_coord, bin_side, (bin_width, bin_height) in zip(bin_coords, bin_sides, bin_outlines):
+                if bin_side == -1: #Bin is on the Left Side:
+                    bin_y = bin_coord[1] + bin_height/2 + node_half
+                else: #Bin is on the Right Side:
+                    bin_y = bin_coord[1] - (bin_height/2 + node_half)
+                bin_top_lefts.append((bin_coord[0] - bin_width/2, bin_y - bin_height/2))
+            return bin_top_lefts, bin_sizes
 
-        
-        node_center = (bin_coord[0],bin_coord[1])
-        theta = np.degrees(bin_coord[2])
+        import numpy as np
+        bin_coords = np.asarray(bin_coords, dtype=np.float64).reshape(-1, 3)
+        is_left = np.array(bin_sides, dtype=np.int64).reshape(-1) == -1
+        bin_outlines = np.array(bin_outlines, dtype=np.float64).reshape(-1, 2)
+        bin_width = bin_outlines[:, 0]
+        bin_height = bin_outlines[:, 1]
+        bin_y = np.where(is_left, bin_coords[:, 1] + bin_height/2 + node_half,
+                         bin_coords[:, 1] - (bin_height/2 + node_half))
+        return np.stack([bin_coords[:, 0] - bin_width/2, bin_y - bin_height/2], axis=1), bin_sizes
 
-        if  bin_type == "input":
-            bin_width = 1 * self.scale
-            bin_height = 1 * self.scale
-        else:
-            bin_width = self.bin_width
-            bin_height = self.bin_height
-        
-        bin_offset = self.bin_offset
 
-        if bin_side == -1: #Bin is on the Left Side:
-            bin_x = bin_coord[0]
-            bin_y = bin_coord[1] + bin_height/2 + self.node_height/2
 
-        elif bin_side == 1: #Bin is on the Right Side:
-            bin_x = bin_coord[0]
-            bin_y = bin_coord[1] - (bin_height/2 + self.node_height/2)
 
-        else:
-            raise TypeError("Invalid Side")
 
-        #Find the top_left for plotting
-        top_left = [bin_x-(bin_width/2),bin_y-(bin_height/2)]
+    #Draw an Isolated Bin from its placement, rotated about its node's centre
+    def __draw_bin(self, bin_coord, top_left, size):
+        node_center = (bin_coord[0],bin_coord[1])
+        theta = math.degrees(bin_coord[2])
 
         #Bin Formatting
         fill_color = 'none'
@@ -311,57 +700,292 @@ class SVG_Floorplan:
         stroke_color = "rgb(100,100,0)"
         stroke_width = self.stroke_width
 
+        return ("rect", {"x": top_left[0],
+                         "y": top_left[1],
+                         "width": size[0],
+                         "height": size[1],
+                         "fill": fill_color,
+                         "fill-opacity": fill_opacity,
+                         "stroke": stroke_color,
+                         "stroke-width": stroke_width,
+                         "transform": self.__rotation(theta, node_center)})
 
-        rect = svg.rect(insert = (top_left[0], 
-                                top_left[1]),
-                    size = (bin_width-bin_offset,bin_height),
-                    fill = fill_color,
-                    fill_opacity = fill_opacity,
-                    stroke = stroke_color,
-                    stroke_width = stroke_width)
-        
-        rect.rotate(theta,center = node_center)
-        svg.add(rect)
-        svg.save(pretty=True)
 
 
 
+    #Compute the corners of every node and bin and the ends of every arrow in one batched pass:
+    def compute_geometry(self):
+        if self.geometry is not None:
+            return self.geometry
+        import numpy as np
+        from Geometry import rect_corners, segment_ends
 
+        node_coords = np.asarray(self.node_coords, dtype=np.float64).reshape(-1, 3)
+        centers = node_coords[:, :2]
+        theta = node_coords[:, 2]
+        half_node = np.array([self.node_width/2, self.node_height/2])
+        node_corners = rect_corners(centers - half_node, self.node_width, self.node_height - self.node_offset,
+                                    centers, theta)
 
-    #Draw All Nodes:
-    def __draw_all_nodes(self):
-        for node_coord in self.node_coords:
-            self.__draw_node(node_coord)
-    
+        bin_coords = np.array(self.bin_coords, dtype=np.float64).reshape(-1, 3)
+        bin_top_lefts = np.asarray(self.bin_top_lefts, dtype=np.float64).reshape(-1, 2)
+        bin_sizes = np.asarray(self.bin_sizes, dtype=np.float64).reshape(-1, 2)
+        bin_corners = rect_corners(bin_top_lefts, bin_sizes[:, 0], bin_sizes[:, 1],
+                                   bin_coords[:, :2], bin_coords[:, 2])
 
+        arrows = segment_ends(centers, self.node_width/2, theta)
 
+        self.geometry = {"nodes": node_corners, "bins": bin_corners, "arrows": arrows}
+        return self.geometry
 
 
-    #Draw All Lines:
-    def __draw_all_lines(self):
-        for node_coord in self.node_coords:
-            self.__draw_arrow(node_coord)
-    
+
+
+    #Ids of the elements of a layer, in drawing order:
+    def __layer_ids(self, layer: str):
+        absolute_ids = self.bin_ids if layer == "bins" else self.node_ids
+        prefix = LAYER_PREFIXES[layer]
+        return [element_id(prefix, absolute_id) for absolute_id in absolute_ids]
+
+
+
+
+    #Yield each layer as one <path> (or one <path> per element when keep_ids is set):
+    def __iter_layer_paths(self):
+        from Geometry import path_data
+
+        geometry = self.compute_geometry()
+        for layer, closed in (("nodes", True), ("bins", True), ("arrows", False)):
+            shapes = geometry[layer]
+            if len(shapes) == 0:
+                continue
+            style = dict(LAYER_STYLES[layer])
+            style["stroke-width"] = self.stroke_width
+            shape_data = path_data(shapes, closed=closed, precision=self.precision, compact=self.minify)
+            if self.keep_ids:
+                for shape_id, data in zip(self.__layer_ids(layer), shape_data):
+                    yield ("path", dict(style, id=shape_id, d=data))
+            else:
+                yield ("path", dict(style, id=layer, d=" ".join(shape_data)))
 
 
 
-    def __draw_all_bins(self):
-        num_bins = len(self.bin_coords)
-        for idx in range(num_bins):
-            bin_coord = self.bin_coords[idx]
-            bin_side = self.bin_sides[idx]
-            bin_type = self.bin_types[idx]
-            self.__draw_bin(bin_coord=bin_coord,bin_side=bin_side,bin_type=bin_type)
+
+    #Symbol definitions and (symbol id, kind) for every node, bin and arrow instance:
+    def __build_symbols(self):
+        stroke_width = self.stroke_width
+        definitions = []
+        symbols = {}
+        compact = self.__compact if self.minify else dict
+
+        def define(name, shape, attribs, style):
+            if name not in symbols:
+                symbols[name] = len(definitions)
+                definitions.append(("symbol", {"id": name, "overflow": "visible"},
+                                    [(shape, compact(dict(attribs, **style)), ())]))
+            return name
+
+        #Nodes: one symbol per node type, centred on the node
+        node_rect = {"x": -self.node_width/2, "y": -self.node_height/2,
+                     "width": self.node_width, "height": self.node_height - self.node_offset}
+        node_symbols = []
+        for type_name in self.node_types:
+            style = dict(NODE_TYPE_STYLES.get(type_name, NODE_TYPE_STYLES["target"]), **{"stroke-width": stroke_width})
+            node_symbols.append(define(symbol_id("node", type_name), "rect", node_rect, style))
+
+        #Bins: one symbol per size class and side, placed at the centre of their node
+        bin_symbols = []
+        bin_style = dict(LAYER_STYLES["bins"], **{"stroke-width": stroke_width})
+        for bin_type, bin_side in zip(self.bin_types, self.bin_sides):
+            if bin_side not in (-1, 1):
+                raise TypeError("Invalid Side")
+            size_class = "input" if bin_type == "input" else "output"
+            bin_width = 1 * self.scale if size_class == "input" else self.bin_width
+            bin_height = 1 * self.scale if size_class == "input" else self.bin_height
+            bin_y = -bin_side * (bin_height/2 + self.node_height/2)
+            bin_rect = {"x": -bin_width/2, "y": bin_y - bin_height/2,
+                        "width": bin_width - self.bin_offset, "height": bin_height}
+            side_name = "left" if bin_side == -1 else "right"
+            bin_symbols.append(define(symbol_id("bin", f"{size_class}-{side_name}"), "rect", bin_rect, bin_style))
+
+        #Arrows: a single symbol pointing along +x
+        arrow_line = {"x1": 0, "y1": 0, "x2": self.node_width/2, "y2": 0}
+        arrow_style = {"stroke": LAYER_STYLES["arrows"]["stroke"], "stroke-width": stroke_width}
+        arrow_symbol = define("arrow", "line", arrow_line, arrow_style) if len(self.node_coords) else None
+
+        return definitions, node_symbols, bin_symbols, arrow_symbol
+
+
+
+
+    #Yield a <use> per node, bin and arrow; the shapes themselves are in self.definitions:
+    def __iter_symbol_uses(self):
+        import numpy as np
+        from Geometry import placement_transforms
+
+        self.definitions, node_symbols, bin_symbols, arrow_symbol = self.__build_symbols()
+        node_coords = np.asarray(self.node_coords, dtype=np.float64).reshape(-1, 3)
+        node_transforms = placement_transforms(node_coords[:, :2], node_coords[:, 2], self.precision, self.minify)
+        bin_coords = np.array(self.bin_coords, dtype=np.float64).reshape(-1, 3)
+        bin_transforms = placement_transforms(bin_coords[:, :2], bin_coords[:, 2], self.precision, self.minify)
+
+        layers = (("nodes", node_symbols, node_transforms),
+                  ("bins", bin_symbols, bin_transforms),
+                  ("arrows", [arrow_symbol] * len(node_transforms), node_transforms))
+        for layer, layer_symbols, transforms in layers:
+            ids = self.__layer_ids(layer) if self.keep_ids else None
+            for idx, (name, transform) in enumerate(zip(layer_symbols, transforms)):
+                attribs = {"xlink:href": f"#{name}", "transform": transform}
+                if ids:
+                    attribs["id"] = ids[idx]
+                yield ("use", attribs)
+
+
+
+
+    #Yield every element as (tag, attributes), in drawing order. shapes=False leaves out nodes, bins and arrows,
+    #edges=False the edges path (by default it is drawn when self.edges is set):
+    def iter_elements(self, shapes: bool = True, edges: bool = None):
+        elements = self.__iter_all_elements(shapes, self.edges if edges is None else edges)
+        if self.minify:
+            compact = self.__compact
+            for tag, attribs in elements:
+                yield tag, compact(attribs)
+        else:
+            yield from elements
+
 
 
 
-    #Draw All Elements:
+    def __iter_all_elements(self, shapes: bool, edges: bool):
+        if not shapes:
+            pass
+        elif self.mode == "paths":
+            yield from self.__iter_layer_paths()
+        elif self.mode == "symbols":
+            yield from self.__iter_symbol_uses()
+        else:
+            yield from self.__iter_shapes()
+        if edges:
+            yield from self.__iter_edge_path()
+
+
+
+
+    #Yield one rect/line per node, bin and arrow:
+    def __iter_shapes(self):
+        node_ids = self.__layer_ids("nodes") if self.keep_ids else None
+        for idx, (node_coord, node_type) in enumerate(zip(self.node_coords, self.node_types)):
+            tag, attribs = self.__draw_node(coords=node_coord, node_type = node_type)
+            if node_ids:
+                attribs["id"] = node_ids[idx]
+            yield tag, attribs
+        bin_ids = self.__layer_ids("bins") if self.keep_ids else None
+        for idx in range(len(self.bin_coords)):
+            tag, attribs = self.__draw_bin(bin_coord=self.bin_coords[idx], top_left=self.bin_top_lefts[idx],
+                                           size=self.bin_sizes[idx])
+            if bin_ids:
+                attribs["id"] = bin_ids[idx]
+            yield tag, attribs
+        arrow_ids = self.__layer_ids("arrows") if self.keep_ids else None
+        for idx, node_coord in enumerate(self.node_coords):
+            tag, attribs = self.__draw_arrow(node_coord)
+            if arrow_ids:
+                attribs["id"] = arrow_ids[idx]
+            yield tag, attribs
+
+
+
+
+    #Yield all connection edges as a single <path>: straight links as lines, links with one control point as
+    #quadratic curves, with two as cubic curves and with more as lines through the control points:
+    def __iter_edge_path(self):
+        import numpy as np
+        from Geometry import path_data
+
+        edges = self.compute_edge_geometry()
+        if edges is None:
+            return
+        starts, ends = edges["starts"], edges["ends"]
+        point_offsets, points = edges["point_offsets"], edges["points"]
+        num_points = point_offsets[1:] - point_offsets[:-1]
+
+        #Straight links are formatted in one batch, curves one by one
+        data = np.empty(len(starts), dtype=object)
+        straight = num_points == 0
+        data[straight] = path_data(np.stack([starts[straight], ends[straight]], axis=1), closed=False,
+                                   precision=self.precision, compact=self.minify)
+        number = COMPACT_NUMBER if self.minify else f"%.{self.precision}f"
+        pair = f"{number},{number}"
+        for index in np.flatnonzero(~straight).tolist():
+            control = points[point_offsets[index]:point_offsets[index + 1]]
+            command = {1: "Q", 2: "C"}.get(len(control), "L")
+            values = np.round(np.vstack([starts[index], control, ends[index]]), self.precision) + 0.0
+            data[index] = f"M{pair % tuple(values[0])} {command}" + " ".join(pair % tuple(value) for value in values[1:])
+        style = dict(LAYER_STYLES["edges"], **{"stroke-width": self.stroke_width})
+        yield ("path", dict(style, id="edges", d=" ".join(data.tolist())))
+
+
+
+
+    #Start, end and control points (drawing units) of every link that is drawn, or None when there are none:
+    def compute_edge_geometry(self):
+        import numpy as np
+
+        graph = self.floorplan.getConnectionGraph()
+        sources = np.asarray(graph.edge_sources(), dtype=np.int64)
+        targets = np.asarray(graph.targets, dtype=np.int64)
+        point_offsets = np.asarray(graph.point_offsets, dtype=np.int64)
+        points = np.asarray(graph.points, dtype=np.float64).reshape(-1, 2) * self.scale
+        coords = np.asarray(self.node_coords, dtype=np.float64).reshape(-1, 3)[:, :2]
+
+        #Floorplan row -> row of node_coords (cropped plans only keep edges with both ends inside)
+        positions = np.arange(len(self.floorplan.cell_ids))
+        if self.crop_positions is not None:
+            positions = np.full(len(self.floorplan.cell_ids), -1)
+            positions[list(self.crop_positions)] = list(self.crop_positions.values())
+        edges = np.flatnonzero((positions[sources] >= 0) & (positions[targets] >= 0))
+        if len(edges) == 0:
+            return None
+
+        #Control points of the kept edges, again as offsets into one points array
+        num_points = (point_offsets[1:] - point_offsets[:-1])[edges]
+        kept_offsets = np.concatenate([[0], np.cumsum(num_points)]).astype(np.int64)
+        gather = np.repeat(point_offsets[edges] - kept_offsets[:-1], num_points) + np.arange(kept_offsets[-1])
+        return {"starts": coords[positions[sources[edges]]], "ends": coords[positions[targets[edges]]],
+                "point_offsets": kept_offsets, "points": points[gather]}
+
+
+
+
+    #Draw All Elements into the svgwrite Drawing:
     def __draw_all_elements(self):
-        for node in self.floorplan.cells.values():
-            self.__draw_node(coords=node.pose, node_type = node.cell_type)
-        self.__draw_all_bins()
-        #self.__draw_all_nodes()
-        self.__draw_all_lines()
+        svg = self.svg
+        for tag, attribs in self.iter_elements():
+            svg.add(self.__svgwrite_element(tag, attribs))
+            self.elements_drawn += 1
+        for tag, attribs, children in self.definitions:
+            definition = self.__svgwrite_element(tag, attribs)
+            for child_tag, child_attribs, _ in children:
+                definition.add(self.__svgwrite_element(child_tag, child_attribs))
+            svg.defs.add(definition)
+
+
+
+
+    #Build one svgwrite element from (tag, attributes):
+    def __svgwrite_element(self, tag: str, attribs: dict):
+        svg = self.svg
+        if tag == "path": #svgwrite rebuilds "d" from its own command list
+            attribs = dict(attribs)
+            element = svg.path(d=attribs.pop("d"))
+        elif tag == "use": #and "xlink:href" from its own href
+            attribs = dict(attribs)
+            element = svg.use(attribs.pop("xlink:href"))
+        else:
+            element = getattr(svg, tag)()
+        element.update(attribs)
+        return element
     
 
     #Convert SVG file to DXF File
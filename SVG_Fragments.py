@@ -0,0 +1,302 @@
+"""
+@Filename : SVG_Fragments.py
+@Brief : Incremental rendering: one cached SVG fragment per zone, spliced into the output, plus a cell change report
+@Author : Soumitra Pandit
+"""
+
+import io
+import json
+import time
+import hashlib
+from array import array
+from SVG_Stream import SVG_Stream
+from SVG_Floorplan import SVG_Floorplan, element_id, open_output
+from Build_Cache import code_version
+
+#Output modes that can be split by zone (symbols share one <defs> over all zones)
+FRAGMENT_MODES = ("elements", "paths")
+
+#Layer ids of the paths mode, made unique per zone inside a fragment
+LAYER_IDS = ("nodes", "bins", "arrows")
+
+#Suffix of the cell table stored next to every zone fragment in the object store
+CELLS_SUFFIX = ".cells.json"
+
+#Pose difference (Meters or radians) from which a cell counts as moved
+MOVE_TOLERANCE = 1e-6
+
+#Snapshot format version, a snapshot of another version is not diffed against
+SNAPSHOT_VERSION = 1
+
+
+def diff_cells(old_cells: dict, new_cells: dict, tolerance: float = MOVE_TOLERANCE):
+    """
+    Compare the cells of one zone in two floorplan versions by cell id.
+
+    Args:
+        old_cells (dict): Absolute id -> [x, y, theta, type] of the previous version.
+        new_cells (dict): Same for the new version.
+        tolerance (float): Pose differences up to this are ignored.
+
+    Returns:
+        dict: added and removed (lists of ids), moved ({id, from, to} with the poses) and changed (ids whose
+              type changed in place).
+    """
+    changes = {"added": [], "removed": [], "moved": [], "changed": []}
+    for cell_id, new in new_cells.items():
+        old = old_cells.get(cell_id)
+        if old is None:
+            changes["added"].append(cell_id)
+        elif any(abs(a - b) > tolerance for a, b in zip(old[:3], new[:3])):
+            changes["moved"].append({"id": cell_id, "from": old[:3], "to": new[:3]})
+        elif old[3] != new[3]:
+            changes["changed"].append(cell_id)
+    changes["removed"] = [cell_id for cell_id in old_cells if cell_id not in new_cells]
+    return changes
+
+
+class SVG_Fragments:
+    """
+    Renders an SVG_Floorplan zone by zone. Every zone is written as one <g id="zone-..."> fragment, keyed by a
+    hash of exactly what the fragment draws (its cells' ids, types and poses, its bins) together with the
+    render settings and the renderer code. Fragments are kept in the Build_Cache object store, so a new version
+    of the floorplan only renders the zones whose key changed; the others are copied from the cache and spliced
+    into the output between a freshly written header and footer.
+
+    Next to every fragment the store keeps the table of the cells it draws. The snapshot of an output only lists
+    the fragment key of each zone, so the change report (cells added, moved and removed) only reads the cells
+    of zones whose key differs from the previous render.
+    """
+
+    def __init__(self, converter: SVG_Floorplan, cache):
+        """
+        Args:
+            converter (SVG_Floorplan): Loaded floorplan to render (elements or paths mode).
+            cache (Build_Cache): Where fragments, cell tables and snapshots are kept.
+        """
+        if converter.mode not in FRAGMENT_MODES:
+            raise ValueError(f"Incremental rendering supports the modes {FRAGMENT_MODES}, not '{converter.mode}'")
+        self.converter = converter
+        self.cache = cache
+        settings = SVG_Floorplan.render_settings(mode=converter.mode, keep_ids=converter.keep_ids,
+                                                 precision=converter.precision, crop=converter.crop,
+                                                 edges=converter.edges, minify=converter.minify, backend="stream")
+        #Every fragment key starts from the settings and the renderer code (this module included)
+        self.base = json.dumps([settings, code_version()], sort_keys=True)
+        self.keys = {} #Zone id -> fragment key of this render, for zones that draw anything
+        self.cells = {} #Zone id -> cell table, for the zones rendered this time
+        self.rendered = [] #Zones drawn in this render
+        self.reused = [] #Zones copied from the cache
+        self.changes = None #Change report of the last save()
+        self.bytes_uncompressed = 0 #Length of the SVG text of the last save()
+        self.seconds = 0.0 #Time the last save() took to write the output
+
+    def __cell_rows(self):
+        #Floorplan row of every drawn node
+        converter = self.converter
+        if converter.crop_positions is not None:
+            return list(converter.crop_positions)
+        return range(len(converter.node_ids))
+
+    def zones(self):
+        """
+        Node and bin positions of every zone, in the zone order of the floorplan.
+
+        Returns:
+            list: (zone id, node positions, bin positions) per zone.
+        """
+        converter = self.converter
+        floorplan = converter.floorplan
+        cell_zones = floorplan.cell_zones
+        cell_zones = cell_zones.tolist() if floorplan.vectorized else cell_zones
+        nodes = [[] for _ in floorplan.zone_ids]
+        bins = [[] for _ in floorplan.zone_ids]
+        for position, row in enumerate(self.__cell_rows()):
+            nodes[cell_zones[row]].append(position)
+        for position, row in enumerate(converter.bin_rows):
+            bins[cell_zones[row]].append(position)
+        return list(zip(floorplan.zone_ids, nodes, bins))
+
+    @staticmethod
+    def __hash_coords(digest, coords, rows):
+        #The same float64 bytes for list and numpy coords, which one a plan gets depends on what is already imported
+        if isinstance(coords, list):
+            digest.update(array("d", [value for row in rows for value in coords[row]]).tobytes())
+        else:
+            import numpy as np
+            digest.update(np.ascontiguousarray(coords[rows], dtype=np.float64).tobytes())
+
+    def zone_key(self, zone_id: str, node_rows, bin_rows):
+        """
+        Fragment key of one zone: sha256 over everything its fragment draws.
+        """
+        converter = self.converter
+        digest = hashlib.sha256(self.base.encode())
+        digest.update(zone_id.encode())
+        for values in ([converter.node_ids[row] for row in node_rows], [converter.node_types[row] for row in node_rows],
+                       [converter.bin_ids[row] for row in bin_rows], [converter.bin_types[row] for row in bin_rows],
+                       [str(converter.bin_sides[row]) for row in bin_rows]):
+            digest.update("\n".join(values).encode())
+            digest.update(b"\0")
+        self.__hash_coords(digest, converter.node_coords, node_rows)
+        self.__hash_coords(digest, converter.bin_coords, bin_rows)
+        return digest.hexdigest()
+
+    def __edges_key(self):
+        import numpy as np
+        digest = hashlib.sha256(self.base.encode())
+        digest.update(b"edges")
+        edges = self.converter.compute_edge_geometry()
+        for name in ("starts", "ends", "point_offsets", "points"):
+            digest.update(np.ascontiguousarray(edges[name]).tobytes() if edges is not None else b"")
+        return digest.hexdigest()
+
+    def __zone_cells(self, node_rows):
+        #Absolute id -> [x, y, theta, type] in floorplan Meters of the cells at the given node positions
+        floorplan = self.converter.floorplan
+        cell_rows = self.__cell_rows()
+        rows = [cell_rows[position] for position in node_rows]
+        if floorplan.vectorized:
+            poses = floorplan.poses[rows].tolist()
+            type_codes = floorplan.cell_type_codes[rows].tolist()
+        else:
+            poses = [floorplan.poses[row] for row in rows]
+            type_codes = [floorplan.cell_type_codes[row] for row in rows]
+        type_names = floorplan.type_names
+        return {floorplan.cell_ids[row]: [float(pose[0]), float(pose[1]), float(pose[2]), type_names[type_code]]
+                for row, pose, type_code in zip(rows, poses, type_codes)}
+
+    def __render_fragment(self, group_id: str, elements):
+        buffer = io.StringIO()
+        children = []
+        for tag, attribs in elements:
+            if attribs.get("id") in LAYER_IDS: #One path per layer and zone, so the layer id gets the zone
+                attribs = dict(attribs, id=f"{group_id}.{attribs['id']}")
+            children.append((tag, attribs, ()))
+        SVG_Stream(buffer, minify=self.converter.minify).element("g", {"id": group_id}, children)
+        return buffer.getvalue()
+
+    def __fragments(self):
+        #Fragment texts in drawing order; cached fragments are read, the others rendered and stored
+        converter = self.converter
+        cache = self.cache
+        parts = [(zone_id, node_rows, bin_rows) for zone_id, node_rows, bin_rows in self.zones() if node_rows or bin_rows]
+        if converter.edges:
+            parts.append((None, None, None))
+        stored = False
+        for zone_id, node_rows, bin_rows in parts:
+            key = self.zone_key(zone_id, node_rows, bin_rows) if zone_id is not None else self.__edges_key()
+            if zone_id is not None:
+                self.keys[zone_id] = key
+            data = cache.read_object(key)
+            if data is not None:
+                self.reused.append(zone_id or "edges")
+                yield data.decode("utf-8")
+                continue
+            if zone_id is None:
+                text = self.__render_fragment("edges-group", converter.iter_elements(shapes=False, edges=True))
+            else:
+                view = converter.select(node_rows, bin_rows)
+                text = self.__render_fragment(element_id("zone", f"/{zone_id}"), view.iter_elements(edges=False))
+                cells = self.cells[zone_id] = self.__zone_cells(node_rows)
+                cache.write_object(key, json.dumps(cells).encode("utf-8"), CELLS_SUFFIX)
+            cache.write_object(key, text.encode("utf-8"))
+            stored = True
+            self.rendered.append(zone_id or "edges")
+            yield text
+        if stored:
+            cache.evict()
+
+    def write(self, fileobj):
+        """
+        Write the document: header, one fragment per zone (plus the edges), footer.
+        """
+        converter = self.converter
+        stream = SVG_Stream(fileobj, minify=converter.minify)
+        stream.open(converter.svg_width, converter.svg_height, converter.viewbox)
+        for text in self.__fragments():
+            fileobj.write(text)
+        stream.close()
+        return self
+
+    def snapshot(self):
+        """
+        What the next render is compared with: the fragment key of every zone (None for zones that draw nothing).
+        """
+        return {"version": SNAPSHOT_VERSION,
+                "zones": {zone_id: self.keys.get(zone_id) for zone_id in self.converter.floorplan.zone_ids}}
+
+    def __load_cells(self, zone_id: str, key: str):
+        #Cell table of a fragment key: {} for a zone that drew nothing, None when it has been evicted
+        if key is None:
+            return {}
+        if key == self.keys.get(zone_id) and zone_id in self.cells:
+            return self.cells[zone_id]
+        data = self.cache.read_object(key, CELLS_SUFFIX)
+        return json.loads(data) if data is not None else None
+
+    def diff(self, previous: dict, current: dict):
+        """
+        Change report between two snapshots. Only zones whose fragment key differs are compared cell by cell.
+
+        Returns:
+            dict: added, removed, moved and changed cells (see diff_cells); zones_changed, zones_added and
+                  zones_removed; the rendered and reused fragments of this render; incomplete lists the zones
+                  whose cells could not be compared because their previous cell table was evicted.
+        """
+        report = {"added": [], "removed": [], "moved": [], "changed": [], "zones_changed": [], "zones_added": [],
+                  "zones_removed": [], "incomplete": [], "rendered": list(self.rendered), "reused": list(self.reused),
+                  "previous": previous is not None}
+        if previous is None:
+            return report
+        old_zones = previous["zones"]
+        new_zones = current["zones"]
+        for zone_id in list(new_zones) + [zone_id for zone_id in old_zones if zone_id not in new_zones]:
+            old_key = old_zones.get(zone_id)
+            new_key = new_zones.get(zone_id)
+            if zone_id in old_zones and zone_id in new_zones and old_key == new_key:
+                continue
+            if zone_id not in old_zones:
+                report["zones_added"].append(zone_id)
+            elif zone_id not in new_zones:
+                report["zones_removed"].append(zone_id)
+            else:
+                report["zones_changed"].append(zone_id)
+            old_cells = self.__load_cells(zone_id, old_key)
+            new_cells = self.__load_cells(zone_id, new_key)
+            if old_cells is None or new_cells is None:
+                report["incomplete"].append(zone_id)
+                continue
+            for kind, values in diff_cells(old_cells, new_cells).items():
+                report[kind].extend(values)
+        return report
+
+    def save(self, svg_file: str = None):
+        """
+        Write the output (gzip compressed for .svgz), update the snapshot and build the change report.
+
+        Returns:
+            dict: The change report (see diff).
+        """
+        svg_file = svg_file or self.converter.svg_file
+        start = time.perf_counter()
+        with open_output(svg_file) as fileobj:
+            self.write(fileobj)
+            self.bytes_uncompressed = fileobj.tell()
+        self.seconds = time.perf_counter() - start
+        previous = self.cache.read_snapshot(svg_file)
+        if previous is not None and previous.get("version") != SNAPSHOT_VERSION:
+            previous = None
+        current = self.snapshot()
+        self.changes = self.diff(previous, current)
+        self.cache.write_snapshot(svg_file, current)
+        return self.changes
+
+
+#Short text of a change report:
+def summarize_changes(changes: dict):
+    zones = f"{len(changes['rendered'])} fragment(s) rendered, {len(changes['reused'])} reused"
+    if not changes["previous"]:
+        return f"{zones}; no previous render to compare with"
+    return (f"{zones}; {len(changes['added'])} cell(s) added, {len(changes['moved'])} moved, "
+            f"{len(changes['removed'])} removed, {len(changes['changed'])} changed type")
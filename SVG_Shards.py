@@ -0,0 +1,179 @@
+"""
+@Filename : SVG_Shards.py
+@Brief : Renders the zones of one SVG_Floorplan on a process pool and stitches the parts into the serial document
+@Author : Soumitra Pandit
+"""
+
+import io
+import multiprocessing
+from SVG_Stream import SVG_Stream
+
+#Output modes that can be sharded (symbols need the <defs> of every element before the first one is written)
+SHARD_MODES = ("elements", "paths")
+
+#Layers in drawing order
+LAYERS = ("nodes", "bins", "arrows")
+
+#Most bin shards; a sortplan whose bins switch zones more often is cut into equal runs instead
+MAX_BIN_SHARDS_PER_WORKER = 4
+
+#Converter the forked workers render from: set before the pool starts, so it is inherited instead of pickled
+_converter = None
+
+
+def zone_ranges(zone_of_rows):
+    """
+    Cut a sequence into runs of equal values.
+
+    Returns:
+        list: (start, stop) of every run, in order.
+    """
+    ranges = []
+    start = 0
+    for index in range(1, len(zone_of_rows) + 1):
+        if index == len(zone_of_rows) or zone_of_rows[index] != zone_of_rows[start]:
+            ranges.append((start, index))
+            start = index
+    return ranges
+
+
+def equal_ranges(length: int, parts: int):
+    """
+    (start, stop) of parts nearly equal slices of range(length), empty slices left out.
+    """
+    bounds = [length * part // parts for part in range(parts + 1)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+
+def _render_shard(node_range, bin_range):
+    #Runs in a worker: the elements of node rows node_range and bin rows bin_range, per layer.
+    #A layer drawn as one <path> comes back as ("path", attribs) with only this shard's part of d,
+    #every other layer as the serialized text of its elements.
+    converter = _converter
+    view = converter.select(range(*node_range), range(*bin_range))
+    counts = {"nodes": node_range[1] - node_range[0], "bins": bin_range[1] - bin_range[0]}
+    counts["arrows"] = counts["nodes"]
+    parts = {}
+    elements = view.iter_elements(edges=False)
+    for layer in LAYERS:
+        buffer = io.StringIO()
+        stream = SVG_Stream(buffer, minify=converter.minify)
+        if converter.mode == "paths" and not converter.keep_ids:
+            if counts[layer]: #Empty layers are not drawn at all
+                parts[layer] = next(elements)
+            continue
+        for _ in range(counts[layer]):
+            stream.element(*next(elements))
+        parts[layer] = (buffer.getvalue(), stream.elements_written)
+    return parts
+
+
+def _render_edges():
+    #Runs in a worker: the serialized edges path
+    converter = _converter
+    buffer = io.StringIO()
+    stream = SVG_Stream(buffer, minify=converter.minify)
+    for tag, attribs in converter.iter_elements(shapes=False, edges=True):
+        stream.element(tag, attribs)
+    return buffer.getvalue(), stream.elements_written
+
+
+class SVG_Shards:
+    """
+    Writes the same document as SVG_Floorplan.write, with the drawing split over a process pool.
+
+    The converter has already found the global bounds and viewBox, so the header is written first. The nodes
+    (and arrows) of every zone form one shard, zones above an equal share of the cells several; bins follow
+    the sortplan order, so they are cut into runs of one zone each, or into equal runs when the sortplan mixes
+    zones. Every shard draws its part of each layer in a worker; the parts are then written layer by layer in
+    shard order, which is exactly the serial element order. In the paths mode without ids, the d data of the shards is joined into the one path per layer.
+    The edges path is drawn by a worker of its own.
+
+    Workers are forked and inherit the converter; where fork is not available (or inside a daemon process,
+    which cannot start a pool) the document is written serially.
+    """
+
+    def __init__(self, converter, workers: int = None):
+        if converter.mode not in SHARD_MODES:
+            raise ValueError(f"Sharded rendering supports the modes {SHARD_MODES}, not '{converter.mode}'")
+        self.converter = converter
+        self.workers = workers or multiprocessing.cpu_count()
+        self.elements_written = 0
+
+    @staticmethod
+    def can_fork():
+        return ("fork" in multiprocessing.get_all_start_methods()
+                and not multiprocessing.current_process().daemon)
+
+    def shards(self):
+        """
+        (node range, bin range) of every shard, as (start, stop) positions in the converter's drawing order.
+        """
+        converter = self.converter
+        floorplan = converter.floorplan
+        cell_zones = floorplan.cell_zones
+        cell_zones = cell_zones.tolist() if floorplan.vectorized else cell_zones
+        if converter.crop_positions is not None:
+            node_rows = list(converter.crop_positions)
+        else:
+            node_rows = range(len(converter.node_ids))
+        #Zones larger than an equal share of the cells are cut further, so one big zone does not hold up the rest
+        share = -(-len(node_rows) // self.workers)
+        node_ranges = [(start + offset, start + stop)
+                       for start, end in zone_ranges([cell_zones[row] for row in node_rows])
+                       for offset, stop in equal_ranges(end - start, -(-(end - start) // share))]
+        bin_ranges = zone_ranges([cell_zones[row] for row in converter.bin_rows])
+        if len(bin_ranges) > MAX_BIN_SHARDS_PER_WORKER * self.workers:
+            bin_ranges = equal_ranges(len(converter.bin_rows), self.workers)
+        num_shards = max(len(node_ranges), len(bin_ranges))
+        node_ranges += [(len(node_rows),) * 2] * (num_shards - len(node_ranges))
+        bin_ranges += [(len(converter.bin_rows),) * 2] * (num_shards - len(bin_ranges))
+        return list(zip(node_ranges, bin_ranges))
+
+    def __render(self):
+        #Shard results in shard order, and the edges text (None without edges)
+        global _converter
+        converter = self.converter
+        shards = self.shards()
+        if not self.can_fork() or self.workers < 2 or len(shards) < 2:
+            _converter, previous = converter, _converter
+            try:
+                return [_render_shard(*shard) for shard in shards], _render_edges() if converter.edges else None
+            finally:
+                _converter = previous
+        from concurrent.futures import ProcessPoolExecutor
+        _converter, previous = converter, _converter
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(shards) + converter.edges),
+                                     mp_context=multiprocessing.get_context("fork")) as pool:
+                edges = pool.submit(_render_edges) if converter.edges else None
+                futures = [pool.submit(_render_shard, *shard) for shard in shards]
+                return [future.result() for future in futures], edges.result() if edges is not None else None
+        finally:
+            _converter = previous
+
+    def write(self, fileobj):
+        """
+        Write the document to a text file-like object.
+        """
+        converter = self.converter
+        results, edges = self.__render()
+        stream = SVG_Stream(fileobj, minify=converter.minify)
+        stream.open(converter.svg_width, converter.svg_height, converter.viewbox)
+        written = 0
+        for layer in LAYERS:
+            parts = [result[layer] for result in results if layer in result]
+            if converter.mode == "paths" and not converter.keep_ids:
+                if parts:
+                    tag, attribs = parts[0]
+                    stream.element(tag, dict(attribs, d=" ".join(part[1]["d"] for part in parts)))
+                continue
+            for text, count in parts:
+                fileobj.write(text)
+                written += count
+        if edges is not None:
+            fileobj.write(edges[0])
+            written += edges[1]
+        stream.close()
+        self.elements_written = written + stream.elements_written
+        return self
@@ -0,0 +1,140 @@
+"""
+@Filename : SVG_Stream.py
+@Brief : Streams SVG elements straight to a file-like object without building an svgwrite DOM
+@Author : Soumitra Pandit
+"""
+
+#Namespace attributes svgwrite puts on the root <svg> element, in the order they are serialized
+SVG_NAMESPACES = (
+    ("xmlns", "http://www.w3.org/2000/svg"),
+    ("xmlns:ev", "http://www.w3.org/2001/xml-events"),
+    ("xmlns:xlink", "http://www.w3.org/1999/xlink"),
+)
+
+#Namespaces of the minified root element (xmlns:ev is never used by the drawing)
+MINIFIED_NAMESPACES = (SVG_NAMESPACES[0], SVG_NAMESPACES[2])
+
+#Number format of compact output: numbers are rounded to the precision first, so 15 significant digits
+#print them exactly, without trailing zeros
+COMPACT_NUMBER = "%.15g"
+
+
+#Shortest text of a number rounded to precision decimal places ("780" for 779.9999, "0" for -0.001):
+def compact_number(value, precision: int = 2):
+    text = "%.*f" % (precision, value)
+    if precision > 0:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+#Escape a double quoted attribute value (xml.sax.saxutils.escape would pull in urllib at import time):
+def escape_attribute(value: str):
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    return value
+
+
+def format_attributes(attribs: dict):
+    """
+    Serialize an attribute dict the same way svgwrite does: keys sorted, values passed through str(),
+    None and empty values dropped.
+
+    Args:
+        attribs (dict): SVG attribute names mapped to raw values.
+
+    Returns:
+        str: The attributes as ' key="value"' pairs.
+    """
+    parts = []
+    for key, value in sorted(attribs.items()):
+        if value is None:
+            continue
+        value = str(value)
+        if value:
+            parts.append(f' {key}="{escape_attribute(value)}"')
+    return "".join(parts)
+
+
+class SVG_Stream:
+    """
+    Writes an SVG document element by element. The layout matches what svgwrite produces with
+    pretty=True after SVG_Floorplan.flip_svg_vertically, so both backends give the same file.
+    With minify set, the document is written without indentation, line breaks, XML declaration or
+    empty <defs>.
+    """
+
+    def __init__(self, fileobj, indent: int = 2, minify: bool = False):
+        self.fileobj = fileobj
+        self.minify = minify
+        self.indent = "" if minify else " " * indent
+        self.newline = "" if minify else "\n"
+        self.elements_written = 0
+        self.opened = False
+
+    def open(self, width: str, height: str, viewbox, flip_transform: str = "scale(1, -1)", defs=()):
+        """
+        Write the XML declaration, the root <svg> element and the vertical flip group.
+
+        Args:
+            width (str): Width attribute including unit, e.g. "2600cm".
+            height (str): Height attribute including unit.
+            viewbox (tuple): (min_x, min_y, width, height) of the viewBox.
+            flip_transform (str): Transform applied to the group wrapping all elements.
+            defs (list): (tag, attribs, children) definitions written inside <defs>.
+        """
+        write = self.fileobj.write
+        newline = self.newline
+        if self.minify:
+            root = dict(height=height, viewBox=" ".join(COMPACT_NUMBER % value for value in viewbox), width=width)
+            namespaces = "".join(f' {key}="{value}"' for key, value in MINIFIED_NAMESPACES)
+            flip_transform = flip_transform.replace(", ", ",")
+        else:
+            root = dict(baseProfile="full", height=height, version="1.1",
+                        viewBox=",".join(str(value) for value in viewbox), width=width)
+            namespaces = "".join(f' {key}="{value}"' for key, value in SVG_NAMESPACES)
+            write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        write(f"<svg{namespaces}{format_attributes(root)}>{newline}")
+        write(f'{self.indent}<g transform="{flip_transform}">{newline}')
+        if defs:
+            write(f"{self.indent * 2}<defs>{newline}")
+            for tag, attribs, children in defs:
+                self.element(tag, attribs, children, depth=3)
+            write(f"{self.indent * 2}</defs>{newline}")
+        elif not self.minify:
+            write(f"{self.indent * 2}<defs/>{newline}")
+        self.opened = True
+
+    def element(self, tag: str, attribs: dict, children=(), depth: int = 2):
+        """
+        Write one element inside the flip group.
+
+        Args:
+            tag (str): Element name, e.g. "rect" or "line".
+            attribs (dict): SVG attribute names mapped to raw values.
+            children (list): Nested (tag, attribs, children) elements.
+            depth (int): Indentation level.
+        """
+        indent = self.indent * depth
+        newline = self.newline
+        if children:
+            self.fileobj.write(f"{indent}<{tag}{format_attributes(attribs)}>{newline}")
+            for child_tag, child_attribs, grandchildren in children:
+                self.element(child_tag, child_attribs, grandchildren, depth + 1)
+            self.fileobj.write(f"{indent}</{tag}>{newline}")
+        else:
+            self.fileobj.write(f"{indent}<{tag}{format_attributes(attribs)}/>{newline}")
+        if depth == 2:
+            self.elements_written += 1
+
+    def close(self):
+        """
+        Close the flip group and the root element.
+        """
+        self.fileobj.write(f"{self.indent}</g>{self.newline}</svg>\n")
+        self.opened = False
@@ -0,0 +1,219 @@
+"""
+@Filename : SVG_Tiles.py
+@Brief : Splits an SVG_Floorplan into a grid of SVG tiles with coarse level-of-detail tiles and a tile index
+@Author : Soumitra Pandit
+"""
+
+import os
+import json
+import math
+from SVG_Stream import SVG_Stream
+
+#Side of a full detail tile (in Meters)
+TILE_SIZE = 50
+
+#Most coarse levels written on top of the detail level
+MAX_LEVELS = 8
+
+#Outline buckets per tile side on the coarse levels
+LOD_GRID = 64
+
+#Style of the aggregated outlines on the coarse levels
+OUTLINE_STYLE = {"fill": "rgb(0,100,100)", "fill-opacity": "0.3", "stroke": "none"}
+
+#Name of the tile index written next to the level folders
+INDEX_FILE = "index.json"
+
+
+class SVG_Tiles:
+    """
+    Tiles the drawing of an SVG_Floorplan.
+
+    Level 0 holds the full detail: the plan is cut into tile_size x tile_size tiles and every cell is
+    assigned to the tile its pose falls in. Cells within one element's reach of a tile edge are drawn
+    in the neighbouring tile as well, so nothing is clipped at tile borders.
+    Level L >= 1 doubles the tile size L times and replaces nodes and bins with outlines: the tile is
+    split into LOD_GRID x LOD_GRID buckets and every run of occupied buckets becomes one rect.
+    Tiles are laid out in SVG user units after the vertical flip, starting at the top left of the plan;
+    only tiles with content are written.
+    """
+
+    def __init__(self, converter, tile_size: float = TILE_SIZE):
+        self.converter = converter
+        self.tile_size = tile_size * converter.scale
+        self.unit = converter.unit
+        self.precision = converter.precision
+        clearance_width = converter.bin_width + converter.node_width
+        clearance_height = converter.bin_height + converter.node_height
+        self.margin = max(clearance_width, clearance_height) #Farthest any element reaches from its cell's pose
+        #Top left corner and size of the plan, as seen after the vertical flip
+        self.origin = (converter.x_min - clearance_width, -converter.y_max - clearance_height)
+        self.extent = (converter.x_max - converter.x_min + 2 * clearance_width,
+                       converter.y_max - converter.y_min + 2 * clearance_height)
+        self.empty = len(converter.node_coords) == 0
+
+    #Flipped position of every pose relative to the tile origin:
+    def __offsets(self, coords):
+        coords = coords.tolist() if hasattr(coords, "tolist") else coords
+        origin_x, origin_y = self.origin
+        return [(coord[0] - origin_x, -coord[1] - origin_y) for coord in coords]
+
+    def __grid(self, size: float):
+        return (max(1, math.ceil(self.extent[0] / size)), max(1, math.ceil(self.extent[1] / size)))
+
+    def __viewbox(self, col: int, row: int, size: float):
+        return (self.origin[0] + col * size, self.origin[1] + row * size, size, size)
+
+    def assign(self, coords, size: float = None, margin: float = 0.0):
+        """
+        Group rows of coords by the tiles they fall into.
+
+        Args:
+            coords (list | np.ndarray): (x, y, theta) rows in drawing coordinates.
+            size (float): Tile side in SVG user units, defaults to the detail tile size.
+            margin (float): Also add a row to every tile within this distance of its pose.
+
+        Returns:
+            dict: (col, row) -> list of row indices, in row order.
+        """
+        size = size or self.tile_size
+        columns, rows = self.__grid(size)
+        tiles = {}
+        for index, (x, y) in enumerate(self.__offsets(coords)):
+            first_col = max(0, math.floor((x - margin) / size))
+            last_col = min(columns - 1, math.floor((x + margin) / size))
+            first_row = max(0, math.floor((y - margin) / size))
+            last_row = min(rows - 1, math.floor((y + margin) / size))
+            for col in range(first_col, last_col + 1):
+                for row in range(first_row, last_row + 1):
+                    tiles.setdefault((col, row), []).append(index)
+        return tiles
+
+    def levels(self):
+        """
+        Number of levels, the detail level included: coarse levels are added until one tile covers the plan.
+        """
+        level = 1
+        while level < MAX_LEVELS and self.__grid(self.tile_size * 2 ** level) != (1, 1):
+            level += 1
+        return level + 1
+
+    def __write_detail(self, folder_path: str):
+        converter = self.converter
+        size = self.tile_size
+        node_tiles = self.assign(converter.node_coords, size, self.margin)
+        bin_tiles = self.assign(converter.bin_coords, size, self.margin)
+        owners = self.assign(converter.node_coords, size)
+        tiles = []
+        for col, row in sorted(set(node_tiles) | set(bin_tiles)):
+            view = converter.select(node_tiles.get((col, row), []), bin_tiles.get((col, row), []))
+            view.viewbox = self.__viewbox(col, row, size)
+            view.svg_width = view.svg_height = str(int(math.ceil(size))) + self.unit
+            name = f"0/{col}_{row}.svg"
+            with open(os.path.join(folder_path, name), "w", encoding="utf-8") as fileobj:
+                view.write(fileobj)
+            tiles.append({"col": col, "row": row, "file": name, "viewBox": list(view.viewbox),
+                          "cells": len(owners.get((col, row), [])), "elements": view.elements_drawn})
+        return tiles
+
+    def __outlines(self, offsets, size: float):
+        bucket = size / LOD_GRID
+        reach = self.margin / 2
+        occupied = {}
+        for x, y in offsets:
+            for bucket_x in range(math.floor((x - reach) / bucket), math.floor((x + reach) / bucket) + 1):
+                for bucket_y in range(math.floor((y - reach) / bucket), math.floor((y + reach) / bucket) + 1):
+                    tile = (bucket_x // LOD_GRID, bucket_y // LOD_GRID)
+                    occupied.setdefault(tile, set()).add((bucket_y, bucket_x))
+
+        #Per tile: merge occupied buckets into horizontal runs, then stack equal runs of consecutive rows
+        outlines = {}
+        for tile, buckets in occupied.items():
+            rects = []
+            open_runs = {} #(first_x, last_x) -> [first_y, last_y]
+            last_row = None
+            for bucket_y, bucket_x in sorted(buckets):
+                if bucket_y != last_row:
+                    if last_row is not None:
+                        self.__close_runs(open_runs, row_runs, last_row, rects)
+                    row_runs = []
+                    last_row = bucket_y
+                if row_runs and row_runs[-1][1] == bucket_x - 1:
+                    row_runs[-1][1] = bucket_x
+                else:
+                    row_runs.append([bucket_x, bucket_x])
+            self.__close_runs(open_runs, row_runs, last_row, rects)
+            rects.extend((run[0], first_y, run[1], last_y) for run, (first_y, last_y) in open_runs.items())
+            outlines[tile] = sorted(rects, key=lambda rect: (rect[1], rect[0]))
+        return outlines
+
+    @staticmethod
+    def __close_runs(open_runs: dict, row_runs: list, bucket_y: int, rects: list):
+        #Runs of this row extend the equal runs of the row above; runs that stopped become rects
+        current = {(first_x, last_x) for first_x, last_x in row_runs}
+        for run in list(open_runs):
+            first_y, last_y = open_runs[run]
+            if run in current and last_y == bucket_y - 1:
+                open_runs[run][1] = bucket_y
+                current.discard(run)
+            else:
+                rects.append((run[0], first_y, run[1], last_y))
+                del open_runs[run]
+        for run in current:
+            open_runs[run] = [bucket_y, bucket_y]
+
+    def __write_outlines(self, folder_path: str, level: int):
+        size = self.tile_size * 2 ** level
+        bucket = size / LOD_GRID
+        origin_x, origin_y = self.origin
+        cells = self.assign(self.converter.node_coords, size)
+        tiles = []
+        for (col, row), rects in sorted(self.__outlines(self.__offsets(self.converter.node_coords), size).items()):
+            viewbox = self.__viewbox(col, row, size)
+            name = f"{level}/{col}_{row}.svg"
+            side = str(int(math.ceil(size))) + self.unit
+            with open(os.path.join(folder_path, name), "w", encoding="utf-8") as fileobj:
+                stream = SVG_Stream(fileobj)
+                stream.open(side, side, viewbox)
+                for first_x, first_y, last_x, last_y in rects:
+                    #Buckets count down the flipped y axis, the rects are drawn inside the flip group
+                    stream.element("rect", dict(OUTLINE_STYLE,
+                                                x=round(origin_x + first_x * bucket, self.precision),
+                                                y=round(-(origin_y + (last_y + 1) * bucket), self.precision),
+                                                width=round((last_x - first_x + 1) * bucket, self.precision),
+                                                height=round((last_y - first_y + 1) * bucket, self.precision)))
+                stream.close()
+            tiles.append({"col": col, "row": row, "file": name, "viewBox": list(viewbox),
+                          "cells": len(cells.get((col, row), [])), "elements": len(rects)})
+        return tiles
+
+    def write(self, folder_path: str):
+        """
+        Write every level to folder_path/<level>/<col>_<row>.svg and the tile index to folder_path/index.json.
+
+        Returns:
+            dict: The tile index.
+        """
+        index = {
+            "unit": self.unit,
+            "tile_size": self.tile_size,
+            "origin": list(self.origin),
+            "bounds": list(self.origin) + list(self.extent),
+            "levels": [],
+        }
+        if os.path.isdir(folder_path): #Drop the levels of an earlier export, its grid may differ
+            import shutil
+            for entry in os.scandir(folder_path):
+                if entry.is_dir() and entry.name.isdigit():
+                    shutil.rmtree(entry.path)
+        for level in range(0 if self.empty else self.levels()):
+            os.makedirs(os.path.join(folder_path, str(level)), exist_ok=True)
+            size = self.tile_size * 2 ** level
+            columns, rows = self.__grid(size)
+            tiles = self.__write_detail(folder_path) if level == 0 else self.__write_outlines(folder_path, level)
+            index["levels"].append({"level": level, "detail": "full" if level == 0 else "outline",
+                                    "tile_size": size, "columns": columns, "rows": rows, "tiles": tiles})
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, INDEX_FILE), "w") as f:
+            json.dump(index, f, indent=2)
+        return index
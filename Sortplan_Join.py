@@ -0,0 +1,70 @@
+"""
+@Filename : Sortplan_Join.py
+@Brief : Joins sortplan entries to floorplan cells and expands every sub-direction into one bin
+@Author : Soumitra Pandit
+"""
+
+
+class Sortplan_Join:
+    """
+    One pass over the sortplan entries collects what the bins need; all keys are then resolved to cell rows
+    at once, and keys without a cell are collected in missing instead of failing on the first one.
+
+    Every sub-direction of an output entry becomes its own bin (left and right side alike); input entries
+    become one bin each. The per-bin columns are aligned: bin i sits at cell rows[i].
+    """
+
+    def __init__(self, floorplan, entries):
+        """
+        Args:
+            floorplan (Floorplan): Floorplan whose cell_index the keys are resolved against.
+            entries (iterable): (key, entry) pairs, e.g. sortplan.items() or a streamed sortplan.
+        """
+        self.floorplan = floorplan
+        keys = []
+        bin_entries = [] #Entry index of every bin
+        self.types = []
+        self.sides = []
+        self.bin_ids = [] #The key, plus the sub-direction id when an entry has several
+        for key, entry in entries:
+            entry_index = len(keys)
+            keys.append(key)
+            entry_type = entry["type"]
+            if entry_type != "output":
+                bin_entries.append(entry_index)
+                self.types.append(entry_type)
+                self.sides.append(-1)
+                self.bin_ids.append(key)
+                continue
+            sub_directions = entry["sub_directions"]
+            several = len(sub_directions) > 1
+            for sub_id, sub_direction in sub_directions.items():
+                bin_entries.append(entry_index)
+                self.types.append(entry_type)
+                self.sides.append(sub_direction["side"])
+                self.bin_ids.append(f"{key}/{sub_id}" if several else key)
+
+        #Resolve every key in one go
+        entry_rows = list(map(floorplan.cell_index.get, keys))
+        self.missing = [key for key, row in zip(keys, entry_rows) if row is None]
+        rows = [entry_rows[entry_index] for entry_index in bin_entries]
+        if self.missing: #Drop the bins of unknown keys from every column
+            keep = [index for index, row in enumerate(rows) if row is not None]
+            rows = [rows[index] for index in keep]
+            for column in ("types", "sides", "bin_ids"):
+                values = getattr(self, column)
+                setattr(self, column, [values[index] for index in keep])
+        self.rows = rows
+        self.num_entries = len(keys)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def missing_error(self, limit: int = 10):
+        """
+        A KeyError naming all (up to limit) sortplan keys that have no cell, or None when all resolved.
+        """
+        if not self.missing:
+            return None
+        shown = ", ".join(self.missing[:limit]) + (", ..." if len(self.missing) > limit else "")
+        return KeyError(f"{len(self.missing)} of {self.num_entries} sortplan keys are not in the floorplan: {shown}")
@@ -0,0 +1,133 @@
+"""
+@Filename : Spatial_Index.py
+@Brief : Uniform grid index over cell positions for bounding-box and nearest-cell queries
+@Author : Soumitra Pandit
+"""
+
+import math
+
+#Average number of points per grid bucket the default bucket size aims for
+POINTS_PER_BUCKET = 4
+
+#Smallest default bucket side (plan units, Meters for floorplan poses), so a single cell or a line of cells
+#does not get buckets of almost no size
+MIN_BUCKET_SIZE = 1.0
+
+
+class Spatial_Index:
+    """
+    Buckets points into a uniform grid of square buckets. Built once in a single pass; queries only
+    look at the buckets that overlap the query, so they cost about the number of points returned.
+    """
+
+    def __init__(self, points, bucket_size: float = None):
+        """
+        Args:
+            points (list | np.ndarray): (x, y, ...) rows; only x and y are indexed.
+            bucket_size (float): Side of a grid bucket, by default chosen from the point density.
+        """
+        points = points.tolist() if hasattr(points, "tolist") else points
+        self.xs = [float(point[0]) for point in points]
+        self.ys = [float(point[1]) for point in points]
+        self.buckets = {}
+        if not self.xs:
+            self.bounds = None
+            self.bucket_size = bucket_size or 1.0
+            return
+        self.bounds = (min(self.xs), min(self.ys), max(self.xs), max(self.ys))
+        if bucket_size is None:
+            #From the area for spread out plans, from the longer side for plans that are (almost) a line
+            width, height = self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1]
+            share = POINTS_PER_BUCKET / len(self.xs)
+            bucket_size = max(math.sqrt(width * height * share), max(width, height) * share, MIN_BUCKET_SIZE)
+        self.bucket_size = bucket_size
+        buckets = self.buckets
+        for row, (x, y) in enumerate(zip(self.xs, self.ys)):
+            key = (math.floor(x / bucket_size), math.floor(y / bucket_size))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [row]
+            else:
+                bucket.append(row)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        """
+        Rows of all points inside the box (edges included).
+
+        Returns:
+            list: Row indices in ascending order.
+        """
+        size = self.bucket_size
+        first_x, last_x = math.floor(min_x / size), math.floor(max_x / size)
+        first_y, last_y = math.floor(min_y / size), math.floor(max_y / size)
+        xs, ys = self.xs, self.ys
+        rows = []
+        if (last_x - first_x + 1) * (last_y - first_y + 1) > len(self.buckets): #Box larger than the plan
+            candidates = (bucket for (bucket_x, bucket_y), bucket in self.buckets.items()
+                          if first_x <= bucket_x <= last_x and first_y <= bucket_y <= last_y)
+        else:
+            candidates = (self.buckets[key] for key in
+                          ((bucket_x, bucket_y) for bucket_x in range(first_x, last_x + 1)
+                           for bucket_y in range(first_y, last_y + 1)) if key in self.buckets)
+        for bucket in candidates:
+            rows.extend(row for row in bucket if min_x <= xs[row] <= max_x and min_y <= ys[row] <= max_y)
+        rows.sort()
+        return rows
+
+    def nearest(self, x: float, y: float, max_distance: float = None):
+        """
+        Row of the point closest to (x, y); ties go to the lower row.
+
+        Args:
+            max_distance (float): Give up beyond this distance.
+
+        Returns:
+            tuple: (row, distance), or (None, None) when no point is close enough.
+        """
+        if not self.buckets:
+            return None, None
+        size = self.bucket_size
+        center_x, center_y = math.floor(x / size), math.floor(y / size)
+        #Buckets that can hold points; rings are walked only where they cross this box
+        box = (math.floor(self.bounds[0] / size), math.floor(self.bounds[1] / size),
+               math.floor(self.bounds[2] / size), math.floor(self.bounds[3] / size))
+        #Rings closer than the box are empty, rings beyond its far corner too
+        min_ring = max(box[0] - center_x, center_x - box[2], box[1] - center_y, center_y - box[3], 0)
+        max_ring = max(abs(center_x - box[0]), abs(center_x - box[2]), abs(center_y - box[1]), abs(center_y - box[3]))
+        best_row, best_squared = None, math.inf
+        xs, ys = self.xs, self.ys
+        for ring in range(min_ring, max_ring + 1):
+            #Every point in ring r or further is at least (r - 1) * size away
+            if best_row is not None and ((ring - 1) * size) ** 2 > best_squared:
+                break
+            if max_distance is not None and (ring - 1) * size > max_distance:
+                break
+            for key in self.__ring(center_x, center_y, ring, box):
+                for row in self.buckets.get(key, ()):
+                    squared = (xs[row] - x) ** 2 + (ys[row] - y) ** 2
+                    if squared < best_squared or (squared == best_squared and row < best_row):
+                        best_row, best_squared = row, squared
+        if best_row is None or (max_distance is not None and best_squared > max_distance ** 2):
+            return None, None
+        return best_row, math.sqrt(best_squared)
+
+    @staticmethod
+    def __ring(center_x: int, center_y: int, ring: int, box: tuple):
+        #Buckets at Chebyshev distance ring from the center, clipped to box (min x, min y, max x, max y)
+        min_x, min_y, max_x, max_y = box
+        if ring == 0:
+            yield center_x, center_y
+            return
+        first_x, last_x = max(center_x - ring, min_x), min(center_x + ring, max_x)
+        for bucket_y in (center_y - ring, center_y + ring):
+            if min_y <= bucket_y <= max_y:
+                for bucket_x in range(first_x, last_x + 1):
+                    yield bucket_x, bucket_y
+        first_y, last_y = max(center_y - ring + 1, min_y), min(center_y + ring - 1, max_y)
+        for bucket_x in (center_x - ring, center_x + ring):
+            if min_x <= bucket_x <= max_x:
+                for bucket_y in range(first_y, last_y + 1):
+                    yield bucket_x, bucket_y
@@ -0,0 +1,328 @@
+"""
+@Filename : benchmark.py
+@Brief : Times and memory-profiles every phase of SVG_Floorplan on synthetic floorplans of increasing size
+@Author : Soumitra Pandit
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from SVG_Floorplan import SVG_Floorplan
+from JSON_Loader import load_file
+from Plan_Generator import write_plan
+
+#Import-time budget of "import main" in a fresh interpreter, in milliseconds, used when no baseline is recorded
+IMPORT_BUDGET_MS = 60
+
+#Environment variable that sets the import-time budget of this machine, in milliseconds
+IMPORT_BUDGET_ENV = "JSON2SVG_IMPORT_BUDGET_MS"
+
+#Allowed slowdown against the import time recorded in a results file
+IMPORT_HEADROOM = 1.5
+
+#Fresh interpreters started per import measurement; the fastest one counts
+IMPORT_REPEAT = 7
+
+#Modules a one-shot conversion must not load at startup
+LAZY_MODULES = ("numpy", "svgwrite", "orjson", "urllib.request", "subprocess", "concurrent.futures.process")
+
+
+#Pipeline phases in the order they run, as reported in the results file.
+#"parse" is the JSON decoding of both documents, "floorplan" building the Floorplan from them
+#and "serialize" writing the SVG. The stream backend draws while serializing, so it has no draw/flip.
+PHASES = ("parse", "floorplan", "extract", "bins", "draw", "flip", "serialize")
+
+#SVG_Floorplan's own phase names mapped to the ones above
+CONVERTER_PHASES = {"load": "floorplan", "extract": "extract", "bins": "bins", "draw": "draw", "flip": "flip", "save": "serialize"}
+
+#Results file written by default, next to where the benchmark is run
+DEFAULT_RESULTS = "benchmark_results.json"
+
+#Output formats: indented SVG, minified SVG, and minified SVG gzip compressed while it is written
+FORMATS = ("pretty", "minified", "svgz")
+
+
+def profile_conversion(floorplan_file: str, sortplan_file: str, svg_file: str, backend: str, mode: str,
+                       memory: bool = False, streaming: bool = False, minify: bool = False):
+    """
+    Convert one plan and measure every phase separately.
+
+    Args:
+        floorplan_file (str): Floorplan JSON to convert.
+        sortplan_file (str): Sortplan JSON to convert.
+        svg_file (str): Where to write the SVG (compressed when it ends in .svgz).
+        backend (str): SVG_Floorplan backend.
+        mode (str): SVG_Floorplan output mode.
+        memory (bool): Trace allocations and report the peak of every phase (slows the run down).
+        streaming (bool): Let SVG_Floorplan stream the files; there is no separate parse phase then.
+        minify (bool): Write minified SVG.
+
+    Returns:
+        dict: seconds (phase -> s), output_bytes, raw_bytes (before compression), and peak_bytes (phase -> bytes)
+              when memory is set.
+    """
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+    try:
+        if memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        seconds = {}
+        peak_bytes = {}
+        if streaming:
+            converter = SVG_Floorplan(svg_file, floorplan_file, sortplan_file, backend=backend, mode=mode, streaming=True,
+                                      minify=minify)
+        else:
+            start = time.perf_counter()
+            floorplan_data = load_file(floorplan_file)
+            sortplan_data = load_file(sortplan_file) if sortplan_file else None
+            seconds["parse"] = time.perf_counter() - start
+            if memory:
+                peak_bytes["parse"] = tracemalloc.get_traced_memory()[1] - baseline
+            converter = SVG_Floorplan.from_data(svg_file, floorplan_data, sortplan_data, backend=backend, mode=mode,
+                                                minify=minify)
+            del floorplan_data, sortplan_data
+        converter.save()
+    finally:
+        if memory:
+            tracemalloc.stop()
+    for phase, name in CONVERTER_PHASES.items():
+        if phase in converter.timings:
+            seconds[name] = converter.timings[phase]
+        if phase in converter.memory:
+            peak_bytes[name] = converter.memory[phase]
+    result = {"seconds": seconds, "total_seconds": sum(seconds.values()), "output_bytes": os.path.getsize(svg_file),
+              "raw_bytes": converter.bytes_uncompressed}
+    if memory:
+        result["peak_bytes"] = peak_bytes
+    return result
+
+
+def environment():
+    """
+    Describe the commit and interpreter a run was made with, so results files can be told apart.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    packages = {}
+    for package in ("numpy", "svgwrite", "orjson"):
+        try:
+            packages[package] = __import__(package).__version__
+        except (ImportError, AttributeError):
+            packages[package] = None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "packages": packages,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(sizes, configs, memory=True, results_file=DEFAULT_RESULTS, streaming=False, formats=("pretty",)):
+    """
+    Generate one synthetic plan per size, convert it with every (backend, mode) config in every output
+    format and write per-phase timings, output sizes and memory peaks to results_file.
+
+    Args:
+        sizes (list): Cell counts to benchmark.
+        configs (list): (backend, mode) pairs to convert with.
+        memory (bool): Also run every conversion once more under tracemalloc.
+        results_file (str): JSON file the results are written to, None to only print them.
+        streaming (bool): Stream the input files instead of parsing them whole.
+        formats (list): Output formats out of FORMATS. With more than one, every format's size and serialize
+                        time is also printed relative to the first.
+
+    Returns:
+        dict: The results document.
+    """
+    import_ms, loaded = measure_import("main")
+    results = {"environment": environment(), "phases": list(PHASES), "streaming": streaming,
+               "import": {"module": "main", "best_ms": import_ms, "repeat": IMPORT_REPEAT, "loaded": loaded}, "runs": []}
+    print(f"import main: {import_ms:.1f} ms, best of {IMPORT_REPEAT}")
+    header = "".join(f"{phase:>11}" for phase in PHASES)
+    print(f"{'cells':>8} {'backend':>8} {'mode':>8} {'format':>8} {'total (s)':>10} {'us/cell':>8}{header}   peak MB   size KB")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_cells in sizes:
+            floorplan_file, sortplan_file = write_plan(tmp_dir, num_cells)
+            input_bytes = os.path.getsize(floorplan_file) + os.path.getsize(sortplan_file)
+            for backend, mode in configs:
+                format_runs = []
+                for output_format in formats:
+                    extension = "svgz" if output_format == "svgz" else "svg"
+                    svg_file = os.path.join(tmp_dir, f"output_{num_cells}_{backend}_{mode}.{extension}")
+                    minify = output_format != "pretty"
+                    run_result = {"cells": num_cells, "backend": backend, "mode": mode, "format": output_format,
+                                  "input_bytes": input_bytes}
+                    run_result.update(profile_conversion(floorplan_file, sortplan_file, svg_file, backend, mode,
+                                                         streaming=streaming, minify=minify))
+                    if memory:
+                        run_result["peak_bytes"] = profile_conversion(floorplan_file, sortplan_file, svg_file, backend,
+                                                                      mode, memory=True, streaming=streaming,
+                                                                      minify=minify)["peak_bytes"]
+                    os.remove(svg_file)
+                    results["runs"].append(run_result)
+                    format_runs.append(run_result)
+
+                    total = run_result["total_seconds"]
+                    phases = "".join(f"{run_result['seconds'][phase]:>11.3f}" if phase in run_result["seconds"]
+                                     else f"{'-':>11}" for phase in PHASES)
+                    peak = f"{max(run_result['peak_bytes'].values()) / 2**20:>10.1f}" if memory else f"{'-':>10}"
+                    print(f"{num_cells:>8} {backend:>8} {mode:>8} {output_format:>8} {total:>10.3f} "
+                          f"{total / num_cells * 1e6:>8.1f}{phases}{peak}{run_result['output_bytes'] / 1024:>10.1f}")
+                if len(format_runs) > 1:
+                    print_format_ratios(format_runs)
+            os.remove(floorplan_file)
+            os.remove(sortplan_file)
+
+    if results_file:
+        with open(results_file, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {results_file}")
+    return results
+
+
+def print_format_ratios(format_runs):
+    """
+    Print the output size and serialize time of every format relative to the first one.
+    """
+    first = format_runs[0]
+    for run_result in format_runs[1:]:
+        size = run_result["output_bytes"] / first["output_bytes"]
+        seconds = run_result["seconds"]["serialize"] / first["seconds"]["serialize"]
+        print(f"{'':>8} {run_result['format']:>8} vs {first['format']}: size {size:.3f}x "
+              f"({(run_result['output_bytes'] - first['output_bytes']) / 1024:+.1f} KB), serialize {seconds:.2f}x "
+              f"({(run_result['seconds']['serialize'] - first['seconds']['serialize']) * 1e3:+.1f} ms)")
+
+
+def compare(results: dict, baseline_file: str):
+    """
+    Print the per-phase time and memory ratio of results against an earlier results file.
+    Ratios above 1 mean the current run is slower or uses more memory.
+    """
+    with open(baseline_file, "r") as f:
+        baseline = json.load(f)
+    previous = {(run["cells"], run["backend"], run["mode"], run.get("format", "pretty")): run for run in baseline["runs"]}
+    print(f"Compared to {baseline_file} (commit {(baseline['environment'].get('commit') or '?')[:10]}):")
+    for run in results["runs"]:
+        old = previous.get((run["cells"], run["backend"], run["mode"], run["format"]))
+        if old is None:
+            continue
+        ratios = []
+        for phase in PHASES:
+            if phase in run["seconds"] and old["seconds"].get(phase):
+                ratio = f"{phase}={run['seconds'][phase] / old['seconds'][phase]:.2f}x"
+                if phase in run.get("peak_bytes", {}) and old.get("peak_bytes", {}).get(phase):
+                    ratio += f"/{run['peak_bytes'][phase] / old['peak_bytes'][phase]:.2f}x mem"
+                ratios.append(ratio)
+        print(f"{run['cells']:>8} {run['backend']:>8} {run['mode']:>8} {run['format']:>8}  total={run['total_seconds'] / old['total_seconds']:.2f}x  "
+              + " ".join(ratios))
+
+
+def measure_import(module="main", repeat=IMPORT_REPEAT):
+    """
+    Import a module in fresh interpreters with -X importtime.
+
+    Args:
+        module (str): Module to import.
+        repeat (int): Number of interpreters to start.
+
+    Returns:
+        tuple: (best cumulative import time in ms, sorted list of LAZY_MODULES that got loaded). The best run is
+               the one least disturbed by the rest of the machine, so it varies far less than the median.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                 cwd=here, capture_output=True, text=True, check=True)
+        for line in process.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[2] == module:
+                samples.append(int(fields[1]) / 1000)
+    probe = f"import {module}, sys, json; print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    loaded = json.loads(subprocess.run([sys.executable, "-c", probe], cwd=here, capture_output=True,
+                                       text=True, check=True).stdout.strip().splitlines()[-1])
+    return min(samples), sorted(loaded)
+
+
+def import_budget(results_file=DEFAULT_RESULTS):
+    """
+    Import-time budget of this machine, from the first of: the IMPORT_BUDGET_ENV environment variable, the
+    import time recorded in results_file (by a benchmark run on this machine) times IMPORT_HEADROOM, and
+    IMPORT_BUDGET_MS.
+
+    Returns:
+        tuple: (budget in ms, where it came from)
+    """
+    if os.environ.get(IMPORT_BUDGET_ENV):
+        return float(os.environ[IMPORT_BUDGET_ENV]), IMPORT_BUDGET_ENV
+    try:
+        with open(results_file, "r") as f:
+            recorded = json.load(f).get("import") or {}
+    except (OSError, ValueError, TypeError):
+        recorded = {}
+    if recorded.get("best_ms"):
+        return recorded["best_ms"] * IMPORT_HEADROOM, f"{IMPORT_HEADROOM}x the {recorded['best_ms']:.1f} ms in {results_file}"
+    return IMPORT_BUDGET_MS, "default"
+
+
+def check_import_budget(budget_ms=None, results_file=DEFAULT_RESULTS):
+    """
+    Fail when "import main" takes longer than the budget or eagerly loads a heavy module.
+
+    Args:
+        budget_ms (float): Budget in ms, None to take it from import_budget(results_file).
+        results_file (str): Results file with a recorded import time.
+
+    Returns:
+        bool: True when startup is within budget.
+    """
+    source = "--import-budget"
+    if budget_ms is None:
+        budget_ms, source = import_budget(results_file)
+    import_ms, loaded = measure_import("main")
+    print(f"import main: {import_ms:.1f} ms, best of {IMPORT_REPEAT} (budget {budget_ms:.1f} ms, {source})")
+    if loaded:
+        print(f"Modules that should load lazily were imported at startup: {', '.join(loaded)}")
+    return import_ms <= budget_ms and not loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SVG_Floorplan render scaling.")
+    parser.add_argument("sizes", nargs="*", type=int, default=[100, 1000, 10000, 100000])
+    parser.add_argument("--import-budget", type=float, nargs="?", const=0, default=None, metavar="MS",
+                        help=f"Only check the startup import-time budget and exit 1 if it is exceeded; without MS the "
+                             f"budget is ${IMPORT_BUDGET_ENV}, else {IMPORT_HEADROOM}x the import time recorded in "
+                             f"--output, else {IMPORT_BUDGET_MS} ms")
+    parser.add_argument("--backend", choices=["svgwrite", "stream"], nargs="+", default=["svgwrite", "stream"])
+    parser.add_argument("--mode", choices=["elements", "paths", "symbols"], nargs="+", default=["elements"])
+    parser.add_argument("--format", choices=FORMATS, nargs="+", default=["pretty"],
+                        help="Output formats; with several, sizes and serialize times are compared to the first")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--streaming", action="store_true", help="Stream the input files instead of parsing them whole")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help=f"Results file (default {DEFAULT_RESULTS})")
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    args = parser.parse_args()
+    if args.import_budget is not None:
+        sys.exit(0 if check_import_budget(args.import_budget or None, args.output) else 1)
+    configs = [(backend, mode) for backend in args.backend for mode in args.mode]
+    results = run(args.sizes, configs, memory=not args.no_memory, results_file=args.output, streaming=args.streaming,
+                  formats=args.format)
+    if args.compare:
+        compare(results, args.compare)
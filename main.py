@@ -1,25 +1,57 @@
 import os
 import sys
-import svgwrite
+import json
+import time
+import argparse
 from SVG_Floorplan import SVG_Floorplan
-import subprocess
+from Build_Cache import Build_Cache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from Artifact_Store import DEFAULT_STORE_DIR
+from Metrics import Metrics_Recorder, write_metrics
 
-def convert_svg_to_dxf(svg_file: str):
+#Options every conversion renders with. The stream backend gives the same file as svgwrite
+#without building the DOM; validate rejects a bad plan with all of its problems before rendering
+#(--no-validate turns it off, e.g. for plans with links to cells that do not exist).
+RENDER_OPTIONS = {"backend": "stream", "validate": True}
+
+def convert_to_dxf(converter, dxf_file: str = None):
     """
-    Converts the specified SVG file to a DXF file using Inkscape.
-    :param svg_file: Path to the SVG file that needs to be converted.
+    Writes the drawing of an SVG_Floorplan to a DXF file, from the geometry the converter already holds
+    (no second parse of the SVG, no Inkscape).
+    :param converter: SVG_Floorplan whose nodes, bins and arrows are exported.
+    :param dxf_file: Output path, by default the converter's svg_file with a .dxf extension.
+    :return: Path of the written DXF file.
     """
-    # Generate the output DXF file name based on the SVG file name
-    dxf_file = os.path.splitext(svg_file)[0] + ".dxf"
-    print(f"Converting {svg_file} to {dxf_file} using Inkscape...")
+    from DXF_Writer import DXF_Writer
+    if dxf_file is None:
+        dxf_file = os.path.splitext(converter.svg_file)[0] + ".dxf"
+    DXF_Writer(converter).save(dxf_file)
+    return dxf_file
+
+
+def convert_to_geometry(converter, geometry_file: str = None):
+    """
+    Writes the computed geometry of an SVG_Floorplan as a binary file that can be memory-mapped (see
+    Geometry_Export).
+    :param converter: SVG_Floorplan whose nodes, bins and arrows are exported.
+    :param geometry_file: Output path, by default the converter's svg_file with a .geom extension.
+    :return: Path of the written geometry file.
+    """
+    from Geometry_Export import Geometry_Export, GEOMETRY_SUFFIX
+    if geometry_file is None:
+        geometry_file = os.path.splitext(converter.svg_file)[0] + GEOMETRY_SUFFIX
+    Geometry_Export(converter).save(geometry_file)
+    return geometry_file
+
 
-    # Use subprocess to call the Inkscape command for conversion
-    command = f"inkscape {svg_file} --export-filename={dxf_file}"
-    try:
-        subprocess.run(command, shell=True, check=True)
-        print(f"Successfully converted {svg_file} to {dxf_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error during conversion: {e}")
+
+
+
+def output_path(folder_path, options=None, svgz=False):
+    """
+    Path of the SVG a conversion writes: output.svg, output_crop.svg for a crop, .svgz when compressed.
+    """
+    name = "output_crop" if (options or {}).get("crop") else "output"
+    return os.path.join(folder_path, name + (".svgz" if svgz else ".svg"))
 
 
 
@@ -36,7 +68,25 @@ def find_file_by_pattern(folder_path, pattern):
     Returns:
         str: The first file name that matches the pattern, or None if no match is found.
     """
-    for file_name in os.listdir(folder_path):
+    return match_file_by_pattern(folder_path, os.listdir(folder_path), pattern)
+
+
+
+
+
+def match_file_by_pattern(folder_path, file_names, pattern):
+    """
+    Pick the file find_file_by_pattern would pick from an already listed folder.
+
+    Args:
+        folder_path (str): The folder the names were listed from.
+        file_names (list): File names in the folder, in listing order.
+        pattern (str): The substring pattern to look for in file names.
+
+    Returns:
+        str: The first file name that matches the pattern, or None if no match is found.
+    """
+    for file_name in file_names:
         if pattern in file_name and file_name.endswith(".json"):
             return os.path.join(folder_path, file_name)
     return None
@@ -45,12 +95,325 @@ def find_file_by_pattern(folder_path, pattern):
 
 
 
-def convert_folder(folder_path):
+def discover_plan_folders(root_path):
+    """
+    Walk a directory tree once and pair each floorplan with the sortplan in the same folder.
+
+    Args:
+        root_path (str): Root of the tree to search.
+
+    Returns:
+        list: (folder_path, floorplan_file, sortplan_file) for every folder that has a floorplan,
+              sorted by folder. sortplan_file is None when the folder has none.
+    """
+    jobs = []
+    for folder_path, dir_names, file_names in os.walk(os.path.abspath(root_path)):
+        dir_names[:] = [name for name in dir_names if not name.startswith(".")]
+        floorplan_file = match_file_by_pattern(folder_path, file_names, "floorplan")
+        if floorplan_file:
+            sortplan_file = match_file_by_pattern(folder_path, file_names, "sortplan")
+            jobs.append((folder_path, floorplan_file, sortplan_file))
+    return sorted(jobs)
+
+
+
+
+
+def convert_job(folder_path, floorplan_file, sortplan_file, cache_dir=DEFAULT_CACHE_DIR, cache_bytes=DEFAULT_MAX_BYTES,
+                metrics=False, tile_size=None, options=None, dxf=False, svgz=False, incremental=False, store_dir=None,
+                geometry=False):
+    """
+    Render one floorplan/sortplan pair to output.svg in its folder. Runs inside a worker process,
+    so every failure is caught and reported in the result instead of being raised.
+
+    Args:
+        cache_dir (str): Build cache directory, or None to always render.
+        cache_bytes (int): Size bound of the build cache.
+        metrics (bool): Record phase timings and counters into result["metrics"].
+        tile_size (float): Also write tiles of this size (in Meters) and their index to <folder>/tiles.
+        options (dict): Render options on top of RENDER_OPTIONS, e.g. edges=True. With a crop box only the cells
+                        inside are rendered, to output_crop.svg.
+        dxf (bool): Also write the drawing next to the SVG as a DXF file (see convert_to_dxf).
+        svgz (bool): Write a gzip compressed output.svgz instead of output.svg.
+        incremental (bool): Render zone by zone through SVG_Fragments, reusing the cached fragments of unchanged
+                            zones, and write the cell change report to <output>.changes.json. Needs the cache.
+        store_dir (str): Artifact store to put the inputs and every output into, see store_artifacts.
+        geometry (bool): Also write the geometry next to the SVG as a binary .geom file (see convert_to_geometry).
+
+    Returns:
+        dict: folder, status ("ok", "cached" or "failed"), reason, seconds, size (bytes of the output) and error.
+              A fresh render also has raw_size (bytes of the SVG text before compression) and save_seconds,
+              an incremental one changes (summary of the change report) and changes_file. With a store,
+              manifest holds the folder's artifact manifest.
+    """
+    options = dict(RENDER_OPTIONS, **(options or {}))
+    svg_file_path = output_path(folder_path, options, svgz)
+    start = time.perf_counter()
+    result = {"folder": folder_path, "status": "ok", "reason": "cache disabled", "seconds": 0.0, "size": 0, "error": ""}
+    recorder = Metrics_Recorder() if metrics else None
+    observers = [recorder] if recorder else []
+    try:
+        cache = Build_Cache(cache_dir, cache_bytes) if cache_dir else None
+        if incremental and cache is None:
+            raise ValueError("incremental rendering keeps its fragments in the build cache, which is disabled")
+        if cache is not None:
+            settings = SVG_Floorplan.render_settings(**options)
+            if svgz: #Compressed and plain outputs are stored as different objects
+                settings["svgz"] = True
+            if incremental: #The zone grouped output is not interchangeable with a monolithic one
+                settings["incremental"] = True
+            decision = cache.check(svg_file_path, floorplan_file, sortplan_file, settings)
+            result["reason"] = decision["reason"]
+            if decision["up_to_date"]:
+                result["status"] = "cached"
+            elif cache.restore(decision, svg_file_path):
+                result["status"] = "cached"
+                result["reason"] = f"{decision['reason']}, restored from cache"
+                cache.record(decision, svg_file_path, reason=result["reason"])
+            if recorder:
+                recorder.phase("cache", time.perf_counter() - start)
+                recorder.count("cache_hits" if result["status"] == "cached" else "cache_misses", 1)
+
+        converter = None
+        if result["status"] != "cached" and incremental:
+            from SVG_Fragments import SVG_Fragments, summarize_changes
+            converter = SVG_Floorplan(floorplan_file=floorplan_file, svg_file=svg_file_path, sortplan_file=sortplan_file,
+                                      observers=observers, **options)
+            fragments = SVG_Fragments(converter, cache)
+            changes = fragments.save()
+            result["raw_size"] = fragments.bytes_uncompressed
+            result["save_seconds"] = fragments.seconds
+            result["changes"] = summarize_changes(changes)
+            result["changes_file"] = os.path.splitext(svg_file_path)[0] + ".changes.json"
+            with open(result["changes_file"], "w", encoding="utf-8") as changes_file:
+                json.dump(changes, changes_file, indent=2)
+            if recorder:
+                recorder.count("fragments_rendered", len(changes["rendered"]))
+                recorder.count("fragments_reused", len(changes["reused"]))
+            cache.record(decision, svg_file_path, seconds=time.perf_counter() - start)
+        elif result["status"] != "cached":
+            converter = SVG_Floorplan(floorplan_file=floorplan_file, svg_file=svg_file_path, sortplan_file=sortplan_file,
+                                      observers=observers, **options).save()
+            result["raw_size"] = converter.bytes_uncompressed
+            result["save_seconds"] = converter.timings["save"]
+            if cache is not None:
+                cache.record(decision, svg_file_path, seconds=time.perf_counter() - start)
+        result["size"] = os.path.getsize(svg_file_path)
+
+        if (tile_size or dxf or geometry) and converter is None: #Tiles, DXF and geometry are not cached, so a cached output still needs the plan loaded
+            converter = SVG_Floorplan(floorplan_file=floorplan_file, svg_file=svg_file_path,
+                                      sortplan_file=sortplan_file, observers=observers, **options)
+        if tile_size:
+            from SVG_Tiles import SVG_Tiles
+            tile_start = time.perf_counter()
+            index = SVG_Tiles(converter, tile_size).write(os.path.join(folder_path, "tiles"))
+            result["tiles"] = sum(len(level["tiles"]) for level in index["levels"])
+            if recorder:
+                recorder.phase("tiles", time.perf_counter() - tile_start)
+                recorder.count("tiles", result["tiles"])
+        if dxf:
+            dxf_start = time.perf_counter()
+            result["dxf"] = convert_to_dxf(converter)
+            if recorder:
+                recorder.phase("dxf", time.perf_counter() - dxf_start)
+        if geometry:
+            geometry_start = time.perf_counter()
+            result["geometry"] = convert_to_geometry(converter)
+            if recorder:
+                recorder.phase("geometry", time.perf_counter() - geometry_start)
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    if recorder:
+        result["metrics"] = recorder.to_dict()
+    if store_dir and result["status"] != "failed":
+        try:
+            result["manifest"] = store_artifacts(store_dir, folder_path, floorplan_file, sortplan_file, svg_file_path, result)
+        except Exception as e:
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+
+
+
+def store_artifacts(store_dir, folder_path, floorplan_file, sortplan_file, svg_file_path, result):
+    """
+    Put the inputs and outputs of one converted folder into the artifact store and write <folder>/artifacts.json.
+
+    The logical names are paths relative to the folder: the floorplan and sortplan, the SVG (or SVGZ), and
+    whichever of the change report, DXF file, geometry file, tiles and metrics (as metrics.json) the conversion produced.
+
+    Returns:
+        dict: The folder's manifest (see Artifact_Store.collect).
+    """
+    from Artifact_Store import Artifact_Store
+    files = {}
+    for path in (floorplan_file, sortplan_file, svg_file_path, result.get("changes_file"), result.get("dxf"),
+                 result.get("geometry")):
+        if path is not None:
+            files[os.path.relpath(path, folder_path).replace(os.sep, "/")] = path
+    if "tiles" in result:
+        for directory, _, file_names in os.walk(os.path.join(folder_path, "tiles")):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                files[os.path.relpath(path, folder_path).replace(os.sep, "/")] = path
+    data = {}
+    if "metrics" in result:
+        data["metrics.json"] = json.dumps(result["metrics"], indent=2).encode()
+    return Artifact_Store(store_dir).collect(folder_path, files, data)
+
+
+
+
+
+def publish_results(results, store_dir, remote_dir, root_path=None):
+    """
+    Publish the manifest of every converted folder to remote_dir and print what was transferred.
+
+    Args:
+        results (list): Result dicts of convert_job run with store_dir.
+        store_dir (str): Artifact store the blobs are read from.
+        remote_dir (str): Directory standing in for the remote storage (see Directory_Remote).
+        root_path (str): Batch root; folders are published under their path relative to it, or under
+                         their own name without one.
+
+    Returns:
+        list: One publish report per folder (see Artifact_Store.publish).
+    """
+    from Artifact_Store import Artifact_Store, Directory_Remote, publish
+    store = Artifact_Store(store_dir)
+    remote = Directory_Remote(remote_dir)
+    reports = []
+    for result in results:
+        if "manifest" not in result:
+            continue
+        if root_path is None:
+            name = os.path.basename(os.path.abspath(result["folder"]))
+        else:
+            name = os.path.relpath(os.path.abspath(result["folder"]), os.path.abspath(root_path)).replace(os.sep, "/")
+        reports.append(publish(store, result["manifest"], remote, name))
+    uploaded = sum(report["uploaded"] for report in reports)
+    uploaded_bytes = sum(report["uploaded_bytes"] for report in reports)
+    skipped_bytes = sum(report["skipped_bytes"] for report in reports)
+    changed = sum(report["manifest_changed"] for report in reports)
+    print(f"Published {len(reports)} folder(s) to {os.path.abspath(remote_dir)}: {uploaded} new blob(s), "
+          f"{uploaded_bytes / 1024:.1f} KB sent, {skipped_bytes / 1024:.1f} KB already there, "
+          f"{changed} manifest(s) updated")
+    return reports
+
+
+
+
+
+def convert_batch(root_path, workers=None, cache_dir=DEFAULT_CACHE_DIR, cache_bytes=DEFAULT_MAX_BYTES, metrics=False,
+                  tile_size=None, options=None, dxf=False, svgz=False, incremental=False, store_dir=None, geometry=False):
+    """
+    Convert every plan folder below root_path on a process pool and print a summary table.
+
+    Args:
+        root_path (str): Root of the tree to search for plan folders.
+        workers (int): Number of worker processes. None uses one per CPU, 1 converts in this process.
+        cache_dir (str): Build cache directory, or None to always render.
+        cache_bytes (int): Size bound of the build cache.
+        metrics (bool): Record metrics for every folder (see convert_job).
+        tile_size (float): Also write tiles of this size for every folder (see convert_job).
+        options (dict): Extra render options for every folder (see convert_job).
+        dxf (bool): Also write a DXF file for every folder (see convert_job).
+        svgz (bool): Write compressed output.svgz files (see convert_job).
+        incremental (bool): Reuse the cached fragments of unchanged zones (see convert_job).
+        store_dir (str): Put every folder's artifacts into this store (see convert_job).
+        geometry (bool): Also write a binary geometry file for every folder (see convert_job).
+
+    Returns:
+        list: One result dict per folder (see convert_job), in folder order.
+    """
+    jobs = [job + (cache_dir, cache_bytes, metrics, tile_size, options, dxf, svgz, incremental, store_dir, geometry)
+            for job in discover_plan_folders(root_path)]
+    print(f"Found {len(jobs)} plan folder(s) under {os.path.abspath(root_path)}")
+    start = time.perf_counter()
+    if workers == 1 or len(jobs) <= 1:
+        results = [convert_job(*job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(convert_job, *job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e: #The worker process itself died
+                    results.append({"folder": futures[future][0], "status": "failed", "reason": "", "seconds": 0.0,
+                                    "size": 0, "error": f"{type(e).__name__}: {e}"})
+        results.sort(key=lambda result: result["folder"])
+    print_summary(results, time.perf_counter() - start, root_path)
+    return results
+
+
+
+
+
+def print_summary(results, wall_seconds, root_path="."):
+    """
+    Print one row per converted folder with its status, render time and output size.
+    """
+    root_path = os.path.abspath(root_path)
+    names = [os.path.relpath(result["folder"], root_path) for result in results]
+    width = max([len("folder")] + [len(name) for name in names])
+    print(f"{'folder':<{width}}  {'status':<6}  {'time (s)':>8}  {'size (KB)':>9}  reason / error")
+    for name, result in zip(names, results):
+        print(f"{name:<{width}}  {result['status']:<6}  {result['seconds']:>8.3f}  "
+              f"{result['size'] / 1024:>9.1f}  {result['error'] or result['reason']}")
+    failed = sum(result["status"] == "failed" for result in results)
+    cached = sum(result["status"] == "cached" for result in results)
+    print(f"{len(results) - failed - cached} converted, {cached} cached, {failed} failed, wall time {wall_seconds:.3f}s")
+
+
+
+
+
+def metrics_report(results, wall_seconds):
+    """
+    Combine the metrics of converted folders into one document: per-folder metrics plus totals.
+
+    Args:
+        results (list): Result dicts of convert_job run with metrics=True.
+        wall_seconds (float): Wall time of the whole run.
+
+    Returns:
+        dict: wall_seconds, totals (phases, counters, events summed over folders) and folders.
+    """
+    totals = Metrics_Recorder()
+    folders = []
+    for result in results:
+        metrics = result.get("metrics", {})
+        totals.merge(metrics)
+        folders.append({key: result[key] for key in ("folder", "status", "reason", "seconds", "size", "error")})
+        folders[-1]["metrics"] = metrics
+    totals.count("folders", len(results))
+    return {"wall_seconds": wall_seconds, "totals": totals.to_dict(), "folders": folders}
+
+
+
+
+
+def convert_folder(folder_path, cache_dir=DEFAULT_CACHE_DIR, cache_bytes=DEFAULT_MAX_BYTES, metrics=False, tile_size=None,
+                   options=None, dxf=False, svgz=False, incremental=False, store_dir=None, geometry=False):
     """
     Wrapper function to process a given folder and run the SVG_Floorplan converter.
 
     Args:
         folder_path (str): Path to the folder containing floorplan and optionally sortplan files.
+        cache_dir (str): Build cache directory, or None to always render.
+        cache_bytes (int): Size bound of the build cache.
+        metrics (bool): Record metrics into the returned result (see convert_job).
+        tile_size (float): Also write tiles of this size (see convert_job).
+        options (dict): Extra render options, e.g. a crop box (see convert_job).
+        dxf (bool): Also write the drawing as a DXF file (see convert_job).
+        svgz (bool): Write a compressed output.svgz (see convert_job).
+        incremental (bool): Reuse the cached fragments of unchanged zones and report the changed cells (see convert_job).
+        store_dir (str): Put the folder's artifacts into this store (see convert_job).
+        geometry (bool): Also write the geometry as a binary file (see convert_job).
     """
 
     print(f"Current working directory: {os.getcwd()}")
@@ -61,44 +424,153 @@ def convert_folder(folder_path):
         print(f"Folder '{folder_path}' does not exist inside the container.")
         return
     # Look for any file with "floorplan" in its name and a .json extension
-    floorplan_file = find_file_by_pattern(folder_path, "floorplan")
-    sortplan_file = find_file_by_pattern(folder_path, "sortplan")  # Optional sortplan file
+    file_names = os.listdir(folder_path)
+    floorplan_file = match_file_by_pattern(folder_path, file_names, "floorplan")
+    sortplan_file = match_file_by_pattern(folder_path, file_names, "sortplan")  # Optional sortplan file
 
     if not floorplan_file:
         print(f"Floorplan file not found in {folder_path}. Skipping conversion.")
         return
 
-    # Define the output SVG file name and path
-    svg_file_path = os.path.join(folder_path,"output.svg")
-    output_svg = svgwrite.Drawing(svg_file_path)
-    output_svg.save()
+    # Render output.svg, unless the build cache already has it for these inputs
+    result = convert_job(folder_path, floorplan_file, sortplan_file, cache_dir, cache_bytes, metrics, tile_size, options, dxf,
+                         svgz, incremental, store_dir, geometry)
+    svg_file_path = output_path(folder_path, options, svgz)
+    if result["status"] == "failed":
+        print(f"An error occurred during conversion: {result['error']}")
+    elif result["status"] == "cached":
+        print(f"SVG at {svg_file_path} is up to date ({result['reason']}), {result['seconds'] * 1e3:.2f} ms")
+    else:
+        print(f"SVG created and saved at {svg_file_path} ({result['reason']}), {result['seconds']:.3f}s")
+        size = f"{result['size'] / 1024:.1f} KB"
+        if result["raw_size"] != result["size"]:
+            size += f" ({result['raw_size'] / 1024:.1f} KB uncompressed, {result['size'] / result['raw_size']:.1%})"
+        print(f"Output {size}, serialized in {result['save_seconds']:.3f}s")
+    if "changes" in result:
+        print(f"{result['changes']}, report written to {result['changes_file']}")
+    if "tiles" in result:
+        print(f"{result['tiles']} tiles and their index written to {os.path.join(folder_path, 'tiles')}")
+    if "dxf" in result:
+        print(f"DXF written to {result['dxf']}")
+    if "geometry" in result:
+        print(f"Geometry written to {result['geometry']}")
+    if "manifest" in result:
+        print(f"{len(result['manifest']['artifacts'])} artifact(s) stored in {os.path.abspath(store_dir)}")
+    return result
 
-    # Create an instance of your existing SVG_Floorplan converter
-    # This should trigger the conversion during initialization itself.
-    try:
-        converter = SVG_Floorplan(floorplan_file=floorplan_file, output_file=os.path.join(folder_path,"output.svg"), sortplan_file=sortplan_file)
-        print(f"SVG created and saved at {output_svg}")
-    except Exception as e:
-        print(f"An error occurred during conversion: {e}")
 
-    # Convert the created SVG file to DXF using Inkscape
-    #convert_svg_to_dxf(svg_file_path)
 
 
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert JSON floorplans to SVG.")
+    parser.add_argument("folder_path", nargs="?", help="Folder with a floorplan (and optional sortplan), or the root of a tree with --batch")
+    parser.add_argument("--batch", action="store_true", help="Convert every plan folder below folder_path")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --batch, conversions at once for --watch (default: one per CPU)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep watching the plan folders below folder_path and convert each one again after its inputs change")
+    parser.add_argument("--debounce", type=float, default=0.3,
+                        help="Seconds a folder's inputs must stay unchanged before --watch converts it")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Build cache directory")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Build cache size bound in MB")
+    parser.add_argument("--no-cache", action="store_true", help="Always render, without reading or writing the build cache")
+    parser.add_argument("--invalidate-cache", action="store_true", help="Clear the build cache before converting")
+    parser.add_argument("--serve", action="store_true", help="Run the conversion server on a local HTTP port")
+    parser.add_argument("--stdio", action="store_true", help="Run the conversion server on stdin/stdout JSON lines")
+    parser.add_argument("--host", default="127.0.0.1", help="Host for --serve")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --serve")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="Renders running at once in server mode")
+    parser.add_argument("--tiles", type=float, nargs="?", const=50, default=None, metavar="SIZE_M",
+                        help="Also write tiled and level-of-detail SVGs with an index to <folder>/tiles (tile side in Meters, default 50)")
+    parser.add_argument("--crop", type=float, nargs=4, metavar=("MIN_X", "MIN_Y", "MAX_X", "MAX_Y"),
+                        help="Only render cells whose pose lies in this box (Meters), to output_crop.svg")
+    parser.add_argument("--edges", action="store_true", help="Draw the connections between cells, control points as curves")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Render without validating the plan first; links to missing cells are then left out instead of failing")
+    parser.add_argument("--minify", action="store_true",
+                        help="Write the SVG without indentation or line breaks, numbers rounded to --precision decimals")
+    parser.add_argument("--precision", type=int, default=None, help="Decimal places of coordinates (default 2)")
+    parser.add_argument("--svgz", action="store_true", help="Write a gzip compressed output.svgz, compressed while it is written")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Render zone by zone, reusing the cached fragments of unchanged zones, and report changed cells")
+    parser.add_argument("--render-workers", type=int, default=None, metavar="N",
+                        help="Render the zones of each plan on N processes (elements and paths modes), same output as serial")
+    parser.add_argument("--dxf", action="store_true", help="Also write the drawing as a DXF file (layers nodes, bins, arrows) next to the SVG")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_DIR, default=None, metavar="STORE_DIR",
+                        help="Put inputs and outputs into a content-addressed artifact store and write <folder>/artifacts.json")
+    parser.add_argument("--publish", metavar="REMOTE_DIR",
+                        help="After converting, send the new artifacts and manifests to this directory (implies --store)")
+    parser.add_argument("--geometry", action="store_true",
+                        help="Also write node, bin and arrow geometry with their ids as a memory-mappable output.geom next to the SVG")
+    parser.add_argument("--metrics", metavar="OUT_JSON", help="Write phase timings, counters and peak memory to this JSON file")
+    args = parser.parse_args()
 
+    if args.serve or args.stdio:
+        from Conversion_Server import Conversion_Server
+        server = Conversion_Server(max_concurrency=args.max_concurrency)
+        if args.stdio:
+            server.serve_stdio()
+        else:
+            server.serve_http(args.host, args.port)
+        sys.exit(0)
 
-if __name__ == "__main__":
-    # The first argument should be the folder path
-    if len(sys.argv) < 2:
-        print("Usage: python converter_wrapper.py <folder_path>")
-        sys.exit(1)
+    if args.folder_path is None:
+        parser.error("folder_path is required unless --serve or --stdio is given")
+    if args.crop and (args.batch or args.watch):
+        parser.error("--crop applies to a single folder, not to --batch or --watch")
+    if args.publish and args.watch:
+        parser.error("--publish runs once after converting and cannot be combined with --watch")
+    if args.incremental and args.no_cache:
+        parser.error("--incremental keeps its zone fragments in the build cache and cannot be combined with --no-cache")
+    cache_dir = None if args.no_cache else args.cache_dir
+    cache_bytes = args.cache_size * 1024 * 1024
+    store_dir = args.store or (DEFAULT_STORE_DIR if args.publish else None)
+    if args.invalidate_cache:
+        Build_Cache(args.cache_dir).invalidate()
 
-    folder_path = sys.argv[1]
+    folder_path = args.folder_path
     if not os.path.exists(folder_path):
         print(f"Specified folder path {folder_path} does not exist.")
         sys.exit(1)
 
-    # Call the convert_folder function with the provided folder path
-    convert_folder(folder_path)
\ No newline at end of file
+    metrics = args.metrics is not None
+    options = {}
+    if args.crop:
+        options["crop"] = args.crop
+    if args.edges:
+        options["edges"] = True
+    if args.no_validate:
+        options["validate"] = False
+    if args.minify:
+        options["minify"] = True
+    if args.precision is not None:
+        options["precision"] = args.precision
+    if args.render_workers:
+        options["workers"] = args.render_workers
+    if args.watch:
+        from Folder_Watcher import Folder_Watcher
+        job_args = (cache_dir, cache_bytes, False, args.tiles, options, args.dxf, args.svgz, args.incremental, store_dir,
+                    args.geometry)
+        Folder_Watcher(folder_path, job_args, max_concurrency=args.workers or os.cpu_count(),
+                       debounce=args.debounce).run()
+        sys.exit(0)
+    start = time.perf_counter()
+    if args.batch:
+        results = convert_batch(folder_path, workers=args.workers, cache_dir=cache_dir, cache_bytes=cache_bytes, metrics=metrics,
+                                tile_size=args.tiles, options=options, dxf=args.dxf, svgz=args.svgz,
+                                incremental=args.incremental, store_dir=store_dir, geometry=args.geometry)
+    else:
+        # Call the convert_folder function with the provided folder path
+        result = convert_folder(folder_path, cache_dir=cache_dir, cache_bytes=cache_bytes, metrics=metrics, tile_size=args.tiles,
+                                options=options, dxf=args.dxf, svgz=args.svgz,
+                                incremental=args.incremental, store_dir=store_dir, geometry=args.geometry)
+        results = [result] if result else []
+    if metrics:
+        write_metrics(args.metrics, metrics_report(results, time.perf_counter() - start))
+        print(f"Metrics written to {args.metrics}")
+    if args.publish:
+        publish_results(results, store_dir, args.publish, folder_path if args.batch else None)
+    if args.batch:
+        sys.exit(1 if any(result["status"] == "failed" for result in results) else 0)
\ No newline at end of file
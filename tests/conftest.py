@@ -0,0 +1,17 @@
+"""
+@Filename : conftest.py
+@Brief : Puts the repository root on sys.path, so the tests import the flat modules the way main.py does
+@Author : Soumitra Pandit
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+#Sample plans shipped with the repository: (floorplan, sortplan) per name
+SAMPLE_PLANS = {
+    "48": (os.path.join(ROOT, "test_folder_2", "floorplan_48.json"), os.path.join(ROOT, "test_folder_2", "sortplan_48.json")),
+    "Indy": (os.path.join(ROOT, "test_folder_3", "floorplan_Indy.json"), os.path.join(ROOT, "test_folder_3", "sortplan_Indy.json")),
+}
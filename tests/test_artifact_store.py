@@ -0,0 +1,64 @@
+"""
+@Filename : test_artifact_store.py
+@Brief : Artifact manifests and publishing only the blobs the remote does not have
+@Author : Soumitra Pandit
+"""
+
+import os
+import shutil
+from conftest import SAMPLE_PLANS
+from Artifact_Store import Artifact_Store, Directory_Remote, publish, blob_name
+
+
+def make_folder(tmp_path):
+    folder = tmp_path / "48"
+    folder.mkdir()
+    for path in SAMPLE_PLANS["48"]:
+        shutil.copy(path, folder)
+    (folder / "output.svg").write_text("<svg/>")
+    return folder
+
+
+def collect(store, folder):
+    files = {name: str(folder / name) for name in ("floorplan_48.json", "sortplan_48.json", "output.svg")}
+    return store.collect(str(folder), files, {"metrics.json": b"{}"})
+
+
+def test_manifest_round_trip(tmp_path):
+    folder = make_folder(tmp_path)
+    store = Artifact_Store(str(tmp_path / "store"))
+    manifest = collect(store, folder)
+    assert Artifact_Store.read_manifest(str(folder)) == manifest
+    assert sorted(manifest["artifacts"]) == ["floorplan_48.json", "metrics.json", "output.svg", "sortplan_48.json"]
+    for name, entry in manifest["artifacts"].items():
+        with open(store.blob_path(entry["sha256"]), "rb") as f:
+            data = f.read()
+        assert len(data) == entry["size"]
+        if name != "metrics.json":
+            with open(folder / name, "rb") as f:
+                assert f.read() == data
+    assert collect(store, folder) == manifest #Unchanged files give the same manifest
+
+
+def test_publish_sends_only_new_blobs(tmp_path):
+    folder = make_folder(tmp_path)
+    store = Artifact_Store(str(tmp_path / "store"))
+    remote = Directory_Remote(str(tmp_path / "remote"))
+
+    first = publish(store, collect(store, folder), remote, "48")
+    assert first["uploaded"] == 4 and first["skipped"] == 0 and first["manifest_changed"]
+    second = publish(store, collect(store, folder), remote, "48")
+    assert second["uploaded"] == 0 and second["uploaded_bytes"] == 0 and not second["manifest_changed"]
+
+    (folder / "output.svg").write_text("<svg><rect/></svg>")
+    manifest = collect(store, folder)
+    third = publish(store, manifest, remote, "48")
+    assert third["uploaded"] == 1 and third["uploaded_bytes"] == manifest["artifacts"]["output.svg"]["size"]
+    published = remote.read_manifest("48")
+    assert {name: entry["sha256"] for name, entry in published["artifacts"].items()} == \
+        {name: entry["sha256"] for name, entry in manifest["artifacts"].items()}
+
+    #A blob lost on the remote is sent again, although the published manifest names it
+    os.remove(os.path.join(remote.root_path, blob_name(manifest["artifacts"]["floorplan_48.json"]["sha256"])))
+    repaired = publish(store, manifest, remote, "48")
+    assert repaired["uploaded"] == 1 and not repaired["manifest_changed"]
@@ -0,0 +1,83 @@
+"""
+@Filename : test_bins.py
+@Brief : The batched bin placement draws every bin exactly where the per-bin formula of the original renderer did
+@Author : Soumitra Pandit
+"""
+
+import math
+import numpy as np
+import pytest
+import Floorplan as floorplan_module
+from conftest import SAMPLE_PLANS
+from Geometry import rect_corners
+from SVG_Floorplan import SVG_Floorplan
+
+
+def baseline_bin(converter, bin_coord, bin_type, bin_side):
+    #The rect the renderer drew before bins were placed in one pass, one bin at a time
+    if bin_type == "input":
+        bin_width = 1 * converter.scale
+        bin_height = 1 * converter.scale
+    else:
+        bin_width = converter.bin_width
+        bin_height = converter.bin_height
+    if bin_side == -1:
+        bin_y = bin_coord[1] + bin_height/2 + converter.node_height/2
+    else:
+        bin_y = bin_coord[1] - (bin_height/2 + converter.node_height/2)
+    theta = math.degrees(bin_coord[2])
+    return {"x": bin_coord[0] - bin_width/2, "y": bin_y - bin_height/2, "width": bin_width - converter.bin_offset,
+            "height": bin_height, "transform": f"rotate({theta},{bin_coord[0]},{bin_coord[1]})"}
+
+
+def drawn_bins(converter):
+    rects = [attribs for tag, attribs in converter.iter_elements() if tag == "rect"]
+    return rects[len(converter.node_coords):]
+
+
+@pytest.fixture(params=[(plan, vectorized) for plan in sorted(SAMPLE_PLANS) for vectorized in (False, True)],
+                ids=lambda param: f"{param[0]}-{'numpy' if param[1] else 'lists'}")
+def converter(request, monkeypatch):
+    plan, vectorized = request.param
+    monkeypatch.setattr(floorplan_module, "use_numpy", lambda num_cells: vectorized)
+    floorplan_file, sortplan_file = SAMPLE_PLANS[plan]
+    return SVG_Floorplan(None, floorplan_file, sortplan_file, backend="stream")
+
+
+def test_bins_match_baseline(converter):
+    drawn = drawn_bins(converter)
+    assert len(drawn) == len(converter.bin_coords) > 0
+    for attribs, bin_coord, bin_type, bin_side in zip(drawn, converter.bin_coords, converter.bin_types, converter.bin_sides):
+        expected = baseline_bin(converter, bin_coord, bin_type, bin_side)
+        #Same values and the same types, so the written numbers are byte for byte the same
+        assert {key: (value, type(value)) for key, value in expected.items()} == \
+               {key: (attribs[key], type(attribs[key])) for key in expected}
+
+
+def test_geometry_uses_the_same_placement(converter):
+    drawn = drawn_bins(converter)
+    bin_coords = np.asarray(converter.bin_coords, dtype=np.float64).reshape(-1, 3)
+    expected = rect_corners(np.array([[attribs["x"], attribs["y"]] for attribs in drawn], dtype=np.float64),
+                            np.array([attribs["width"] for attribs in drawn], dtype=np.float64),
+                            np.array([attribs["height"] for attribs in drawn], dtype=np.float64),
+                            bin_coords[:, :2], bin_coords[:, 2])
+    assert np.array_equal(converter.compute_geometry()["bins"], expected)
+
+
+def test_views_keep_the_placement(converter):
+    bin_rows = list(range(0, len(converter.bin_coords), 3))
+    view = converter.select(range(len(converter.node_coords)), bin_rows)
+    drawn = drawn_bins(converter)
+    assert drawn_bins(view) == [drawn[row] for row in bin_rows]
+
+
+def test_invalid_side(monkeypatch):
+    import Sortplan_Join
+    init = Sortplan_Join.Sortplan_Join.__init__
+
+    def with_bad_side(self, *args):
+        init(self, *args)
+        self.sides[0] = 0
+    monkeypatch.setattr(Sortplan_Join.Sortplan_Join, "__init__", with_bad_side)
+    with pytest.raises(TypeError, match="Invalid Side"):
+        SVG_Floorplan(None, *SAMPLE_PLANS["48"], backend="stream")
@@ -0,0 +1,40 @@
+"""
+@Filename : test_cache.py
+@Brief : Build cache keys and the exit status of cached batch runs
+@Author : Soumitra Pandit
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+from conftest import ROOT, SAMPLE_PLANS
+
+
+def run_batch(root_path, cache_dir):
+    return subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), str(root_path), "--batch", "--workers", "1",
+                           "--cache-dir", str(cache_dir)], capture_output=True, text=True)
+
+
+def test_unchanged_batch_exits_zero(tmp_path):
+    folder = tmp_path / "plans" / "48"
+    folder.mkdir(parents=True)
+    for path in SAMPLE_PLANS["48"]:
+        shutil.copy(path, folder)
+    first = run_batch(tmp_path / "plans", tmp_path / "cache")
+    second = run_batch(tmp_path / "plans", tmp_path / "cache")
+    assert first.returncode == 0, first.stdout + first.stderr
+    assert "1 cached" in second.stdout
+    assert second.returncode == 0, second.stdout + second.stderr
+
+
+def test_cache_key_covers_backend_and_shards(tmp_path):
+    from Build_Cache import Build_Cache, RENDERER_MODULES
+    from SVG_Floorplan import SVG_Floorplan
+    assert "SVG_Shards" in RENDERER_MODULES
+    floorplan_file, sortplan_file = SAMPLE_PLANS["48"]
+    cache = Build_Cache(str(tmp_path / "cache"))
+    output = str(tmp_path / "output.svg")
+    keys = {cache.check(output, floorplan_file, sortplan_file, SVG_Floorplan.render_settings(backend=backend, minify=True))["key"]
+            for backend in ("svgwrite", "stream")}
+    assert len(keys) == 2
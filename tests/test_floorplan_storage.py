@@ -0,0 +1,65 @@
+"""
+@Filename : test_floorplan_storage.py
+@Brief : The numpy and list backed Floorplan stores give the same geometry and the same drawing
+@Author : Soumitra Pandit
+"""
+
+import io
+import pytest
+import Floorplan as floorplan_module
+from conftest import SAMPLE_PLANS
+from Floorplan import Floorplan
+from JSON_Loader import load_file
+from SVG_Floorplan import SVG_Floorplan, SCALE
+
+
+def as_lists(values):
+    return values.tolist() if hasattr(values, "tolist") else [list(value) if isinstance(value, tuple) else value for value in values]
+
+
+@pytest.mark.parametrize("plan", sorted(SAMPLE_PLANS))
+def test_stores_match(plan):
+    data = load_file(SAMPLE_PLANS[plan][0])
+    lists = Floorplan.from_dict(data, vectorized=False)
+    arrays = Floorplan.from_dict(data, vectorized=True)
+    assert not lists.vectorized and arrays.vectorized
+    assert lists.cell_ids == arrays.cell_ids
+    assert lists.getCellTypes() == as_lists(arrays.getCellTypes())
+    assert as_lists(lists.poses) == as_lists(arrays.poses)
+    assert as_lists(lists.cell_zones) == as_lists(arrays.cell_zones)
+    assert lists.getBounds() == pytest.approx(arrays.getBounds(), abs=1e-9)
+    rotation = lists.zones["output_gate_1"].zone_pose[2]
+    for pose, other in zip(as_lists(lists.transform_poses(SCALE, rotation)), as_lists(arrays.transform_poses(SCALE, rotation))):
+        assert pose == pytest.approx(other, abs=1e-9)
+
+
+@pytest.mark.parametrize("plan", sorted(SAMPLE_PLANS))
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_cells_are_views(plan, vectorized):
+    data = load_file(SAMPLE_PLANS[plan][0])
+    floorplan = Floorplan.from_dict(data, vectorized=vectorized)
+    nodes = [(zone["id"], node) for zone in data["zones"] for node in zone["nodes"]]
+    assert len(floorplan.getCells()) == len(nodes)
+    for row, (zone_id, node) in enumerate(nodes):
+        absolute_id = f"/{zone_id}/{node['id']}"
+        cell = floorplan.getCellFromId(absolute_id)
+        assert floorplan.getCellIndex(absolute_id) == row
+        assert (cell.getId(), cell.getType(), cell.getZoneId()) == (absolute_id, node["type"], zone_id)
+        assert list(cell.getPose()) == list(floorplan.getPoses()[row])
+    if vectorized: #A view into the store, not a copy
+        cell.getPose()[0] += 1.0
+        assert floorplan.getPoses()[row][0] == cell.getPose()[0]
+
+
+@pytest.mark.parametrize("plan", sorted(SAMPLE_PLANS))
+@pytest.mark.parametrize("edges", [False, True])
+def test_drawings_match(monkeypatch, plan, edges):
+    floorplan_file, sortplan_file = SAMPLE_PLANS[plan]
+    outputs = []
+    for vectorized in (False, True): #The elements mode lets the cell count pick the store
+        monkeypatch.setattr(floorplan_module, "use_numpy", lambda num_cells: vectorized)
+        buffer = io.StringIO()
+        converter = SVG_Floorplan(None, floorplan_file, sortplan_file, backend="stream", edges=edges).write(buffer)
+        assert converter.floorplan.vectorized is vectorized
+        outputs.append(buffer.getvalue())
+    assert outputs[0] == outputs[1]
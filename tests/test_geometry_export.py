@@ -0,0 +1,52 @@
+"""
+@Filename : test_geometry_export.py
+@Brief : Binary geometry export round trip through the memory-mapped reader
+@Author : Soumitra Pandit
+"""
+
+import numpy as np
+import pytest
+from conftest import SAMPLE_PLANS
+from SVG_Floorplan import SVG_Floorplan
+from Geometry_Export import Geometry_Export, Geometry_Reader
+
+
+@pytest.mark.parametrize("edges", [False, True])
+@pytest.mark.parametrize("crop", [None, (0, 0, 20, 20)])
+def test_round_trip(tmp_path, edges, crop):
+    floorplan_file, sortplan_file = SAMPLE_PLANS["48"]
+    converter = SVG_Floorplan(None, floorplan_file, sortplan_file, backend="stream", edges=edges, crop=crop)
+    path = str(tmp_path / "output.geom")
+    Geometry_Export(converter).save(path).verify(path)
+
+    with Geometry_Reader(path) as reader:
+        assert np.array_equal(reader.array("node_poses"), np.asarray(converter.node_coords, dtype=float).reshape(-1, 3))
+        assert np.array_equal(reader.array("bin_poses"), np.asarray(converter.bin_coords, dtype=float).reshape(-1, 3))
+        assert np.array_equal(reader.array("bin_poses"), reader.array("node_poses")[reader.array("bin_nodes")])
+        assert np.array_equal(reader.array("arrows"), converter.compute_geometry()["arrows"].reshape(-1, 4))
+        assert reader.node_ids() == list(converter.node_ids)
+        assert reader.node_types() == list(converter.node_types)
+        assert reader.bin_ids() == list(converter.bin_ids)
+        assert reader.bin_types() == list(converter.bin_types)
+        assert reader.string("id", 0) == converter.node_ids[0]
+        assert not reader.array("node_poses").flags.writeable
+
+        edge_geometry = converter.compute_edge_geometry() if edges else None
+        edge_ends = reader.array("edge_ends")
+        if edge_geometry is None: #Edges off: empty sections, still mapped
+            assert edge_ends.shape == (0, 4)
+            assert reader.array("edge_offsets").tolist() == [0]
+            assert reader.array("edge_points").shape == (0, 2)
+        else:
+            assert len(edge_ends) > 0
+            assert np.array_equal(edge_ends, np.hstack([edge_geometry["starts"], edge_geometry["ends"]]))
+            assert np.array_equal(reader.array("edge_offsets"), edge_geometry["point_offsets"])
+            assert np.array_equal(reader.array("edge_points"), edge_geometry["points"])
+        del edge_ends
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "output.geom"
+    path.write_bytes(b"not a geometry export at all")
+    with pytest.raises(ValueError):
+        Geometry_Reader(str(path))
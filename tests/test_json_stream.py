@@ -0,0 +1,57 @@
+"""
+@Filename : test_json_stream.py
+@Brief : JSON_Stream against json.loads for every chunk boundary
+@Author : Soumitra Pandit
+"""
+
+import io
+import json
+import pytest
+from conftest import SAMPLE_PLANS
+from JSON_Stream import JSON_Stream, iter_zone_events
+
+#Numbers that a chunk boundary can cut after a valid prefix (".", "e", "e-", "E+")
+NUMBERS_DOCUMENT = ('{"a": [1.5, -2e-3, 10, 1E+22, -0.25, 3.0e10, 7, true, null, "x.5e"], '
+                    '"pose": [12.125, -4.5e-7, 0.0], "n": -123456789.5e+3, "s": {"k": 1e5}}')
+
+
+def walk(stream):
+    #Rebuild the next value by walking containers and decoding every scalar with value()
+    char = stream.peek()
+    if char == "{":
+        result = {}
+        for key in stream.iter_object():
+            result[key] = walk(stream)
+        return result
+    if char == "[":
+        return [walk(stream) for _ in stream.iter_array()]
+    return stream.value()
+
+
+def test_chunk_size_sweep():
+    expected = json.loads(NUMBERS_DOCUMENT)
+    for chunk_chars in range(1, len(NUMBERS_DOCUMENT) + 2):
+        assert walk(JSON_Stream(io.StringIO(NUMBERS_DOCUMENT), chunk_chars)) == expected, chunk_chars
+        assert JSON_Stream(io.StringIO(NUMBERS_DOCUMENT), chunk_chars).value() == expected, chunk_chars
+
+
+def test_bare_numbers():
+    for text in ("1.5", "-2e-3", "1E+22", "12", "-0.0"):
+        for chunk_chars in range(1, len(text) + 1):
+            assert JSON_Stream(io.StringIO(text), chunk_chars).value() == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_chars", [1000, 4093, 10007])
+def test_walk_sample_plan(chunk_chars):
+    floorplan_file, _ = SAMPLE_PLANS["Indy"]
+    with open(floorplan_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert walk(JSON_Stream(io.StringIO(text), chunk_chars)) == json.loads(text)
+
+
+def test_zone_events_match_the_document():
+    floorplan_file, _ = SAMPLE_PLANS["48"]
+    with open(floorplan_file, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    nodes = [node for kind, node in iter_zone_events(floorplan_file) if kind == "node"]
+    assert nodes == [node for zone in document["zones"] for node in zone["nodes"]]
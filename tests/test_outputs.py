@@ -0,0 +1,61 @@
+"""
+@Filename : test_outputs.py
+@Brief : Outputs are replaced only once completely written, also when the watcher stops a render halfway
+@Author : Soumitra Pandit
+"""
+
+import gzip
+import multiprocessing
+import os
+import time
+import pytest
+import Folder_Watcher
+from SVG_Floorplan import open_output
+
+
+def test_complete_output_replaces_the_old_one(tmp_path):
+    path = str(tmp_path / "output.svgz")
+    with open_output(path) as fileobj:
+        fileobj.write("<svg/>")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert f.read() == "<svg/>"
+    assert os.listdir(tmp_path) == ["output.svgz"]
+
+
+@pytest.mark.parametrize("name", ["output.svg", "output.svgz"])
+def test_failed_render_keeps_the_old_output(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"previous")
+    with pytest.raises(RuntimeError):
+        with open_output(str(path)) as fileobj:
+            fileobj.write("<svg>" * 100000)
+            raise RuntimeError("render failed")
+    assert path.read_bytes() == b"previous"
+    assert os.listdir(tmp_path) == [name]
+
+
+def slow_convert(folder_path, *args):
+    #Writes half a document, then waits to be cancelled
+    with open_output(os.path.join(folder_path, "output.svg")) as fileobj:
+        fileobj.write("<svg>" * 100000)
+        fileobj.flush()
+        open(os.path.join(folder_path, "started"), "w").close()
+        time.sleep(60)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_cancelled_render_keeps_the_old_output(tmp_path, monkeypatch):
+    output = tmp_path / "output.svg"
+    output.write_bytes(b"previous")
+    monkeypatch.setattr(Folder_Watcher, "convert_job", slow_convert)
+    reader, writer = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context("fork").Process(target=Folder_Watcher._run_job,
+                                                          args=((str(tmp_path),), writer), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while not (tmp_path / "started").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    process.terminate() #What the watcher does when the inputs change while rendering
+    process.join(10)
+    assert output.read_bytes() == b"previous"
+    assert sorted(os.listdir(tmp_path)) == ["output.svg", "started"]
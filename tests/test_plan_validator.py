@@ -0,0 +1,89 @@
+"""
+@Filename : test_plan_validator.py
+@Brief : Streamed plans are validated like parsed ones, with the same problems and paths, and --no-validate skips validation
+@Author : Soumitra Pandit
+"""
+
+import io
+import json
+import pytest
+from conftest import SAMPLE_PLANS
+from JSON_Loader import load_file
+from Plan_Validator import Plan_Validator, Plan_Validation_Error
+from SVG_Floorplan import SVG_Floorplan
+
+
+def broken_plan():
+    floorplan = load_file(SAMPLE_PLANS["48"][0])
+    sortplan = load_file(SAMPLE_PLANS["48"][1])
+    nodes = floorplan["zones"][0]["nodes"]
+    nodes[1]["connections"][0]["connects_to"] = "zz" #Dangling link
+    nodes[3]["pose"] = [1, 2] #Bad pose: the node is dropped, links to it do not count as dangling
+    nodes[4]["connections"].append({"connects_to": 7})
+    nodes[5]["connections"][0]["control_points"] = [[1, 2, 3]]
+    del nodes[6]["type"]
+    sortplan["/output_gate_1/nowhere"] = {"type": "input"}
+    key = next(key for key, entry in sortplan.items() if entry["type"] == "output")
+    next(iter(sortplan[key]["sub_directions"].values()))["side"] = 2
+    return floorplan, sortplan
+
+
+def write_plan(tmp_path, floorplan, sortplan):
+    floorplan_file, sortplan_file = tmp_path / "floorplan.json", tmp_path / "sortplan.json"
+    floorplan_file.write_text(json.dumps(floorplan))
+    sortplan_file.write_text(json.dumps(sortplan))
+    return str(floorplan_file), str(sortplan_file)
+
+
+def test_problems_are_collected():
+    floorplan, sortplan = broken_plan()
+    problems = Plan_Validator(floorplan, sortplan).validate()
+    assert "zones[0].nodes[1].connections[0].connects_to: no cell /output_gate_1/zz" in problems
+    assert any(problem.startswith("zones[0].nodes[3].pose: expected a pose") for problem in problems)
+    assert "zones[0].nodes[6]: missing 'type'" in problems
+    assert "sortplan['/output_gate_1/nowhere']: no cell /output_gate_1/nowhere in the floorplan" in problems
+    assert len(problems) == 7
+
+
+@pytest.mark.parametrize("streamed", ["both", "floorplan", "sortplan"])
+def test_streamed_plans_report_the_same_problems(tmp_path, monkeypatch, streamed):
+    floorplan, sortplan = broken_plan()
+    expected = Plan_Validator(floorplan, sortplan).validate()
+    floorplan_file, sortplan_file = write_plan(tmp_path, floorplan, sortplan)
+    monkeypatch.setattr(SVG_Floorplan, "_SVG_Floorplan__stream_file",
+                        lambda self, path: streamed in ("both", "floorplan" if path == floorplan_file else "sortplan"))
+    with pytest.raises(Plan_Validation_Error) as error:
+        SVG_Floorplan(None, floorplan_file, sortplan_file, backend="stream", validate=True)
+    assert sorted(error.value.problems) == sorted(expected)
+
+
+def test_streamed_floorplan_without_sortplan(tmp_path):
+    floorplan, sortplan = broken_plan()
+    floorplan_file, _ = write_plan(tmp_path, floorplan, sortplan)
+    with pytest.raises(Plan_Validation_Error) as error:
+        SVG_Floorplan(None, floorplan_file, backend="stream", validate=True, streaming=True)
+    assert sorted(error.value.problems) == sorted(Plan_Validator(floorplan).validate())
+
+
+@pytest.mark.parametrize("plan", sorted(SAMPLE_PLANS))
+def test_valid_streamed_plans_render_unchanged(plan):
+    outputs = []
+    for streaming in (False, True):
+        buffer = io.StringIO()
+        SVG_Floorplan(None, *SAMPLE_PLANS[plan], backend="stream", validate=True, streaming=streaming).write(buffer)
+        outputs.append(buffer.getvalue())
+    assert outputs[0] == outputs[1]
+
+
+def test_no_validate_renders_dangling_links(tmp_path):
+    from main import convert_job
+    floorplan = load_file(SAMPLE_PLANS["48"][0])
+    floorplan["zones"][0]["nodes"][1]["connections"][0]["connects_to"] = "zz"
+    floorplan_file, sortplan_file = write_plan(tmp_path, floorplan, load_file(SAMPLE_PLANS["48"][1]))
+    cache_dir = str(tmp_path / "cache")
+    unvalidated = convert_job(str(tmp_path), floorplan_file, sortplan_file, cache_dir, options={"validate": False})
+    assert unvalidated["status"] == "ok", unvalidated["error"]
+    #The unvalidated render is in the cache, but a validating run must not take it from there
+    validated = convert_job(str(tmp_path), floorplan_file, sortplan_file, cache_dir)
+    assert validated["status"] == "failed"
+    assert "connects_to: no cell /output_gate_1/zz" in validated["error"]
@@ -0,0 +1,40 @@
+"""
+@Filename : test_render.py
+@Brief : render() followed by save() writes the document the original save-after-every-element renderer wrote
+@Author : Soumitra Pandit
+"""
+
+import os
+import pytest
+from conftest import SAMPLE_PLANS
+from SVG_Floorplan import SVG_Floorplan
+
+#Written by the renderer before render()/save() existed, which saved the whole document after every element
+BASELINE_48 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "baseline_output_48.svg")
+
+
+def read_bytes(path: str):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("backend", ["svgwrite", "stream"])
+def test_render_then_save_matches_baseline(tmp_path, backend):
+    svg_file = str(tmp_path / "output.svg")
+    converter = SVG_Floorplan(svg_file, *SAMPLE_PLANS["48"], backend=backend)
+    assert not os.path.exists(svg_file) #Nothing is written before save()
+    converter.render().save()
+    assert read_bytes(svg_file) == read_bytes(BASELINE_48)
+    phases = {"draw", "flip", "save"} if backend == "svgwrite" else {"save"} #The stream backend draws while saving
+    assert phases <= set(converter.timings)
+
+
+def test_render_and_save_are_repeatable(tmp_path):
+    svg_file = str(tmp_path / "output.svg")
+    converter = SVG_Floorplan(svg_file, *SAMPLE_PLANS["48"])
+    converter.render().render().save()
+    first = read_bytes(svg_file)
+    drawn = converter.elements_drawn
+    converter.save()
+    assert read_bytes(svg_file) == first == read_bytes(BASELINE_48)
+    assert converter.elements_drawn == drawn
@@ -0,0 +1,35 @@
+"""
+@Filename : test_shards.py
+@Brief : Sharded rendering gives the bytes of the serial render
+@Author : Soumitra Pandit
+"""
+
+import io
+import itertools
+import pytest
+from conftest import SAMPLE_PLANS
+from SVG_Floorplan import SVG_Floorplan
+from SVG_Shards import SVG_Shards
+
+pytestmark = pytest.mark.skipif(not SVG_Shards.can_fork(), reason="sharded rendering needs fork")
+
+
+def render(floorplan_file, sortplan_file, **options):
+    buffer = io.StringIO()
+    converter = SVG_Floorplan(None, floorplan_file, sortplan_file, **options).write(buffer)
+    return buffer.getvalue(), converter.elements_drawn
+
+
+@pytest.mark.parametrize("plan", sorted(SAMPLE_PLANS))
+def test_stream_shards_match_serial(plan):
+    floorplan_file, sortplan_file = SAMPLE_PLANS[plan]
+    for mode, keep_ids, minify, edges in itertools.product(("elements", "paths"), (False, True), (False, True), (False, True)):
+        options = dict(backend="stream", mode=mode, keep_ids=keep_ids, minify=minify, edges=edges)
+        assert render(floorplan_file, sortplan_file, workers=3, **options) == render(floorplan_file, sortplan_file, **options), options
+
+
+@pytest.mark.parametrize("minify", [False, True])
+def test_svgwrite_backend_is_not_sharded(minify):
+    floorplan_file, sortplan_file = SAMPLE_PLANS["48"]
+    options = dict(backend="svgwrite", mode="paths", minify=minify)
+    assert render(floorplan_file, sortplan_file, workers=3, **options) == render(floorplan_file, sortplan_file, **options)
@@ -0,0 +1,64 @@
+"""
+@Filename : test_spatial_index.py
+@Brief : Spatial_Index queries against a brute force scan, including degenerate plans
+@Author : Soumitra Pandit
+"""
+
+import math
+import random
+import pytest
+from conftest import SAMPLE_PLANS
+from Floorplan import Floorplan
+from JSON_Loader import load_file
+from Spatial_Index import Spatial_Index
+
+#Seconds a nearest() call may take; the degenerate layouts used to walk millions of empty rings
+TIME_LIMIT = 0.5
+
+
+def brute_nearest(points, x, y, max_distance=None):
+    distances = [math.hypot(px - x, py - y) for px, py in points]
+    best = min(range(len(points)), key=lambda row: (distances[row], row))
+    if max_distance is not None and distances[best] > max_distance:
+        return None, None
+    return best, distances[best]
+
+
+def check(points, queries):
+    import time
+    index = Spatial_Index(points)
+    for query in queries:
+        start = time.perf_counter()
+        result = index.nearest(*query)
+        assert time.perf_counter() - start < TIME_LIMIT, query
+        expected = brute_nearest(points, *query)
+        assert result[0] == expected[0], query
+        if result[1] is not None:
+            assert result[1] == pytest.approx(expected[1])
+
+
+def test_single_cell():
+    check([(0.0, 0.0)], [(0.5, 0.5), (0.0, 0.0), (1e6, -1e6), (0.5, 0.5, 0.1)])
+
+
+def test_collinear_cells():
+    points = [(float(x), 0.0) for x in range(100)]
+    check(points, [(50, 1), (50, 0.01), (-30, 0), (250, 40), (49.5, 0), (50, 1, 0.5)])
+    vertical = [(3.0, 0.1 * y) for y in range(100)]
+    check(vertical, [(3, 5.05), (1e5, 5), (3, -1e5)])
+
+
+def test_far_query_points():
+    rng = random.Random(7)
+    points = [(rng.uniform(0, 50), rng.uniform(0, 20)) for _ in range(500)]
+    check(points, [(1e6, 1e6), (-1e6, 10), (25, 1e7), (-5e5, -5e5, 10.0)] +
+          [(rng.uniform(-100, 150), rng.uniform(-100, 120)) for _ in range(200)])
+
+
+def test_box_query_matches_scan():
+    poses = Floorplan.from_dict(load_file(SAMPLE_PLANS["Indy"][0])).poses
+    points = [(pose[0], pose[1]) for pose in (poses.tolist() if hasattr(poses, "tolist") else poses)]
+    index = Spatial_Index(points)
+    for box in ((0, 0, 20, 20), (-1e6, -1e6, 1e6, 1e6), (5, 5, 5.5, 5.5), (1e5, 1e5, 1e5 + 1, 1e5 + 1)):
+        expected = [row for row, (x, y) in enumerate(points) if box[0] <= x <= box[2] and box[1] <= y <= box[3]]
+        assert index.query(*box) == expected
@@ -0,0 +1,39 @@
+"""
+@Filename : test_tiles.py
+@Brief : Tiled export, including tiles drawn with the edges layer
+@Author : Soumitra Pandit
+"""
+
+import os
+import xml.etree.ElementTree as ET
+from conftest import SAMPLE_PLANS
+from SVG_Floorplan import SVG_Floorplan
+from SVG_Tiles import SVG_Tiles
+
+
+def test_tiles_with_edges(tmp_path):
+    floorplan_file, sortplan_file = SAMPLE_PLANS["Indy"]
+    converter = SVG_Floorplan(None, floorplan_file, sortplan_file, backend="stream", edges=True)
+    index = SVG_Tiles(converter, 10).write(str(tmp_path))
+    detail = index["levels"][0]["tiles"]
+    assert len(detail) > 1
+    edge_paths = 0
+    for tile in detail:
+        root = ET.parse(os.path.join(tmp_path, tile["file"])).getroot()
+        edge_paths += sum(element.get("id") == "edges" for element in root.iter("{http://www.w3.org/2000/svg}path"))
+    assert edge_paths > 0
+
+
+def test_select_keeps_only_edges_inside_the_view():
+    floorplan_file, sortplan_file = SAMPLE_PLANS["48"]
+    for crop in (None, (0, 0, 20, 20)):
+        converter = SVG_Floorplan(None, floorplan_file, sortplan_file, backend="stream", edges=True, crop=crop)
+        rows = range(0, len(converter.node_ids), 2)
+        view = converter.select(rows, [])
+        edges = view.compute_edge_geometry()
+        if edges is None:
+            continue
+        node_coords = view.node_coords.tolist() if hasattr(view.node_coords, "tolist") else view.node_coords
+        coords = {tuple(coord[:2]) for coord in node_coords}
+        for start, end in zip(edges["starts"].tolist(), edges["ends"].tolist()):
+            assert tuple(start) in coords and tuple(end) in coords